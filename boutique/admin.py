@@ -1,13 +1,17 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
+from django.utils.text import format_lazy
 from django.urls import path, reverse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.http import HttpResponseRedirect
+from django.utils import timezone
 
-from .models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem, Review
+from .models import TaxClass, Category, Product, ProductImage, ProductPriceHistory, Cart, CartItem, Coupon, DeliverySlot, Order, OrderItem, OrderTransition, OutboxEmail, PostalCodeLocation, ProductRecommendation, Promotion, Review, ShippingRate, ReorderItem, StockReservation
 from .admin_views_custom import CustomProductCreateView
+from .orders import bulk_transition
+from .reviews import moderate_reviews
 
 
 class CategoryAdmin(admin.ModelAdmin):
@@ -17,7 +21,7 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     fieldsets = (
         (None, {
-            'fields': ('name', 'slug', 'description')
+            'fields': ('name', 'slug', 'description', 'tax_class')
         }),
         ('Gestion du stock', {
             'fields': (
@@ -70,6 +74,31 @@ class ProductImageInline(admin.TabularInline):
     image_preview.short_description = 'Aperçu'
 
 
+class ProductPriceHistoryInline(admin.TabularInline):
+    model = ProductPriceHistory
+    extra = 0
+    fields = ('version', 'price', 'created_at')
+    readonly_fields = ('version', 'price', 'created_at')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # L'historique est écrit à chaque changement de prix
+        return False
+
+
+class ProductRecommendationInline(admin.TabularInline):
+    model = ProductRecommendation
+    fk_name = 'product'
+    extra = 0
+    fields = ('rank', 'recommended', 'co_purchases', 'score', 'created_at')
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # Calculées par la commande rebuild_recommendations
+        return False
+
+
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'available', 'image_preview', 'created_at')
     list_filter = ('available', 'created_at', 'updated_at', 'category')
@@ -97,7 +126,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('name', 'slug', 'category', 'description')
         }),
         ('Prix et stock', {
-            'fields': ('price', 'stock', 'available')
+            'fields': ('price', 'tax_class', 'stock', 'available', 'weight', 'volume')
         }),
         ('Image principale', {
             'fields': ('image', 'image_preview'),
@@ -105,7 +134,7 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     readonly_fields = ('image_preview',)
-    inlines = [ProductImageInline]
+    inlines = [ProductImageInline, ProductPriceHistoryInline, ProductRecommendationInline]
     
     def image_preview(self, obj):
         if obj.image:
@@ -119,10 +148,17 @@ class CartItemInline(admin.TabularInline):
     extra = 0
 
 
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    extra = 0
+    readonly_fields = ('product', 'quantity', 'expires_at', 'created_at')
+    can_delete = True
+
+
 class CartAdmin(admin.ModelAdmin):
     list_display = ('id', 'created_at', 'updated_at', 'total_quantity', 'total_price')
     list_filter = ('created_at', 'updated_at')
-    inlines = [CartItemInline]
+    inlines = [CartItemInline, StockReservationInline]
 
 
 class OrderItemInline(admin.TabularInline):
@@ -130,21 +166,150 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
 
 
+class OrderTransitionInline(admin.TabularInline):
+    model = OrderTransition
+    extra = 0
+    fields = ('created_at', 'from_status', 'to_status', 'user', 'note')
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # Le journal est alimenté par orders.transition
+        return False
+
+
+def make_status_action(status, label):
+    """Action d'administration : transition groupée vers `status` (un seul UPDATE)"""
+    def action(modeladmin, request, queryset):
+        updated, rejected = bulk_transition(queryset.values_list('pk', flat=True), status, user=request.user)
+        if updated:
+            modeladmin.message_user(request, _('%(count)s commande(s) passée(s) à « %(status)s ».') % {
+                'count': len(updated), 'status': label,
+            }, messages.SUCCESS)
+        if rejected:
+            modeladmin.message_user(request, _('%(count)s commande(s) ignorée(s) : transition impossible depuis leur statut actuel.') % {
+                'count': len(rejected),
+            }, messages.WARNING)
+    action.__name__ = f'mark_{status}'
+    action.short_description = format_lazy(_('Passer à « {} »'), label)
+    return action
+
+
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'first_name', 'last_name', 'email', 'status', 'paid', 'created_at', 'total_amount')
     list_filter = ('status', 'paid', 'created_at')
     search_fields = ('first_name', 'last_name', 'email', 'id')
-    inlines = [OrderItemInline]
+    readonly_fields = ('status', 'delivery_slot', 'delivery_weight', 'tax_amount')
+    inlines = [OrderItemInline, OrderTransitionInline]
+    actions = [
+        make_status_action(status, label)
+        for status, label in Order.STATUS_CHOICES
+        if status != 'en_attente'
+    ]
+
+
+class DeliverySlotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'start_time', 'trucks_booked', 'truck_capacity', 'weight_booked', 'weight_capacity')
+    list_filter = ('date',)
+    date_hierarchy = 'date'
+    # Les compteurs sont tenus par delivery.book / delivery.release ; seule la capacité se règle ici
+    readonly_fields = ('trucks_booked', 'weight_booked')
+    list_editable = ('truck_capacity', 'weight_capacity')
+
+
+class PostalCodeLocationAdmin(admin.ModelAdmin):
+    list_display = ('postal_code', 'zone', 'latitude', 'longitude')
+    list_filter = ('zone',)
+    search_fields = ('postal_code', 'zone')
+
+
+class ShippingRateAdmin(admin.ModelAdmin):
+    list_display = ('zone', 'min_weight', 'base_price', 'price_per_kg', 'updated_at')
+    list_editable = ('base_price', 'price_per_kg')
+    list_filter = ('zone',)
+
+
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'value', 'product', 'category', 'min_quantity', 'starts_at', 'ends_at', 'active')
+    list_editable = ('active',)
+    list_filter = ('active', 'kind', 'category')
+    search_fields = ('name', 'product__name')
+    raw_id_fields = ('product',)
+
+
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ('code', 'kind', 'value', 'min_subtotal', 'starts_at', 'ends_at', 'used_count', 'max_uses', 'active')
+    list_editable = ('active',)
+    list_filter = ('active', 'kind')
+    search_fields = ('code',)
+    readonly_fields = ('used_count', 'created_at')
+
+
+class TaxClassAdmin(admin.ModelAdmin):
+    list_display = ('name', 'rate', 'updated_at')
+    list_editable = ('rate',)
+    search_fields = ('name',)
 
 
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ('product', 'user', 'rating', 'created_at')
-    list_filter = ('rating', 'created_at')
+    list_display = ('product', 'user', 'rating', 'approved', 'moderated_at', 'created_at')
+    list_filter = ('approved', ('moderated_at', admin.EmptyFieldListFilter), 'rating', 'created_at')
+    list_select_related = ('product', 'user')
     search_fields = ('product__name', 'user__username', 'comment')
+    readonly_fields = ('moderated_at', 'moderated_by')
+    actions = ['approve', 'reject']
+
+    def moderate(self, request, queryset, approve):
+        moderated = moderate_reviews(queryset.values_list('pk', flat=True), approve, user=request.user)
+        self.message_user(request, _('%(count)s avis modéré(s).') % {'count': moderated}, messages.SUCCESS)
+
+    @admin.action(description=_('Approuver les avis sélectionnés'))
+    def approve(self, request, queryset):
+        self.moderate(request, queryset, True)
+
+    @admin.action(description=_('Rejeter les avis sélectionnés'))
+    def reject(self, request, queryset):
+        self.moderate(request, queryset, False)
+
+
+class ReorderItemAdmin(admin.ModelAdmin):
+    list_display = ('product', 'stock', 'threshold', 'daily_velocity', 'days_of_cover', 'suggested_quantity', 'created_at')
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'stock', 'threshold', 'daily_velocity', 'days_of_cover', 'suggested_quantity')
+
+    def has_add_permission(self, request):
+        # La file est alimentée automatiquement par les changements de stock
+        return False
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('to', 'subject', 'key')
+    readonly_fields = ('key', 'order', 'to', 'subject', 'body', 'html_body', 'attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        # La boîte d'envoi est alimentée par outbox.queue_email
+        return False
+
+    @admin.action(description=_('Renvoyer maintenant'))
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, _('%(count)s e-mail(s) remis en file.') % {'count': updated}, messages.SUCCESS)
 
 
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(Cart, CartAdmin)
 admin.site.register(Order, OrderAdmin)
+admin.site.register(DeliverySlot, DeliverySlotAdmin)
+admin.site.register(PostalCodeLocation, PostalCodeLocationAdmin)
+admin.site.register(ShippingRate, ShippingRateAdmin)
+admin.site.register(Promotion, PromotionAdmin)
+admin.site.register(Coupon, CouponAdmin)
+admin.site.register(TaxClass, TaxClassAdmin)
 admin.site.register(Review, ReviewAdmin)
+admin.site.register(ReorderItem, ReorderItemAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
@@ -1,15 +1,27 @@
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, DecimalField, F, Sum, Q
 from django.utils import timezone
 from django.shortcuts import redirect, get_object_or_404
-from django.views.generic.edit import FormMixin
+from django.views.generic.edit import FormMixin, FormView
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+import csv
+import uuid
+from datetime import timedelta
 
-from .models import Category, Product, Order, OrderItem
-from .forms import CategoryForm, ProductForm, OrderStatusForm
+from .models import Category, Product, Order, OrderItem, ReorderItem
+from .forms import CategoryForm, ProductForm, OrderStatusForm, OrderBulkStatusForm, TrackingImportForm
+from .orders import (
+    with_lines, status_choices, transition, TransitionError, WORK_QUEUES, work_queue, work_queue_counts,
+    bulk_transition, assign_tracking_numbers, parse_tracking_numbers,
+)
+from .delivery import parse_date
+from .dispatch import route_plan, write_manifest
+from .documents import document_response, monthly_invoices
+from .reviews import moderate_reviews, pending_count, pending_reviews
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -113,6 +125,35 @@ class ProductDeleteView(AdminRequiredMixin, DeleteView):
         messages.success(self.request, _('Le produit a été supprimé avec succès.'))
         return super().delete(request, *args, **kwargs)
 
+# Réapprovisionnement
+class ReorderQueueExportView(AdminRequiredMixin, View):
+    """Export CSV de la file de réapprovisionnement"""
+
+    def get(self, request, *args, **kwargs):
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        filename = f"reapprovisionnement-{timezone.now():%Y%m%d}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+        writer = csv.writer(response, delimiter=';')
+        writer.writerow([
+            'ID produit', 'Produit', 'Catégorie', 'Stock', 'Seuil',
+            'Ventes/jour', 'Jours de couverture', 'Quantité suggérée', 'Signalé le',
+        ])
+        queue = ReorderItem.objects.select_related('product__category')
+        for item in queue.iterator():
+            writer.writerow([
+                item.product_id,
+                item.product.name,
+                item.product.category.name,
+                item.stock,
+                item.threshold,
+                item.daily_velocity,
+                item.days_of_cover if item.days_of_cover is not None else '',
+                item.suggested_quantity,
+                timezone.localtime(item.created_at).strftime('%d/%m/%Y %H:%M'),
+            ])
+        return response
+
 # Vues pour les utilisateurs
 class UserListView(AdminRequiredMixin, ListView):
     model = User
@@ -136,23 +177,70 @@ class UserListView(AdminRequiredMixin, ListView):
 
 class UserDetailView(AdminRequiredMixin, DetailView):
     model = User
-    template_name = 'boutique/admin/user_detail.html'
+    template_name = 'boutique/admin/users/user_detail.html'
     context_object_name = 'user_profile'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.get_object()
-        context['orders'] = Order.objects.filter(user=user).order_by('-created_at')[:10]
+        user_orders = Order.objects.filter(user=self.object)
+        context['orders'] = with_lines(user_orders).order_by('-created_at')[:10]
+        context.update(user_orders.aggregate(
+            order_count=Count('pk', distinct=True),
+            completed_orders=Count('pk', filter=Q(status__in=('livree', 'recuperee')), distinct=True),
+            pending_orders=Count('pk', filter=~Q(status__in=('livree', 'recuperee', 'annulee')), distinct=True),
+            total_spent=Sum(
+                F('items__price') * F('items__quantity'),
+                filter=~Q(status='annulee'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        ))
+        context['reviews'] = self.object.reviews.select_related('product').order_by('-created_at')[:10]
+        context['review_count'] = self.object.reviews.count()
         return context
 
+# Modération des avis
+class ReviewModerationView(AdminRequiredMixin, TemplateView):
+    """File des avis en attente (les plus anciens d'abord), approbation ou rejet groupés"""
+    template_name = 'boutique/admin/reviews/moderation.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        after = self.request.GET.get('after')
+        reviews, next_cursor = pending_reviews(after=after)
+        context['reviews'] = reviews
+        context['after'] = after or ''
+        context['next_cursor'] = next_cursor
+        context['pending_count'] = pending_count()
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        review_ids = [value for value in request.POST.getlist('review_ids') if value.isdigit()]
+        action = request.POST.get('action')
+        if not review_ids or action not in ('approve', 'reject'):
+            messages.error(request, _('Sélectionnez au moins un avis et une action.'))
+        else:
+            moderated = moderate_reviews(review_ids, approve=action == 'approve', user=request.user)
+            if action == 'approve':
+                messages.success(request, _('%(count)s avis approuvé(s).') % {'count': moderated})
+            else:
+                messages.success(request, _('%(count)s avis rejeté(s).') % {'count': moderated})
+        url = reverse('boutique:admin_review_moderation')
+        after = request.POST.get('after')
+        return redirect(f'{url}?after={after}' if after else url)
+
 # Vues pour les commandes
 class OrderListView(AdminRequiredMixin, ListView):
     model = Order
-    template_name = 'boutique/admin/order_list.html'
+    template_name = 'boutique/admin/orders/order_list.html'
     context_object_name = 'orders'
     paginate_by = 15
     
     def get_queryset(self):
+        # Files de travail : les plus anciennes commandes d'abord, via l'index partiel
+        queue = self.request.GET.get('file')
+        if queue in WORK_QUEUES:
+            return with_lines(work_queue(queue).select_related('user'))
+        
         queryset = super().get_queryset().select_related('user')
         status = self.request.GET.get('status')
         search_query = self.request.GET.get('q')
@@ -169,29 +257,48 @@ class OrderListView(AdminRequiredMixin, ListView):
                 Q(last_name__icontains=search_query)
             )
             
-        return queryset.order_by('-created_at')
+        return with_lines(queryset).order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['status_choices'] = dict(Order.STATUS_CHOICES)
+        context['status_choices'] = Order.STATUS_CHOICES
+        context['work_queues'] = work_queue_counts()
+        context['current_queue'] = self.request.GET.get('file')
         return context
 
 class OrderDetailView(AdminRequiredMixin, FormMixin, DetailView):
     model = Order
-    template_name = 'boutique/admin/order_detail.html'
+    template_name = 'boutique/admin/orders/order_detail.html'
     context_object_name = 'order'
     form_class = OrderStatusForm
     
+    def get_queryset(self):
+        return with_lines(Order.objects.select_related('user'))
+    
     def get_success_url(self):
         return reverse_lazy('boutique:admin_order_detail', kwargs={'pk': self.object.pk})
     
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['choices'] = status_choices(self.object)
+        return kwargs
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['status_choices'] = dict(Order.STATUS_CHOICES)
+        context['status_choices'] = status_choices(self.object)
+        context['transitions'] = self.object.transitions.select_related('user')
         return context
     
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
+        
+        # Formulaire des notes internes : une seule colonne à écrire
+        if 'notes' in request.POST and 'status' not in request.POST:
+            self.object.notes = request.POST['notes']
+            self.object.save(update_fields=['notes', 'updated_at'])
+            messages.success(request, _('Les notes de la commande ont été enregistrées.'))
+            return redirect(self.get_success_url())
+        
         form = self.get_form()
         
         if form.is_valid():
@@ -201,24 +308,155 @@ class OrderDetailView(AdminRequiredMixin, FormMixin, DetailView):
     
     def form_valid(self, form):
         new_status = form.cleaned_data['status']
-        self.object.status = new_status
+        fields = {}
+        if form.cleaned_data['tracking_number']:
+            fields['tracking_number'] = form.cleaned_data['tracking_number']
         
-        # Mettre à jour la date de mise à jour
-        self.object.updated_at = timezone.now()
-        
-        # Si la commande est marquée comme payée, mettre à jour la date de paiement
-        if new_status == 'payee' and not self.object.paid:
-            self.object.paid = True
-            
-        self.object.save()
+        try:
+            transition(self.object, new_status, user=self.request.user, note=form.cleaned_data['note'], **fields)
+        except TransitionError as error:
+            messages.error(self.request, str(error))
+            return redirect(self.get_success_url())
         
         messages.success(
             self.request,
-            _(f'Le statut de la commande a été mis à jour: {dict(Order.STATUS_CHOICES).get(new_status)}')
+            _('Le statut de la commande a été mis à jour: %(status)s') % {
+                'status': self.object.get_status_display(),
+            }
         )
         
         return super().form_valid(form)
 
+class OrderBulkStatusView(AdminRequiredMixin, View):
+    """Change le statut de toutes les commandes cochées dans la liste"""
+    
+    def post(self, request, *args, **kwargs):
+        form = OrderBulkStatusForm(request.POST)
+        order_ids = []
+        for value in request.POST.getlist('order_ids'):
+            try:
+                order_ids.append(uuid.UUID(value))
+            except ValueError:
+                continue
+        
+        if not form.is_valid() or not order_ids:
+            messages.error(request, _('Sélectionnez au moins une commande et un statut.'))
+            return redirect(self.get_success_url())
+        
+        status = form.cleaned_data['status']
+        updated, rejected = bulk_transition(order_ids, status, user=request.user, note=form.cleaned_data['note'])
+        self.report(updated, rejected, status)
+        return redirect(self.get_success_url())
+    
+    def report(self, updated, rejected, status):
+        labels = dict(Order.STATUS_CHOICES)
+        if updated:
+            messages.success(self.request, _('%(count)s commande(s) passée(s) à « %(status)s ».') % {
+                'count': len(updated), 'status': labels[status],
+            })
+        if rejected:
+            messages.warning(self.request, _('%(count)s commande(s) ignorée(s) : transition impossible depuis leur statut actuel.') % {
+                'count': len(rejected),
+            })
+    
+    def get_success_url(self):
+        next_url = self.request.POST.get('next', '')
+        if next_url.startswith('/') and not next_url.startswith('//'):
+            return next_url
+        return reverse('boutique:admin_order_list')
+
+class OrderTrackingImportView(AdminRequiredMixin, FormView):
+    """Attribue en une fois les numéros de suivi d'une liste collée ou d'un fichier"""
+    template_name = 'boutique/admin/orders/order_tracking_import.html'
+    form_class = TrackingImportForm
+    success_url = reverse_lazy('boutique:admin_order_list')
+    
+    def form_valid(self, form):
+        numbers, invalid_lines = parse_tracking_numbers(form.cleaned_data['data'])
+        if invalid_lines:
+            form.add_error('data', _('Lignes invalides : %(lines)s') % {
+                'lines': ', '.join(str(line) for line in invalid_lines[:20]),
+            })
+            return self.form_invalid(form)
+        
+        status = form.cleaned_data['mark_as']
+        if status:
+            updated, rejected = bulk_transition(
+                numbers, status, user=self.request.user,
+                note=_('Import des numéros de suivi'), tracking_numbers=numbers,
+            )
+            updated_count = matched = len(updated) + len(rejected)
+            if rejected:
+                messages.warning(self.request, _('%(count)s commande(s) non changée(s) de statut (transition impossible depuis leur statut actuel) : leur numéro de suivi est tout de même enregistré.') % {
+                    'count': len(rejected),
+                })
+        else:
+            updated_count = matched = assign_tracking_numbers(numbers)
+        
+        if updated_count:
+            messages.success(self.request, _('Numéros de suivi enregistrés pour %(count)s commande(s).') % {
+                'count': updated_count,
+            })
+        if len(numbers) > matched:
+            messages.warning(self.request, _('%(count)s identifiant(s) de commande introuvable(s).') % {
+                'count': len(numbers) - matched,
+            })
+        return super().form_valid(form)
+
+class DispatchPlanView(AdminRequiredMixin, TemplateView):
+    """Tournées de livraison d'une journée (`?date=AAAA-MM-JJ`, demain par défaut)"""
+    template_name = 'boutique/admin/orders/dispatch_plan.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        day = parse_date(self.request.GET.get('date')) or timezone.localdate() + timedelta(days=1)
+        context['plan'] = route_plan(day)
+        context['day'] = day
+        context['previous_day'] = day - timedelta(days=1)
+        context['next_day'] = day + timedelta(days=1)
+        return context
+
+class DispatchManifestView(AdminRequiredMixin, View):
+    """Bon de livraison CSV d'un camion"""
+    
+    def get(self, request, date, number, *args, **kwargs):
+        day = parse_date(date)
+        if day is None:
+            raise Http404
+        route = next((route for route in route_plan(day)['routes'] if route['number'] == number), None)
+        if route is None:
+            raise Http404
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="tournee-{day:%Y%m%d}-camion-{number}.csv"'
+        write_manifest(route, day, response)
+        return response
+
+class OrderDocumentView(AdminRequiredMixin, View):
+    """Facture ou bon de livraison PDF d'une commande"""
+    kind = 'invoice'
+    
+    def get(self, request, pk, *args, **kwargs):
+        order = get_object_or_404(Order.objects.select_related('coupon'), pk=pk)
+        return document_response(request, order, self.kind)
+
+class MonthlyInvoicesView(AdminRequiredMixin, View):
+    """Factures des commandes payées d'un mois (`mois=AAAA-MM`, le mois précédent par défaut) en une archive ZIP"""
+    
+    def get(self, request, *args, **kwargs):
+        month = request.GET.get('mois')
+        if month:
+            first_day = parse_date(f'{month}-01')
+            if first_day is None:
+                raise Http404
+        else:
+            first_day = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        response = StreamingHttpResponse(
+            monthly_invoices(first_day.year, first_day.month),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = f'attachment; filename="factures-{first_day:%Y-%m}.zip"'
+        return response
+
 class OrderDeleteView(AdminRequiredMixin, DeleteView):
     model = Order
     template_name = 'boutique/admin/order_confirm_delete.html'
@@ -0,0 +1,332 @@
+"""
+Suggestions de recherche (produits et catégories) pendant la saisie.
+
+Les noms sont normalisés (`fold` : minuscules, sans accents) et indexés dans
+une table de préfixes triée : chaque nom y figure une fois par mot, à partir
+de ce mot (« ciment portland cem ii » donne aussi « portland cem ii »…), si
+bien qu'une recherche est une dichotomie suivie d'un parcours des clés qui
+commencent par la saisie, sans requête SQL.
+
+La table est écrite dans un fichier (`AUTOCOMPLETE_INDEX_PATH`) projeté en
+mémoire (mmap) par chaque processus : les workers gunicorn d'une machine
+partagent les mêmes pages, et un worker ne décode que les clés qu'il compare.
+Un produit ou une catégorie modifié (nom, slug, disponibilité) est reporté
+après validation de la transaction, en une ligne ajoutée au journal des
+modifications (`.delta`) que chaque processus superpose à l'index de base ;
+les autres workers le voient au plus `AUTOCOMPLETE_CHECK_INTERVAL` secondes
+plus tard. Au-delà de `AUTOCOMPLETE_COMPACT_AFTER` modifications, le journal
+est fusionné dans un nouvel index de base, remplacé atomiquement.
+
+La reconstruction complète depuis la base (écritures faites par
+`QuerySet.update()`, autres machines) se fait hors des requêtes, avec la
+commande `rebuild_search_index` lancée périodiquement (ex. cron toutes les
+heures) : un index ancien continue d'être servi. Une requête ne reconstruit
+l'index que si le fichier n'existe pas encore.
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import unicodedata
+from array import array
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+from .models import Category, Product
+
+MAGIC = b'BQAC'
+# Signature, date de la dernière reconstruction complète, nombre de clés, nombre de fiches, réservé
+HEADER = struct.Struct('<4sdIII')
+
+PRODUCT, CATEGORY = 'product', 'category'
+
+_lock = threading.Lock()
+_state = {'index': None, 'identity': None, 'checked_at': 0.0}
+
+
+def index_path():
+    return getattr(
+        settings, 'AUTOCOMPLETE_INDEX_PATH',
+        os.path.join(tempfile.gettempdir(), 'boutique-autocomplete.idx'),
+    )
+
+
+def fold(text):
+    """Forme de comparaison : minuscules, sans accents, espaces simples"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().split())
+
+
+def product_entry(product):
+    """Fiche d'un produit dans l'index, ou None s'il ne doit pas être proposé"""
+    if not product.available:
+        return None
+    return [PRODUCT, product.pk, product.name, reverse('boutique:product_detail', args=[product.pk, product.slug])]
+
+
+def category_entry(category):
+    return [CATEGORY, category.pk, category.name, reverse('boutique:product_list_by_category', args=[category.slug])]
+
+
+def entries_from_db():
+    entries = [category_entry(category) for category in Category.objects.only('pk', 'name', 'slug')]
+    entries += [
+        product_entry(product)
+        for product in Product.objects.filter(available=True).only('pk', 'name', 'slug', 'available').iterator()
+    ]
+    return entries
+
+
+class PrefixIndex:
+    """Table de préfixes lue directement dans le tampon projeté en mémoire"""
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, self.built_at, keys, records, _reserved = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Fichier d'index de recherche invalide")
+        position = HEADER.size
+
+        def take(typecode, count):
+            nonlocal position
+            size = array(typecode).itemsize * count
+            part = view[position:position + size].cast(typecode)
+            position += size
+            return part
+
+        self.key_offsets = take('I', keys + 1)
+        self.key_records = take('I', keys)
+        self.record_offsets = take('I', records + 1)
+        self.key_words = take('H', keys)
+        self.key_blob = view[position:position + self.key_offsets[keys]]
+        position += self.key_offsets[keys]
+        self.record_blob = view[position:position + self.record_offsets[records]]
+        self.size = keys
+        self.records = records
+
+    def key(self, i):
+        return self.key_blob[self.key_offsets[i]:self.key_offsets[i + 1]].tobytes()
+
+    def record(self, i):
+        return json.loads(self.record_blob[self.record_offsets[i]:self.record_offsets[i + 1]].tobytes())
+
+    def entries(self):
+        return [self.record(i) for i in range(self.records)]
+
+    def lower_bound(self, prefix):
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def matches(self, prefix, scan=200):
+        """(rang du mot, fiche) des noms dont un mot commence par `prefix` (au plus `scan` clés parcourues)"""
+        best = {}
+        position = self.lower_bound(prefix)
+        for i in range(position, min(position + scan, self.size)):
+            if not self.key(i).startswith(prefix):
+                break
+            record, word = self.key_records[i], self.key_words[i]
+            if record not in best or word < best[record]:
+                best[record] = word
+        return [(word, self.record(record)) for record, word in best.items()]
+
+
+def encode(entries, built_at):
+    """Contenu du fichier d'index pour `entries` ([type, id, nom, url])"""
+    entries = [entry for entry in entries if entry is not None]
+    keys = []
+    for position, entry in enumerate(entries):
+        words = fold(entry[2]).split()
+        for word in range(len(words)):
+            keys.append((' '.join(words[word:]).encode('utf-8'), position, min(word, 0xFFFF)))
+    keys.sort()
+
+    key_offsets, key_records, key_words, key_blob = array('I', [0]), array('I'), array('H'), bytearray()
+    for key, position, word in keys:
+        key_blob += key
+        key_offsets.append(len(key_blob))
+        key_records.append(position)
+        key_words.append(word)
+    record_offsets, record_blob = array('I', [0]), bytearray()
+    for entry in entries:
+        record_blob += json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        record_offsets.append(len(record_blob))
+
+    return b''.join([
+        HEADER.pack(MAGIC, built_at, len(keys), len(entries), 0),
+        key_offsets.tobytes(), key_records.tobytes(), record_offsets.tobytes(), key_words.tobytes(),
+        bytes(key_blob), bytes(record_blob),
+    ])
+
+
+@contextmanager
+def writer_lock():
+    """Verrou inter-processus des réécritures de l'index"""
+    path = index_path() + '.lock'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def delta_path():
+    return index_path() + '.delta'
+
+
+def _identity(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _open():
+    """Index de base projeté en mémoire, ou None s'il manque ou est illisible"""
+    try:
+        with open(index_path(), 'rb') as source:
+            buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        return PrefixIndex(buffer)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _read_delta():
+    """Modifications publiées depuis la dernière compaction : {(type, id): fiche ou None}"""
+    changes = {}
+    try:
+        with open(delta_path(), encoding='utf-8') as delta:
+            for line in delta:
+                try:
+                    kind, pk, entry = json.loads(line)
+                except ValueError:
+                    continue  # ligne en cours d'écriture
+                changes[(kind, pk)] = entry
+    except OSError:
+        pass
+    return changes
+
+
+def _replace(path, content):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix='.autocomplete-')
+    with os.fdopen(handle, 'wb') as output:
+        output.write(content)
+    os.replace(temporary, path)
+
+
+def _publish(entries, built_at=None):
+    """Remplace l'index de base et vide le journal des modifications"""
+    _replace(index_path(), encode(entries, time.time() if built_at is None else built_at))
+    _replace(delta_path(), b'')
+
+
+def rebuild_index():
+    """Reconstruit l'index depuis la base"""
+    with writer_lock():
+        _publish(entries_from_db())
+    _state['checked_at'] = 0.0
+
+
+class Snapshot:
+    """Index de base et modifications publiées depuis, vus ensemble"""
+
+    def __init__(self, index, changes):
+        self.index = index
+        self.changes = changes
+        self.words = {ref: fold(entry[2]).split() for ref, entry in changes.items() if entry is not None}
+
+    def search(self, query, limit=8):
+        prefix = fold(query)
+        if not prefix:
+            return []
+        found = [
+            (word, entry) for word, entry in self.index.matches(prefix.encode('utf-8'))
+            if tuple(entry[:2]) not in self.changes
+        ]
+        for ref, words in self.words.items():
+            word = next((i for i in range(len(words)) if ' '.join(words[i:]).startswith(prefix)), None)
+            if word is not None:
+                found.append((word, self.changes[ref]))
+        # Début de nom d'abord, puis noms les plus courts
+        found.sort(key=lambda item: (item[0], len(item[1][2]), item[1][2]))
+        return [entry for _word, entry in found[:limit]]
+
+
+def snapshot():
+    """Index courant du processus, rechargé si un autre processus en a publié un nouveau"""
+    now = time.monotonic()
+    interval = getattr(settings, 'AUTOCOMPLETE_CHECK_INTERVAL', 2)
+    if _state['index'] is not None and now - _state['checked_at'] < interval:
+        return _state['index']
+    with _lock:
+        identity = (_identity(index_path()), _identity(delta_path()))
+        current = _state['index']
+        if current is None or identity != _state['identity']:
+            index = current.index if current is not None and identity[0] == _state['identity'][0] else _open()
+            if index is None:
+                with writer_lock():
+                    # Un autre processus a pu construire l'index pendant l'attente du verrou
+                    index = _open()
+                    if index is None:
+                        _publish(entries_from_db())
+                        index = _open()
+                identity = (_identity(index_path()), _identity(delta_path()))
+            current = Snapshot(index, _read_delta())
+        _state.update(index=current, identity=identity, checked_at=now)
+        return current
+
+
+def suggest(query, limit=None):
+    """Suggestions pour la saisie `query` : {'products': [...], 'categories': [...]}"""
+    limit = limit or getattr(settings, 'AUTOCOMPLETE_LIMIT', 8)
+    results = {'products': [], 'categories': []}
+    for kind, pk, name, url in snapshot().search(query, limit=limit * 2):
+        group = results['products' if kind == PRODUCT else 'categories']
+        if len(group) < limit:
+            group.append({'id': pk, 'name': name, 'url': url})
+    return results
+
+
+def apply_changes(changes):
+    """
+    Publie {(type, id): fiche ou None} en l'ajoutant au journal des
+    modifications ; au-delà de `AUTOCOMPLETE_COMPACT_AFTER` modifications, le
+    journal est fusionné dans un nouvel index de base (sans relire la base).
+    """
+    with writer_lock():
+        index = _open()
+        # Sans index, la première recherche le construira depuis la base, modification comprise
+        if index is not None:
+            with open(delta_path(), 'a', encoding='utf-8') as delta:
+                delta.write(''.join(
+                    json.dumps([*ref, entry], ensure_ascii=False, separators=(',', ':')) + '\n'
+                    for ref, entry in changes.items()
+                ))
+            published = _read_delta()
+            if len(published) > getattr(settings, 'AUTOCOMPLETE_COMPACT_AFTER', 200):
+                entries = [entry for entry in index.entries() if tuple(entry[:2]) not in published]
+                entries += [entry for entry in published.values() if entry is not None]
+                _publish(entries, built_at=index.built_at)
+    _state['checked_at'] = 0.0
+
+
+def schedule_change(kind, pk, entry):
+    """Reporte la fiche dans l'index après validation de la transaction en cours"""
+    transaction.on_commit(lambda: apply_changes({(kind, pk): entry}))
@@ -0,0 +1,164 @@
+"""
+En-têtes de cache HTTP pour les pages du catalogue.
+
+`ConditionalGetMixin` calcule un ETag et un Last-Modified à partir du
+`updated_at` le plus récent des objets affichés (quelques agrégats indexés)
+avant toute construction du contexte. Si le navigateur ou le CDN possède déjà
+cette version, on répond 304 sans rendre le template.
+
+Les pages contiennent aussi des éléments propres au visiteur (compteur du
+panier, utilisateur connecté, langue) : ils entrent dans l'ETag, et les
+réponses des visiteurs identifiés sont marquées `private`. Le jeton CSRF n'y
+entre pas : le jeton masqué de la page en cache reste valable tant que le
+cookie CSRF ne change pas (la connexion, qui le renouvelle, change l'ETag).
+
+`CompiledTable` garde en mémoire une structure calculée à partir de la base
+(grilles de livraison, promotions...) et la recompile quand la version de
+ces données en base change.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, Sum
+from django.utils import timezone, translation
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import CartItem
+
+
+def latest_change(queryset, field='updated_at'):
+    """Retourne (date de dernière modification, nombre d'objets) en une requête"""
+    stats = queryset.order_by().aggregate(latest=Max(field), count=Count('pk'))
+    return stats['latest'], stats['count']
+
+
+class CompiledTable:
+    """
+    Structure compilée par `build()` et gardée en mémoire dans chaque processus.
+
+    Chaque processus relit `version()` au plus toutes les `interval_setting`
+    secondes et recompile sa copie si elle a changé. La version est lue en
+    base (par exemple `latest_change` des modèles sources) : le cache est
+    propre à chaque processus, une modification faite par un autre worker
+    n'y serait pas visible. `invalidate()` (appelé par les signaux des
+    modèles sources) recompile la copie du processus courant sans attendre.
+    Une structure peut aussi fixer son attribut `valid_until` (datetime) pour
+    être recompilée à une échéance connue.
+    """
+
+    def __init__(self, build, version, interval_setting, default_interval=30):
+        self.build = build
+        self.version = version
+        self.interval_setting = interval_setting
+        self.default_interval = default_interval
+        self._table = None
+        self._version = None
+        self._checked_at = 0
+
+    def get(self):
+        table = self._table
+        if table is not None:
+            valid_until = getattr(table, 'valid_until', None)
+            expired = valid_until is not None and timezone.now() >= valid_until
+            interval = getattr(settings, self.interval_setting, self.default_interval)
+            if not expired and time.monotonic() - self._checked_at < interval:
+                return table
+            version = self.version()
+            if not expired and version == self._version:
+                self._checked_at = time.monotonic()
+                return table
+        else:
+            version = self.version()
+
+        table = self.build()
+        self._table, self._version, self._checked_at = table, version, time.monotonic()
+        return table
+
+    def invalidate(self):
+        self._table = None
+
+
+def cart_fingerprint(request):
+    """Identifie l'état du panier de la session (quantités et dernière modification)"""
+    cart_id = request.session.get('cart_id')
+    if not cart_id:
+        return None, ''
+    stats = CartItem.objects.filter(cart_id=cart_id).aggregate(
+        latest=Max('updated_at'), count=Count('pk'), quantity=Sum('quantity')
+    )
+    return stats['latest'], f"{cart_id}:{stats['count']}:{stats['quantity']}"
+
+
+class ConditionalGetMixin:
+    """Répond 304 Not Modified aux GET conditionnels sans rendre le template"""
+    cache_max_age = None
+
+    def get_last_modified_parts(self):
+        """
+        Retourne une liste de couples (updated_at, nombre) décrivant les objets
+        rendus par la page. Retourner None désactive le GET conditionnel
+        (par exemple si l'objet n'existe pas).
+        """
+        return []
+
+    def get_cache_max_age(self):
+        if self.cache_max_age is not None:
+            return self.cache_max_age
+        return getattr(settings, 'CATALOG_CACHE_MAX_AGE', 0)
+
+    def _is_private(self, request):
+        return request.user.is_authenticated or bool(request.session.get('cart_id'))
+
+    def _get_validators(self, request):
+        parts = self.get_last_modified_parts()
+        if parts is None:
+            return None, None
+
+        cart_latest, cart_key = cart_fingerprint(request)
+        timestamps = [latest for latest, _count in parts if latest is not None]
+        if cart_latest is not None:
+            timestamps.append(cart_latest)
+        last_modified = max(timestamps) if timestamps else None
+
+        key = '|'.join([
+            request.get_full_path(),
+            translation.get_language() or '',
+            str(request.user.pk or ''),
+            cart_key,
+            *(f"{latest.isoformat() if latest else ''}:{count}" for latest, count in parts),
+        ])
+        etag = '"%s"' % hashlib.md5(key.encode('utf-8')).hexdigest()
+        return etag, last_modified
+
+    def _patch_headers(self, request, response, etag, last_modified):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+        visibility = {'private': True} if self._is_private(request) else {'public': True}
+        patch_cache_control(response, max_age=self.get_cache_max_age(), must_revalidate=True, **visibility)
+        patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        # Les messages flash en attente doivent être affichés : pas de 304 dans ce cas
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag, last_modified = self._get_validators(request)
+        if etag is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self._patch_headers(request, response, etag, last_modified)
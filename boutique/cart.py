@@ -0,0 +1,318 @@
+"""
+Opérations sur le panier de la session.
+
+Toutes les mutations (ajout, changement de quantité, suppression, vidage,
+quantités en lot, code promo) passent par ce module : elles vérifient le stock
+disponible à la vente (stock moins les réservations des autres paniers) et les
+vues les exécutent dans une transaction qui renvoie aussi les nouveaux totaux,
+tarifés par `pricing.price_cart` sur une seule lecture des lignes.
+"""
+from django.utils.translation import gettext_lazy as _
+
+from .models import Cart, CartItem, Product
+from .reservations import available_to_sell, reserved_quantities
+from .pricing import CouponError, coupon_discount, find_coupon, price_cart
+from .shipping import quote_pricing
+
+
+class CartError(Exception):
+    """Mutation du panier refusée (produit introuvable, stock insuffisant...)"""
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.errors = errors or {}
+
+
+def get_session_cart(request, create=True):
+    """Retourne le panier de la session, en le créant au besoin"""
+    cart_id = request.session.get('cart_id')
+    if cart_id:
+        cart = Cart.objects.filter(id=cart_id).first()
+        if cart is not None:
+            return cart
+    if not create:
+        return None
+    cart = Cart.objects.create()
+    request.session['cart_id'] = str(cart.id)
+    return cart
+
+
+def cart_totals(cart):
+    """Sous-total, code promo, TVA, quantité, nombre de lignes et frais de livraison du panier"""
+    if cart is None:
+        pricing = None
+    else:
+        pricing = price_cart(cart)
+    if pricing is None or not pricing.lines:
+        return {
+            'cart_total': '0.00',
+            'subtotal': '0.00',
+            'discount_amount': '0.00',
+            'discount_code': '',
+            'coupon_error': None,
+            'tax_amount': '0.00',
+            'tax_rate': None,
+            'cart_total_quantity': 0,
+            'item_count': 0,
+            'cart_empty': True,
+            'shipping_cost': '0.00',
+        }
+    return {
+        'cart_total': f"{pricing.total:.2f}",
+        'subtotal': f"{pricing.subtotal:.2f}",
+        'discount_amount': f"{pricing.discount_amount:.2f}",
+        'discount_code': pricing.coupon.code if pricing.coupon else '',
+        'coupon_error': pricing.coupon_error,
+        'tax_amount': f"{pricing.tax_amount:.2f}",
+        'tax_rate': f"{pricing.tax_rate.normalize():f}" if pricing.tax_rate is not None else None,
+        'cart_total_quantity': pricing.quantity,
+        'item_count': len(pricing.lines),
+        'cart_empty': False,
+        'shipping_cost': f"{quote_pricing(pricing):.2f}",
+    }
+
+
+def serialize_line(item):
+    """Représentation JSON d'une ligne du panier"""
+    unit_price = item.get_discounted_price
+    return {
+        'id': item.pk,
+        'product_id': item.product_id,
+        'quantity': item.quantity,
+        'price': f"{unit_price:.2f}",
+        'base_price': f"{item.price:.2f}",
+        'item_total': f"{unit_price * item.quantity:.2f}",
+    }
+
+
+def _check_quantity(quantity):
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise CartError(_("Quantité invalide."))
+    if quantity < 0:
+        raise CartError(_("Quantité invalide."))
+    return quantity
+
+
+def _check_stock(product, quantity, cart):
+    available = available_to_sell(product, exclude_cart=cart.pk)
+    if quantity > available:
+        raise CartError(
+            _("Stock insuffisant pour %(product)s (disponible : %(available)s).") % {
+                'product': product.name,
+                'available': available,
+            },
+            status=409,
+            errors={str(product.pk): available},
+        )
+
+
+def add_item(cart, product_id, quantity=1):
+    """Ajoute `quantity` unités d'un produit ; retourne la ligne mise à jour"""
+    quantity = _check_quantity(quantity)
+    if quantity == 0:
+        raise CartError(_("Quantité invalide."))
+
+    product = Product.objects.filter(pk=product_id, available=True).first()
+    if product is None:
+        raise CartError(_("Ce produit n'est pas disponible."), status=404)
+
+    item = CartItem.objects.filter(cart=cart, product=product).first()
+    new_quantity = quantity + (item.quantity if item else 0)
+    _check_stock(product, new_quantity, cart)
+
+    if item is None:
+        return CartItem.objects.create(
+            cart=cart, product=product, quantity=new_quantity, price=product.price, price_version=product.price_version,
+        )
+    item.quantity = new_quantity
+    item.save(update_fields=['quantity', 'updated_at'])
+    return item
+
+
+def _get_line(cart, item_id):
+    item = CartItem.objects.filter(cart=cart, pk=item_id).select_related('product').first()
+    if item is None:
+        raise CartError(_("L'article demandé n'existe pas ou a déjà été supprimé."), status=404)
+    return item
+
+
+def set_item_quantity(cart, item_id, quantity):
+    """
+    Fixe la quantité d'une ligne du panier. Une quantité nulle supprime la
+    ligne ; la fonction retourne alors None.
+    """
+    quantity = _check_quantity(quantity)
+    item = _get_line(cart, item_id)
+    if quantity == 0:
+        item.delete()
+        return None
+    _check_stock(item.product, quantity, cart)
+    item.quantity = quantity
+    item.save(update_fields=['quantity', 'updated_at'])
+    return item
+
+
+def remove_item(cart, item_id):
+    """Supprime une ligne du panier"""
+    deleted, _rows = CartItem.objects.filter(cart=cart, pk=item_id).delete()
+    if not deleted:
+        raise CartError(_("L'article demandé n'existe pas ou a déjà été supprimé."), status=404)
+
+
+def clear(cart):
+    """Vide le panier ; retourne le nombre de lignes supprimées"""
+    return CartItem.objects.filter(cart=cart).delete()[0]
+
+
+def _apply_quantities(cart, wanted):
+    """Vérifie puis enregistre {product_id: quantité finale} en une instruction"""
+    products = Product.objects.in_bulk([pk for pk, quantity in wanted.items() if quantity > 0])
+    reserved = reserved_quantities(list(products), exclude_cart=cart.pk)
+
+    errors = {}
+    for product_id, quantity in wanted.items():
+        if quantity == 0:
+            continue
+        product = products.get(product_id)
+        if product is None or not product.available:
+            errors[str(product_id)] = 0
+            continue
+        available = max(product.stock - reserved.get(product_id, 0), 0)
+        if quantity > available:
+            errors[str(product_id)] = available
+    if errors:
+        raise CartError(_("Certains produits ne sont pas disponibles en quantité suffisante."), status=409, errors=errors)
+
+    removed = [pk for pk, quantity in wanted.items() if quantity == 0]
+    if removed:
+        CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+
+    return _upsert_lines(cart, products, {pk: quantity for pk, quantity in wanted.items() if quantity > 0})
+
+
+def _upsert_lines(cart, products, quantities):
+    """Insère ou met à jour les lignes {product_id: quantité} au prix actuel, en une instruction"""
+    lines = [
+        CartItem(
+            cart=cart, product=products[pk], quantity=quantity,
+            price=products[pk].price, price_version=products[pk].price_version,
+        )
+        for pk, quantity in quantities.items()
+    ]
+    if lines:
+        CartItem.objects.bulk_create(
+            lines,
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'price', 'price_version', 'updated_at'],
+        )
+    return lines
+
+
+def set_quantities(cart, quantities):
+    """
+    Fixe en lot les quantités de plusieurs produits : {product_id: quantité}.
+
+    Les produits et les réservations des autres paniers sont lus en deux
+    requêtes, puis toutes les lignes sont insérées ou mises à jour en une seule
+    instruction ; une quantité nulle retire le produit.
+    Si un seul produit n'est pas servable, rien n'est modifié et une
+    `CartError` détaille la quantité disponible pour chaque produit en défaut.
+    """
+    try:
+        wanted = {int(product_id): _check_quantity(quantity) for product_id, quantity in quantities.items()}
+    except (TypeError, ValueError):
+        raise CartError(_("Produit invalide."))
+    return _apply_quantities(cart, wanted)
+
+
+def add_items(cart, entries):
+    """
+    Ajoute en lot des couples (product_id, quantité) au panier.
+
+    Les quantités s'ajoutent à celles déjà présentes (une requête pour les lire)
+    et les doublons sont cumulés ; la vérification du stock et l'écriture se
+    font ensuite comme pour `set_quantities`, en tout ou rien.
+    """
+    added = {}
+    try:
+        for product_id, quantity in entries:
+            product_id = int(product_id)
+            added[product_id] = added.get(product_id, 0) + _check_quantity(quantity)
+    except (TypeError, ValueError):
+        raise CartError(_("Produit invalide."))
+    added = {pk: quantity for pk, quantity in added.items() if quantity > 0}
+    if not added:
+        raise CartError(_("Aucun produit à ajouter."))
+
+    current = dict(
+        CartItem.objects.filter(cart=cart, product_id__in=added).values_list('product_id', 'quantity')
+    )
+    return _apply_quantities(cart, {
+        pk: quantity + current.get(pk, 0) for pk, quantity in added.items()
+    })
+
+
+def add_available(cart, entries):
+    """
+    Ajoute des couples (product_id, quantité) dans la limite du stock.
+
+    Contrairement à `add_items`, les produits servables sont ajoutés même si
+    d'autres ne le sont pas : chaque quantité est ramenée au stock disponible
+    (après les réservations des autres paniers et ce que contient déjà le
+    panier). Retourne (lignes écrites, manques) où chaque manque est un
+    dictionnaire {'product', 'product_id', 'requested', 'added'} ; `product`
+    vaut None si le produit n'existe plus.
+    """
+    requested = {}
+    for product_id, quantity in entries:
+        requested[product_id] = requested.get(product_id, 0) + quantity
+
+    product_ids = [pk for pk in requested if pk is not None]
+    products = Product.objects.in_bulk(product_ids)
+    reserved = reserved_quantities(product_ids, exclude_cart=cart.pk)
+    current = dict(
+        CartItem.objects.filter(cart=cart, product_id__in=product_ids).values_list('product_id', 'quantity')
+    )
+
+    quantities = {}
+    shortages = []
+    for product_id, quantity in requested.items():
+        product = products.get(product_id)
+        if product is None or not product.available:
+            added = 0
+        else:
+            room = max(product.stock - reserved.get(product_id, 0) - current.get(product_id, 0), 0)
+            added = min(quantity, room)
+            if added:
+                quantities[product_id] = current.get(product_id, 0) + added
+        if added < quantity:
+            shortages.append({
+                'product': product,
+                'product_id': product_id,
+                'requested': quantity,
+                'added': added,
+            })
+
+    return _upsert_lines(cart, products, quantities), shortages
+
+
+def apply_coupon(cart, code):
+    """Associe un code promo au panier ; `CartError` s'il n'existe pas ou ne s'applique pas"""
+    try:
+        coupon = find_coupon(code)
+        coupon_discount(coupon, price_cart(cart).subtotal)
+    except CouponError as error:
+        raise CartError(str(error))
+    cart.coupon = coupon
+    cart.save(update_fields=['coupon', 'updated_at'])
+    return coupon
+
+
+def remove_coupon(cart):
+    cart.coupon = None
+    cart.save(update_fields=['coupon', 'updated_at'])
@@ -0,0 +1,213 @@
+"""
+Planification des livraisons par créneau.
+
+Chaque journée est découpée en créneaux (`DELIVERY_SLOTS`) disposant d'un
+nombre de camions et d'une charge maximale. L'occupation est tenue dans la
+table `DeliverySlot` (une ligne par date et créneau, index unique) : la
+réservation au paiement est un UPDATE conditionnel qui n'aboutit que s'il
+reste de la place, et la disponibilité affichée au client se lit sur ces
+seules lignes, sans parcourir les commandes.
+
+Une commande occupe un camion par tranche de `DELIVERY_TRUCK_PAYLOAD_KG` (au
+moins un) et son poids total dans la charge du créneau ; annuler ou supprimer
+la commande libère sa place.
+"""
+import math
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .models import CartItem, DeliverySlot, Order
+
+DEFAULT_SLOTS = (('08:00', '10:00'), ('10:00', '12:00'), ('13:00', '15:00'), ('15:00', '17:00'))
+
+
+class SlotUnavailable(Exception):
+    """Créneau complet, fermé ou hors de la période de réservation"""
+
+
+def slots():
+    """Créneaux d'une journée : liste de (début, fin) en `datetime.time`"""
+    return [
+        (time.fromisoformat(start), time.fromisoformat(end))
+        for start, end in getattr(settings, 'DELIVERY_SLOTS', DEFAULT_SLOTS)
+    ]
+
+
+def slot_choices():
+    """Choix (début, libellé) pour les formulaires"""
+    return [(start.strftime('%H:%M'), f'{start:%H:%M} – {end:%H:%M}') for start, end in slots()]
+
+
+def truck_capacity():
+    return getattr(settings, 'DELIVERY_SLOT_TRUCKS', 2)
+
+
+def truck_payload():
+    return Decimal(str(getattr(settings, 'DELIVERY_TRUCK_PAYLOAD_KG', 10000)))
+
+
+def booking_window(today=None):
+    """Première et dernière date réservables"""
+    today = today or timezone.localdate()
+    first = today + timedelta(days=getattr(settings, 'DELIVERY_MIN_LEAD_DAYS', 1))
+    return first, first + timedelta(days=getattr(settings, 'DELIVERY_BOOKING_DAYS', 14) - 1)
+
+
+def trucks_needed(weight):
+    """Nombre de camions pour transporter `weight` kg (au moins un)"""
+    return max(1, math.ceil(Decimal(weight) / truck_payload()))
+
+
+def cart_weight(cart):
+    """Poids total du panier (kg) en une requête"""
+    return CartItem.objects.filter(cart=cart).aggregate(
+        weight=Coalesce(
+            Sum(F('quantity') * F('product__weight'), output_field=DecimalField(max_digits=12, decimal_places=3)),
+            Decimal('0'),
+            output_field=DecimalField(max_digits=12, decimal_places=3),
+        )
+    )['weight']
+
+
+def availability(start, days=7, weight=0):
+    """
+    Disponibilité des créneaux sur `days` jours à partir de `start`.
+
+    Lit les lignes d'occupation existantes en une requête ; un créneau sans
+    ligne est entièrement libre. Un créneau est `available` s'il peut encore
+    recevoir une commande de `weight` kg.
+    """
+    first, last = booking_window()
+    end = start + timedelta(days=days - 1)
+    occupancy = {
+        (slot.date, slot.start_time): slot
+        for slot in DeliverySlot.objects.filter(date__range=(start, end))
+    }
+    trucks, weight = trucks_needed(weight), Decimal(weight)
+    default_weight = truck_capacity() * truck_payload()
+
+    calendar = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        bookable = first <= day <= last
+        entries = []
+        for slot_start, slot_end in slots():
+            slot = occupancy.get((day, slot_start))
+            remaining_trucks = slot.remaining_trucks if slot else truck_capacity()
+            remaining_weight = slot.remaining_weight if slot else default_weight
+            entries.append({
+                'start': slot_start.strftime('%H:%M'),
+                'end': slot_end.strftime('%H:%M'),
+                'remaining_trucks': remaining_trucks,
+                'remaining_weight': f'{remaining_weight:.0f}',
+                'available': bookable and remaining_trucks >= trucks and remaining_weight >= weight,
+            })
+        calendar.append({'date': day.isoformat(), 'slots': entries})
+    return calendar
+
+
+def _slot(day, start):
+    """Ligne d'occupation du créneau, créée avec la capacité par défaut au besoin"""
+    slot, _created = DeliverySlot.objects.get_or_create(
+        date=day,
+        start_time=start,
+        defaults={
+            'truck_capacity': truck_capacity(),
+            'weight_capacity': truck_capacity() * truck_payload(),
+        },
+    )
+    return slot
+
+
+def book(order, weight):
+    """
+    Réserve le créneau (`delivery_date`, `delivery_time`) de la commande pour
+    `weight` kg. L'incrément n'a lieu que si la place reste suffisante au
+    moment de l'écriture : deux paiements simultanés ne peuvent pas dépasser
+    la capacité. Lève `SlotUnavailable` sinon.
+    """
+    first, last = booking_window()
+    if order.delivery_date is None or not first <= order.delivery_date <= last:
+        raise SlotUnavailable(_("Cette date de livraison n'est pas proposée."))
+    if order.delivery_time not in [start for start, _end in slots()]:
+        raise SlotUnavailable(_("Ce créneau de livraison n'existe pas."))
+
+    weight = Decimal(weight)
+    trucks = trucks_needed(weight)
+    with transaction.atomic():
+        slot = _slot(order.delivery_date, order.delivery_time)
+        booked = DeliverySlot.objects.filter(
+            pk=slot.pk,
+            trucks_booked__lte=F('truck_capacity') - trucks,
+            weight_booked__lte=F('weight_capacity') - weight,
+        ).update(
+            trucks_booked=F('trucks_booked') + trucks,
+            weight_booked=F('weight_booked') + weight,
+            updated_at=timezone.now(),
+        )
+        if not booked:
+            raise SlotUnavailable(
+                _("Le créneau du %(date)s à %(time)s est complet, veuillez en choisir un autre.") % {
+                    'date': order.delivery_date.strftime('%d/%m/%Y'),
+                    'time': order.delivery_time.strftime('%H:%M'),
+                }
+            )
+        order.delivery_slot = slot
+        order.delivery_weight = weight
+        order.save(update_fields=['delivery_slot', 'delivery_weight', 'updated_at'])
+    return slot
+
+
+def _release(slot_id, trucks, weight):
+    DeliverySlot.objects.filter(pk=slot_id).update(
+        trucks_booked=F('trucks_booked') - trucks,
+        weight_booked=F('weight_booked') - weight,
+        updated_at=timezone.now(),
+    )
+
+
+def release(order):
+    """Libère le créneau réservé par la commande (sans effet s'il n'y en a pas)"""
+    if order.delivery_slot_id is None:
+        return
+    with transaction.atomic():
+        # Détacher d'abord : une seconde libération concurrente ne trouve plus rien
+        if not Order.objects.filter(pk=order.pk, delivery_slot=order.delivery_slot_id).update(delivery_slot=None):
+            return
+        _release(order.delivery_slot_id, trucks_needed(order.delivery_weight), order.delivery_weight)
+        order.delivery_slot = None
+
+
+def release_orders(order_ids):
+    """Libère les créneaux d'un lot de commandes (annulation en masse)"""
+    with transaction.atomic():
+        rows = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=list(order_ids))
+            .exclude(delivery_slot=None)
+            .values_list('pk', 'delivery_slot', 'delivery_weight')
+        )
+        if not rows:
+            return
+        Order.objects.filter(pk__in=[pk for pk, _slot, _weight in rows]).update(delivery_slot=None)
+        freed = {}
+        for _pk, slot_id, weight in rows:
+            trucks, total = freed.get(slot_id, (0, Decimal('0')))
+            freed[slot_id] = (trucks + trucks_needed(weight), total + weight)
+        for slot_id, (trucks, weight) in freed.items():
+            _release(slot_id, trucks, weight)
+
+
+def parse_date(value):
+    """Date ISO (AAAA-MM-JJ) ou None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,238 @@
+"""
+Tournées de livraison d'une journée.
+
+Les commandes à livrer à une date sont regroupées par zone (table
+`PostalCodeLocation`, géocodage local des codes postaux), ordonnées par
+plus proche voisin depuis le dépôt puis découpées en camions selon la charge
+utile (`DELIVERY_TRUCK_PAYLOAD_KG`) et le nombre d'arrêts
+(`DELIVERY_TRUCK_MAX_STOPS`) ; chaque tournée est enfin améliorée par 2-opt.
+
+Le plan est calculé en lot et mis en cache par date : la clé contient
+l'empreinte des commandes du jour et des codes postaux (deux agrégats
+indexés), si bien qu'une commande ajoutée, modifiée ou annulée produit un
+nouveau plan au prochain affichage, et que les affichages suivants ne
+recalculent rien. `plan_delivery_routes` le précalcule la veille.
+"""
+import csv
+import hashlib
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import latest_change
+from .delivery import truck_payload
+from .models import Order, PostalCodeLocation
+
+# Statuts des commandes encore à livrer
+DISPATCH_STATUSES = ('payee', 'en_preparation', 'expediee', 'en_livraison')
+
+DEFAULT_DEPOT = (-3.3822, 29.3644)  # Bujumbura
+
+EARTH_RADIUS_KM = 6371.0
+
+# Premiers caractères qu'un tableur interprète comme une formule
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def depot():
+    return tuple(float(value) for value in getattr(settings, 'DELIVERY_DEPOT', DEFAULT_DEPOT))
+
+
+def max_stops():
+    return getattr(settings, 'DELIVERY_TRUCK_MAX_STOPS', 15)
+
+
+def normalize_postal_code(value):
+    return (value or '').strip().upper()
+
+
+def distance(a, b):
+    """Distance (km) à vol d'oiseau entre deux points (latitude, longitude)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def deliverable_orders(day):
+    """Commandes à livrer le jour `day` (servies par l'index `order_delivery_date_idx`)"""
+    return Order.objects.filter(delivery_method='delivery', delivery_date=day, status__in=DISPATCH_STATUSES)
+
+
+def nearest_neighbor(points, start):
+    """Ordre de visite de `points` par plus proche voisin depuis `start` (liste d'indices)"""
+    remaining = set(range(len(points)))
+    order, current = [], start
+    while remaining:
+        nearest = min(remaining, key=lambda index: distance(current, points[index]))
+        remaining.remove(nearest)
+        order.append(nearest)
+        current = points[nearest]
+    return order
+
+
+def two_opt(points, start):
+    """
+    Améliore une tournée `start` → points → `start` en inversant des segments
+    tant que cela raccourcit le trajet. Retourne la nouvelle liste de points.
+    """
+    path = [start, *points, start]
+    size = len(path)
+    matrix = [[distance(a, b) for b in path] for a in path]
+    order = list(range(size))
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, size - 2):
+            for k in range(i + 1, size - 1):
+                a, b, c, d = order[i - 1], order[i], order[k], order[k + 1]
+                if matrix[a][c] + matrix[b][d] < matrix[a][b] + matrix[c][d] - 1e-9:
+                    order[i:k + 1] = reversed(order[i:k + 1])
+                    improved = True
+    return [path[index] for index in order[1:-1]]
+
+
+def route_length(points, start):
+    path = [start, *points, start]
+    return sum(distance(a, b) for a, b in zip(path, path[1:]))
+
+
+def _stops(day):
+    """Arrêts du jour avec leur poids et leur position, en deux requêtes"""
+    orders = list(
+        deliverable_orders(day)
+        .annotate(items_weight=Coalesce(
+            Sum(F('items__quantity') * F('items__product__weight'), output_field=DecimalField(max_digits=12, decimal_places=3)),
+            Decimal('0'),
+            output_field=DecimalField(max_digits=12, decimal_places=3),
+        ))
+        .order_by('delivery_time', 'created_at')
+    )
+    locations = {
+        location.postal_code: location
+        for location in PostalCodeLocation.objects.filter(
+            postal_code__in={normalize_postal_code(order.postal_code) for order in orders}
+        )
+    }
+
+    stops = []
+    for order in orders:
+        location = locations.get(normalize_postal_code(order.postal_code))
+        stops.append({
+            'order_id': str(order.pk),
+            'name': f'{order.first_name} {order.last_name}',
+            'phone': order.phone,
+            'address': order.delivery_address or order.address,
+            'postal_code': order.postal_code,
+            'city': order.city,
+            'delivery_time': order.delivery_time,
+            'status': order.get_status_display(),
+            'weight': order.delivery_weight or order.items_weight,
+            'zone': location.zone if location else None,
+            'position': (float(location.latitude), float(location.longitude)) if location else None,
+        })
+    return stops
+
+
+def _split(stops, payload, stops_per_truck):
+    """Découpe une suite d'arrêts en camions, dans l'ordre, selon la charge et le nombre d'arrêts"""
+    trucks, current, load = [], [], Decimal('0')
+    for stop in stops:
+        if current and (load + stop['weight'] > payload or len(current) >= stops_per_truck):
+            trucks.append(current)
+            current, load = [], Decimal('0')
+        current.append(stop)
+        load += stop['weight']
+    if current:
+        trucks.append(current)
+    return trucks
+
+
+def build_plan(day):
+    """Calcule les tournées du jour `day` (sans cache)"""
+    start = depot()
+    payload = truck_payload()
+    zones, unlocated = {}, []
+    for stop in _stops(day):
+        if stop['position'] is None:
+            unlocated.append(stop)
+        else:
+            zones.setdefault(stop['zone'], []).append(stop)
+
+    routes = []
+    for zone in sorted(zones):
+        stops = zones[zone]
+        visit = nearest_neighbor([stop['position'] for stop in stops], start)
+        for truck in _split([stops[index] for index in visit], payload, max_stops()):
+            by_position = {}
+            for stop in truck:
+                by_position.setdefault(stop['position'], []).append(stop)
+            # Les arrêts d'un même code postal restent groupés
+            positions = two_opt(list(by_position), start)
+            weight = sum((stop['weight'] for stop in truck), Decimal('0'))
+            routes.append({
+                'number': len(routes) + 1,
+                'zone': zone,
+                'stops': [stop for position in positions for stop in by_position[position]],
+                'weight': weight,
+                'overweight': weight > payload,
+                'distance': round(route_length(positions, start), 1),
+            })
+
+    return {
+        'date': day,
+        'generated_at': timezone.now(),
+        'routes': routes,
+        'unlocated': unlocated,
+    }
+
+
+def _cache_key(day):
+    orders = latest_change(deliverable_orders(day))
+    locations = latest_change(PostalCodeLocation.objects.all())
+    digest = hashlib.md5(repr((orders, locations)).encode()).hexdigest()
+    return f'dispatch:{day.isoformat()}:{digest}'
+
+
+def route_plan(day, refresh=False):
+    """Tournées du jour `day`, depuis le cache tant que les commandes n'ont pas changé"""
+    key = _cache_key(day)
+    plan = None if refresh else cache.get(key)
+    if plan is None:
+        plan = build_plan(day)
+        cache.set(key, plan, getattr(settings, 'DISPATCH_CACHE_TIMEOUT', 24 * 60 * 60))
+    return plan
+
+
+def spreadsheet_text(value):
+    """Texte saisi par un client, préfixé de « ' » s'il serait lu comme une formule"""
+    value = str(value or '')
+    return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+
+def write_manifest(route, day, output):
+    """Écrit le bon de livraison CSV d'un camion dans `output`"""
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow([f'Tournée {route["number"]}', spreadsheet_text(route['zone']), day.strftime('%d/%m/%Y'),
+                     f'{route["weight"]:.0f} kg', f'{route["distance"]} km'])
+    writer.writerow([
+        'Arrêt', 'Commande', 'Client', 'Téléphone', 'Adresse', 'Code postal', 'Ville',
+        'Créneau', 'Poids (kg)', 'Statut',
+    ])
+    for position, stop in enumerate(route['stops'], start=1):
+        writer.writerow([
+            position,
+            stop['order_id'],
+            spreadsheet_text(stop['name']),
+            spreadsheet_text(stop['phone']),
+            spreadsheet_text(stop['address']),
+            spreadsheet_text(stop['postal_code']),
+            spreadsheet_text(stop['city']),
+            stop['delivery_time'].strftime('%H:%M') if stop['delivery_time'] else '',
+            f'{stop["weight"]:.0f}',
+            stop['status'],
+        ])
@@ -0,0 +1,262 @@
+"""
+Factures et bons de livraison PDF.
+
+Les documents sont mis en page par `pdf` dans un pool de processus
+(`DOCUMENTS_WORKERS`), hors du cycle requête/réponse : la vue sert le fichier
+s'il existe déjà, sinon elle lance sa génération et demande au navigateur de
+revenir quelques secondes plus tard. Chaque PDF est stocké
+(`default_storage`, dossier `documents/`) sous un nom formé de l'identifiant
+et du `updated_at` de la commande : une commande modifiée produit un nouveau
+document, les autres sont servis tels quels.
+
+`monthly_invoices` produit les factures d'un mois en une archive ZIP écrite
+au fil de l'eau : les commandes sont lues par paquets, quelques PDF sont
+générés à l'avance dans le pool et chaque fichier est envoyé dès qu'il est
+compressé.
+"""
+import logging
+import multiprocessing
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from . import pdf
+from .models import Order
+from .orders import with_lines
+
+logger = logging.getLogger(__name__)
+
+# Type de document : (dossier de stockage, nom du fichier téléchargé)
+KINDS = {
+    'invoice': ('factures', 'facture'),
+    'delivery_note': ('bons-de-livraison', 'bon-de-livraison'),
+}
+
+DEFAULT_SELLER = ('Eric Digital Cementry', 'Bujumbura, Burundi')
+
+_executor = None
+_pending = {}
+_lock = threading.RLock()  # get_document soumet au pool sous le verrou
+
+
+def workers():
+    return getattr(settings, 'DOCUMENTS_WORKERS', 2)
+
+
+def executor():
+    """Pool de processus du processus courant, créé à la première demande"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            # « spawn » : les processus n'héritent ni des connexions à la base ni des threads du serveur
+            _executor = ProcessPoolExecutor(max_workers=workers(), mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _submit(kind, data):
+    global _executor
+    try:
+        return executor().submit(pdf.render, kind, data)
+    except BrokenProcessPool:
+        # Un processus du pool est mort : repartir d'un pool neuf
+        with _lock:
+            _executor = None
+        return executor().submit(pdf.render, kind, data)
+
+
+def money(value):
+    return f"{Decimal(value):,.0f} FBu".replace(',', ' ')
+
+
+def invoice_number(order):
+    return f"F-{order.created_at:%Y%m}-{str(order.pk)[:8].upper()}"
+
+
+def order_data(order, kind='invoice'):
+    """Données simples (sérialisables) d'une commande pour `pdf`, lignes préchargées ou non"""
+    items = list(order.items.all())
+    slot = ''
+    if order.delivery_date:
+        slot = order.delivery_date.strftime('%d/%m/%Y')
+        if order.delivery_time:
+            slot += order.delivery_time.strftime(' à %H:%M')
+    return {
+        'number': invoice_number(order) if kind == 'invoice' else f"BL-{str(order.pk)[:8].upper()}",
+        'order_number': f"#{str(order.pk)[:8]}",
+        'date': timezone.localtime(order.created_at).strftime('%d/%m/%Y'),
+        'seller': list(getattr(settings, 'INVOICE_SELLER', DEFAULT_SELLER)),
+        'customer': [
+            f'{order.first_name} {order.last_name}',
+            order.address,
+            f'{order.postal_code} {order.city}',
+            order.country,
+            order.phone,
+            order.email,
+        ],
+        'lines': [
+            {
+                'name': item.product.name if item.product else '—',
+                'quantity': item.quantity,
+                'unit_price': money(item.price),
+                'tax_rate': f"{item.tax_rate.normalize():f} %",
+                'total': money(item.get_cost()),
+                'weight': f"{item.product.weight * item.quantity:.0f}" if item.product else '',
+            }
+            for item in items
+        ],
+        'quantity': sum(item.quantity for item in items),
+        'weight': f"{order.delivery_weight:.0f}",
+        'subtotal': money(order.get_total_cost()),
+        'discount': money(order.discount_amount) if order.discount_amount else '',
+        'coupon': order.coupon.code if order.coupon_id else '',
+        'shipping': money(order.shipping_cost) if order.shipping_cost else 'Offerte',
+        'total': money(order.total_amount),
+        'tax': money(order.tax_amount),
+        'payment': 'payée' if order.paid else 'en attente',
+        'delivery': {
+            'method': order.get_delivery_method_display(),
+            'slot': slot,
+            'address': order.delivery_address or order.pickup_location or f'{order.address}, {order.city}',
+            'phone': order.phone,
+            'tracking_number': order.tracking_number,
+        },
+    }
+
+
+def document_name(order, kind):
+    folder, _filename = KINDS[kind]
+    return f"documents/{folder}/{order.pk}-{order.updated_at:%Y%m%d%H%M%S%f}.pdf"
+
+
+def download_name(order, kind):
+    return f"{KINDS[kind][1]}-{str(order.pk)[:8]}.pdf"
+
+
+def _store(name, content):
+    """Enregistre le PDF et supprime les versions précédentes du même document"""
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    folder, filename = name.rsplit('/', 1)
+    prefix = filename.rsplit('-', 1)[0] + '-'  # identifiant de la commande
+    _dirs, files = default_storage.listdir(folder)
+    for other in files:
+        if other.startswith(prefix) and other != filename:
+            default_storage.delete(f'{folder}/{other}')
+
+
+def _done(name, future):
+    with _lock:
+        _pending.pop(name, None)
+    try:
+        _store(name, future.result())
+    except Exception:
+        logger.exception("Échec de la génération du document %s", name)
+
+
+def get_document(order, kind):
+    """
+    Nom du PDF stocké s'il est à jour ; sinon lance sa génération dans le
+    pool (une seule fois par version) et retourne None.
+    """
+    name = document_name(order, kind)
+    if default_storage.exists(name):
+        return name
+    with _lock:
+        if name in _pending:
+            return None
+    data = order_data(order, kind)
+    with _lock:
+        if name in _pending:
+            return None
+        future = _pending[name] = _submit(kind, data)
+    future.add_done_callback(partial(_done, name))
+    return None
+
+
+def month_orders(year, month):
+    """Commandes payées du mois, lignes et produits préchargés"""
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return with_lines(
+        Order.objects.filter(paid=True, created_at__gte=start, created_at__lt=end).select_related('coupon')
+    ).order_by('created_at')
+
+
+class _ZipStream:
+    """Flux d'écriture non positionnable : `zipfile` y écrit, le générateur le vide"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _invoice_source(order):
+    """Fonction retournant le PDF de la facture : le fichier stocké, ou une génération lancée dans le pool"""
+    name = document_name(order, 'invoice')
+    if default_storage.exists(name):
+        def read():
+            with default_storage.open(name, 'rb') as stored:
+                return stored.read()
+        return read
+    future = _submit('invoice', order_data(order, 'invoice'))
+
+    def result():
+        content = future.result()
+        _store(name, content)
+        return content
+    return result
+
+
+def monthly_invoices(year, month):
+    """Archive ZIP des factures du mois, produite morceau par morceau (pour StreamingHttpResponse)"""
+    stream = _ZipStream()
+    ahead = deque()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for order in month_orders(year, month).iterator(chunk_size=100):
+            ahead.append((f"{invoice_number(order)}.pdf", _invoice_source(order)))
+            # Garder quelques générations d'avance pour occuper le pool sans tout charger en mémoire
+            if len(ahead) > workers() * 2:
+                filename, source = ahead.popleft()
+                archive.writestr(filename, source())
+                yield stream.drain()
+        while ahead:
+            filename, source = ahead.popleft()
+            archive.writestr(filename, source())
+            yield stream.drain()
+    yield stream.drain()
+
+
+def document_response(request, order, kind):
+    """Le PDF en téléchargement s'il est prêt, sinon une page d'attente qui se recharge (202)"""
+    name = get_document(order, kind)
+    if name is None:
+        return render(request, 'boutique/document_pending.html', {'order': order, 'kind': kind}, status=202)
+    return FileResponse(
+        default_storage.open(name, 'rb'),
+        as_attachment=True,
+        filename=download_name(order, kind),
+        content_type='application/pdf',
+    )
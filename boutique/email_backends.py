@@ -0,0 +1,42 @@
+"""
+Backend d'e-mail « à blanc » pour le développement et les tests.
+
+Basé sur le backend console de Django : chaque e-mail est résumé en une ligne
+(destinataire, objet) au lieu d'être imprimé en entier, et les adresses du
+domaine réservé `.invalid` sont refusées comme par un vrai serveur SMTP, ce
+qui permet d'exercer les nouvelles tentatives de la boîte d'envoi.
+
+    EMAIL_BACKEND = 'boutique.email_backends.DryRunEmailBackend'
+"""
+import smtplib
+
+from django.core.mail.backends.console import EmailBackend as ConsoleEmailBackend
+
+
+class DryRunEmailBackend(ConsoleEmailBackend):
+    """N'envoie rien : une ligne par e-mail sur la sortie standard"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = 0  # ouvertures de « connexion », pour vérifier leur réutilisation
+        self.opened = False
+
+    def open(self):
+        if self.opened:
+            return False
+        self.opened = True
+        self.connections += 1
+        return True
+
+    def close(self):
+        self.opened = False
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            refused = {address: (550, b'Unknown recipient') for address in message.recipients() if address.endswith('.invalid')}
+            if refused:
+                raise smtplib.SMTPRecipientsRefused(refused)
+        return super().send_messages(email_messages)
+
+    def write_message(self, message):
+        self.stream.write(f"[dry-run] {', '.join(message.recipients())} : {message.subject}\n")
@@ -0,0 +1,308 @@
+"""
+Navigation à facettes du catalogue : catégorie, tranche de prix, stock et
+spécifications techniques (classe du ciment, poids du sac...).
+
+Chaque processus garde en mémoire un bitmap (entier Python) par valeur de
+facette : le bit `i` est levé si le produit de position `i` a cette valeur.
+Les positions suivent l'ordre de création des produits, le bit de poids fort
+est donc le produit le plus récent. Filtrer revient à combiner des bitmaps
+(OU entre les valeurs d'une facette, ET entre facettes) et compter à
+`int.bit_count()`, sans GROUP BY sur Product × ProductSpecification.
+
+Les compteurs d'une facette sont calculés avec les filtres des autres
+facettes seulement : cocher « 42.5 » n'annule pas le compteur de « 32.5 ».
+
+L'index est tenu à jour par incréments : au plus toutes les
+`FACETS_CHECK_INTERVAL` secondes, les produits modifiés depuis la dernière
+synchronisation (`updated_at`, touché aussi par leurs spécifications) sont
+relus et reportés dans les bitmaps. Un produit supprimé (nombre de produits
+différent) ou un index de plus de `FACETS_MAX_AGE` secondes entraîne une
+reconstruction complète. Le prix filtré est le prix catalogue, hors
+promotions.
+"""
+import re
+import threading
+import time
+from datetime import timedelta
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from .models import Product, ProductSpecification
+
+AVAILABLE = ('available',)
+IN_STOCK = ('stock',)
+
+FIELDS = ('pk', 'category_id', 'price', 'stock', 'available', 'updated_at')
+
+# Relecture des produits validés peu après la dernière synchronisation (transactions longues)
+SYNC_MARGIN = timedelta(seconds=60)
+
+_lock = threading.Lock()
+_state = {'index': None, 'checked_at': 0.0}
+
+
+def price_bands():
+    """[(clé, minimum, maximum)] des tranches de prix, bornes `FACETS_PRICE_BANDS` en FBu"""
+    bounds = [None, *getattr(settings, 'FACETS_PRICE_BANDS', [10000, 25000, 50000, 100000]), None]
+    return [
+        (f"{low or ''}-{high or ''}", low, high)
+        for low, high in zip(bounds, bounds[1:])
+    ]
+
+
+def _amount(value):
+    return f"{int(value):,}".replace(",", " ")
+
+
+def band_label(low, high):
+    if low is None:
+        return _('Moins de %(high)s FBu') % {'high': _amount(high)}
+    if high is None:
+        return _('%(low)s FBu et plus') % {'low': _amount(low)}
+    return _('%(low)s à %(high)s FBu') % {'low': _amount(low), 'high': _amount(high)}
+
+
+def product_keys(row, specifications, bands):
+    """Valeurs de facettes d'un produit (aucune s'il n'est pas disponible)"""
+    if not row['available']:
+        return ()
+    keys = [AVAILABLE, ('category', row['category_id'])]
+    if row['stock'] > 0:
+        keys.append(IN_STOCK)
+    for key, low, high in bands:
+        if (low is None or row['price'] >= low) and (high is None or row['price'] < high):
+            keys.append(('price', key))
+            break
+    keys.extend(('spec', name, value) for name, value in specifications)
+    return tuple(keys)
+
+
+def _specifications(**filters):
+    specifications = {}
+    rows = ProductSpecification.objects.filter(**filters).values_list('product_id', 'name', 'value')
+    for product_id, name, value in rows.iterator():
+        specifications.setdefault(product_id, []).append((name.strip(), value.strip()))
+    return specifications
+
+
+class FacetIndex:
+    """Bitmaps des valeurs de facettes, indexés par position de produit"""
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+        self.memberships = []
+        self.bitmaps = {}
+        self.bands = price_bands()
+        self.built_at = time.time()
+        self.synced_at = None
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        specifications = _specifications()
+        rows = Product.objects.order_by('created_at', 'pk').values(*FIELDS)
+        for row in rows.iterator(chunk_size=2000):
+            index.put(row, specifications.get(row['pk'], ()))
+        return index
+
+    def put(self, row, specifications):
+        """Reporte l'état d'un produit : seuls ses anciens et nouveaux bitmaps sont modifiés"""
+        position = self.positions.get(row['pk'])
+        if position is None:
+            position = self.positions[row['pk']] = len(self.ids)
+            self.ids.append(row['pk'])
+            self.memberships.append(())
+        bit = 1 << position
+        for key in self.memberships[position]:
+            bitmap = self.bitmaps[key] & ~bit
+            if bitmap:
+                self.bitmaps[key] = bitmap
+            else:
+                del self.bitmaps[key]
+        keys = product_keys(row, specifications, self.bands)
+        for key in keys:
+            self.bitmaps[key] = self.bitmaps.get(key, 0) | bit
+        self.memberships[position] = keys
+        if self.synced_at is None or row['updated_at'] > self.synced_at:
+            self.synced_at = row['updated_at']
+
+    def sync(self):
+        """Index à jour : celui-ci complété des produits modifiés, ou un index reconstruit"""
+        if self.synced_at is None or time.time() - self.built_at > getattr(settings, 'FACETS_MAX_AGE', 3600):
+            return FacetIndex.build()
+        rows = list(
+            Product.objects.filter(updated_at__gte=self.synced_at - SYNC_MARGIN)
+            .order_by('created_at', 'pk').values(*FIELDS)
+        )
+        if rows:
+            specifications = _specifications(product_id__in=[row['pk'] for row in rows])
+            for row in rows:
+                self.put(row, specifications.get(row['pk'], ()))
+        if Product.objects.count() != len(self.ids):
+            return FacetIndex.build()
+        return self
+
+    def bitmap(self, pks):
+        bits = bytearray((len(self.ids) + 7) // 8)
+        for pk in pks:
+            position = self.positions.get(pk)
+            if position is not None:
+                bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, 'little')
+
+    def union(self, keys):
+        return reduce(or_, (self.bitmaps.get(key, 0) for key in keys), 0)
+
+    def search(self, params, category_id=None, pks=None):
+        """
+        Produits et compteurs pour les filtres de `params` (QueryDict) :
+        `en_stock=1`, `prix=<tranche>` et `spec=<nom>:<valeur>`, répétables.
+        `pks` restreint le catalogue (recherche plein texte).
+        """
+        scope = self.bitmaps.get(AVAILABLE, 0)
+        if pks is not None:
+            scope &= self.bitmap(pks)
+        base = scope & self.bitmaps.get(('category', category_id), 0) if category_id else scope
+
+        selected_prices = [key for key, _low, _high in self.bands if key in params.getlist('prix')]
+        selected_specs = {}
+        for choice in params.getlist('spec'):
+            name, separator, value = choice.partition(':')
+            if separator:
+                selected_specs.setdefault(name, set()).add(value)
+
+        filters = {}
+        if params.get('en_stock') == '1':
+            filters['stock'] = self.bitmaps.get(IN_STOCK, 0)
+        if selected_prices:
+            filters['price'] = self.union(('price', key) for key in selected_prices)
+        for name, values in selected_specs.items():
+            filters[('spec', name)] = self.union(('spec', name, value) for value in values)
+
+        def narrowed(bitmap, skip=None):
+            for facet, allowed in filters.items():
+                if facet != skip:
+                    bitmap &= allowed
+            return bitmap
+
+        categories = narrowed(scope)
+        stock = narrowed(base, 'stock')
+        prices = narrowed(base, 'price')
+        specs, others = {}, {}
+        for key, bitmap in self.bitmaps.items():
+            if key[0] != 'spec':
+                continue
+            name, value = key[1], key[2]
+            if name not in others:
+                others[name] = narrowed(base, ('spec', name))
+            count = (others[name] & bitmap).bit_count()
+            checked = value in selected_specs.get(name, ())
+            if count or checked:
+                specs.setdefault(name, []).append((value, count, checked))
+
+        return FacetResult(
+            products=ProductResults(self.ids, narrowed(base)),
+            categories={
+                key[1]: (categories & bitmap).bit_count()
+                for key, bitmap in self.bitmaps.items() if key[0] == 'category'
+            },
+            in_stock=((stock & self.bitmaps.get(IN_STOCK, 0)).bit_count(), 'stock' in filters),
+            prices=[
+                (key, band_label(low, high), (prices & self.bitmaps.get(('price', key), 0)).bit_count(), key in selected_prices)
+                for key, low, high in self.bands
+            ],
+            specifications=_shown_specifications(specs, selected_specs),
+            active=bool(filters),
+        )
+
+
+def _shown_specifications(specs, selected):
+    """
+    Spécifications proposées : celles qui départagent au moins deux valeurs
+    (ou déjà filtrées), les plus répandues d'abord.
+    """
+    max_specs = getattr(settings, 'FACETS_MAX_SPECIFICATIONS', 8)
+    max_values = getattr(settings, 'FACETS_MAX_VALUES', 12)
+    shown = []
+    for name, values in specs.items():
+        if len(values) < 2 and name not in selected:
+            continue
+        values.sort(key=lambda value: (not value[2], -value[1], value[0]))
+        shown.append((sum(count for _value, count, _checked in values), name, sorted(values[:max_values])))
+    shown.sort(key=lambda spec: (spec[1] not in selected, -spec[0], spec[1]))
+    return [(name, values) for _total, name, values in shown[:max_specs]]
+
+
+class FacetResult:
+    """Produits filtrés et compteurs des facettes"""
+
+    def __init__(self, products, categories, in_stock, prices, specifications, active):
+        self.products = products
+        self.categories = categories
+        self.in_stock = in_stock
+        self.prices = prices
+        self.specifications = specifications
+        self.active = active
+
+
+class ProductResults:
+    """
+    Produits d'un bitmap, du plus récent au plus ancien. Séquence paginable :
+    seule la tranche demandée est lue en base.
+    """
+
+    def __init__(self, ids, bitmap):
+        self.ids = ids
+        self.bitmap = bitmap
+        self.size = bitmap.bit_count()
+
+    def __len__(self):
+        return self.size
+
+    def positions(self):
+        bits = bin(self.bitmap)[2:] if self.bitmap else ''
+        return (len(bits) - 1 - match.start() for match in re.finditer('1', bits))
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start, stop, _step = item.indices(self.size)
+        pks = [self.ids[position] for position in islice(self.positions(), start, stop)]
+        products = Product.objects.select_related('category').in_bulk(pks)
+        return [products[pk] for pk in pks if pk in products]
+
+
+def facet_index():
+    """Index de ce processus, synchronisé au plus toutes les `FACETS_CHECK_INTERVAL` secondes"""
+    now = time.monotonic()
+    with _lock:
+        index = _state['index']
+        if index is None:
+            index = FacetIndex.build()
+        elif now - _state['checked_at'] >= getattr(settings, 'FACETS_CHECK_INTERVAL', 5):
+            index = index.sync()
+        else:
+            return index
+        _state.update(index=index, checked_at=now)
+        return index
+
+
+def search(params, category=None, queryset=None):
+    """
+    Filtre le catalogue selon `params`. `queryset` (recherche plein texte)
+    limite les produits considérés ; sans lui, aucune requête de filtrage.
+    """
+    pks = None if queryset is None else list(queryset.values_list('pk', flat=True))
+    index = facet_index()
+    with _lock:
+        return index.search(params, category.pk if category else None, pks)
+
+
+def expire():
+    """Force la synchronisation à la prochaine recherche (modification faite par ce processus)"""
+    _state['checked_at'] = 0.0
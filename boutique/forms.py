@@ -3,7 +3,7 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 import stripe
-from datetime import datetime
+from datetime import datetime, time
 
 
 class AddToCartForm(forms.Form):
@@ -19,13 +19,54 @@ class AddToCartForm(forms.Form):
     )
 
 
+class QuickOrderForm(forms.Form):
+    """
+    Commande rapide : une quantité par produit disponible, envoyée en une fois.
+    Les champs sont nommés `quantity_<id du produit>`.
+    """
+
+    def __init__(self, *args, products=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.products = list(products)
+        for product in self.products:
+            self.fields[f'quantity_{product.pk}'] = forms.IntegerField(
+                label=product.name,
+                min_value=0,
+                required=False,
+                widget=forms.NumberInput(attrs={
+                    'class': 'form-control form-control-sm',
+                    'min': '0',
+                    'style': 'width: 90px;',
+                })
+            )
+
+    def rows(self):
+        """Couples (produit, champ lié) pour le gabarit"""
+        return [(product, self[f'quantity_{product.pk}']) for product in self.products]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.get_entries():
+            raise forms.ValidationError(_("Indiquez au moins une quantité."))
+        return cleaned_data
+
+    def get_entries(self):
+        """Liste des couples (product_id, quantité) saisis"""
+        return [
+            (product.pk, self.cleaned_data.get(f'quantity_{product.pk}'))
+            for product in self.products
+            if self.cleaned_data.get(f'quantity_{product.pk}')
+        ]
+
+
 class CheckoutForm(forms.ModelForm):
     class Meta:
         from .models import Order
         model = Order
         fields = [
             'first_name', 'last_name', 'email', 'address',
-            'postal_code', 'city', 'country', 'phone'
+            'postal_code', 'city', 'country', 'phone',
+            'delivery_method', 'delivery_date', 'delivery_time'
         ]
         widgets = {
             'first_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -36,6 +77,8 @@ class CheckoutForm(forms.ModelForm):
             'city': forms.TextInput(attrs={'class': 'form-control'}),
             'country': forms.TextInput(attrs={'class': 'form-control'}),
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
+            'delivery_method': forms.RadioSelect(attrs={'class': 'form-check-input'}),
+            'delivery_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d'),
         }
         labels = {
             'first_name': _('Prénom'),
@@ -46,11 +89,45 @@ class CheckoutForm(forms.ModelForm):
             'city': _('Ville'),
             'country': _('Pays'),
             'phone': _('Téléphone'),
+            'delivery_method': _('Mode de livraison'),
+            'delivery_date': _('Date de livraison'),
         }
 
     def __init__(self, *args, **kwargs):
+        from .delivery import booking_window, slot_choices
         super().__init__(*args, **kwargs)
         self.fields['country'].initial = 'France'
+        first, last = booking_window()
+        self.fields['delivery_date'].widget.attrs.update(min=first.isoformat(), max=last.isoformat())
+        self.fields['delivery_time'] = forms.TypedChoiceField(
+            label=_('Créneau'),
+            choices=[('', _('Choisissez un créneau'))] + slot_choices(),
+            coerce=time.fromisoformat,
+            empty_value=None,
+            required=False,
+            widget=forms.Select(attrs={'class': 'form-select'}),
+        )
+
+    def clean(self):
+        from .delivery import booking_window, slots
+        cleaned_data = super().clean()
+        if cleaned_data.get('delivery_method') != 'delivery':
+            cleaned_data['delivery_date'] = cleaned_data['delivery_time'] = None
+            return cleaned_data
+
+        delivery_date = cleaned_data.get('delivery_date')
+        delivery_time = cleaned_data.get('delivery_time')
+        first, last = booking_window()
+        if delivery_date is None:
+            self.add_error('delivery_date', _("Choisissez une date de livraison."))
+        elif not first <= delivery_date <= last:
+            self.add_error('delivery_date', _("Les livraisons sont proposées du %(first)s au %(last)s.") % {
+                'first': first.strftime('%d/%m/%Y'),
+                'last': last.strftime('%d/%m/%Y'),
+            })
+        if delivery_time not in [start for start, _end in slots()]:
+            self.add_error('delivery_time', _("Choisissez un créneau de livraison."))
+        return cleaned_data
 
 
 class PaymentForm(forms.Form):
@@ -286,7 +363,7 @@ class CategoryForm(forms.ModelForm):
     class Meta:
         from .models import Category
         model = Category
-        fields = ['name', 'image', 'description']
+        fields = ['name', 'image', 'description', 'tax_class']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -301,12 +378,14 @@ class CategoryForm(forms.ModelForm):
                 'class': 'd-none',
                 'accept': 'image/jpeg,image/png,image/webp',
                 'id': 'category-image-input'
-            })
+            }),
+            'tax_class': forms.Select(attrs={'class': 'form-select'}),
         }
         labels = {
             'name': _('Nom de la catégorie'),
             'image': _('Image de la catégorie'),
-            'description': _('Description')
+            'description': _('Description'),
+            'tax_class': _('Classe de TVA'),
         }
         help_texts = {
             'name': _('Le nom de la catégorie tel qu\'il apparaîtra sur le site.'),
@@ -347,10 +426,11 @@ class ProductForm(forms.ModelForm):
         model = Product
         fields = [
             'category', 'name', 'slug', 'image', 'description',
-            'price', 'available', 'stock'
+            'price', 'tax_class', 'available', 'stock', 'weight', 'volume'
         ]
         widgets = {
             'category': forms.Select(attrs={'class': 'form-select'}),
+            'tax_class': forms.Select(attrs={'class': 'form-select'}),
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'slug': forms.TextInput(attrs={'class': 'form-control'}),
             'image': forms.ClearableFileInput(attrs={'class': 'form-control'}),
@@ -364,6 +444,16 @@ class ProductForm(forms.ModelForm):
                 'class': 'form-control',
                 'min': '0'
             }),
+            'weight': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'step': '0.001',
+                'min': '0'
+            }),
+            'volume': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'step': '0.0001',
+                'min': '0'
+            }),
         }
         labels = {
             'category': _('Catégorie'),
@@ -372,8 +462,11 @@ class ProductForm(forms.ModelForm):
             'image': _('Image principale'),
             'description': _('Description'),
             'price': _('Prix'),
+            'tax_class': _('Classe de TVA'),
             'available': _('Disponible'),
             'stock': _('Stock'),
+            'weight': _('Poids unitaire (kg)'),
+            'volume': _('Volume unitaire (m³)'),
         }
 
 
@@ -384,7 +477,83 @@ class OrderStatusForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     
+    tracking_number = forms.CharField(
+        label=_('Numéro de suivi'),
+        max_length=100,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    note = forms.CharField(
+        label=_('Note'),
+        max_length=255,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    
+    def __init__(self, *args, choices=None, **kwargs):
+        from .models import Order
+        super().__init__(*args, **kwargs)
+        # Par défaut tous les statuts ; l'administration ne propose que les transitions permises
+        self.fields['status'].choices = Order.STATUS_CHOICES if choices is None else choices
+
+
+class OrderBulkStatusForm(forms.Form):
+    """Changement de statut d'une sélection de commandes"""
+    status = forms.ChoiceField(
+        label=_('Nouveau statut'),
+        choices=[],
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    note = forms.CharField(
+        label=_('Note'),
+        max_length=255,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm'})
+    )
+    
     def __init__(self, *args, **kwargs):
         from .models import Order
         super().__init__(*args, **kwargs)
         self.fields['status'].choices = Order.STATUS_CHOICES
+
+
+class TrackingImportForm(forms.Form):
+    """Import de numéros de suivi : liste collée ou fichier CSV « commande ; numéro »"""
+    MARK_AS_CHOICES = (
+        ('', _('Ne pas changer le statut')),
+        ('expediee', _('Passer à « Expédiée »')),
+        ('en_livraison', _('Passer à « En cours de livraison »')),
+    )
+    
+    data = forms.CharField(
+        label=_('Liste collée'),
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'form-control font-monospace',
+            'rows': 10,
+            'placeholder': 'identifiant-de-commande;numéro-de-suivi',
+        })
+    )
+    file = forms.FileField(
+        label=_('Ou fichier CSV'),
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.txt'})
+    )
+    mark_as = forms.ChoiceField(
+        label=_('Statut'),
+        choices=MARK_AS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload:
+            try:
+                cleaned_data['data'] = upload.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise forms.ValidationError(_("Le fichier doit être encodé en UTF-8."))
+        if not cleaned_data.get('data', '').strip():
+            raise forms.ValidationError(_("Collez une liste ou choisissez un fichier."))
+        return cleaned_data
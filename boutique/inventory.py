@@ -0,0 +1,107 @@
+"""
+Détection des stocks faibles et file de réapprovisionnement.
+
+Chaque modification du stock d'un produit déclenche `evaluate_stock_level`
+(voir le signal `check_low_stock` dans models.py) : on compare le stock au
+seuil de la catégorie et on insère, met à jour ou retire la ligne
+correspondante de `ReorderItem`. Aucun balayage complet n'est nécessaire ;
+`rebuild_reorder_queue` ne sert qu'à l'initialisation et au rafraîchissement
+périodique des vitesses de vente (commande `rebuild_reorder_queue`).
+
+Les mises à jour faites par `QuerySet.update()` contournent les signaux :
+appelez `evaluate_stock_level` explicitement après ce type d'écriture.
+"""
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import OrderItem, Product, ReorderItem
+
+
+def get_velocity_window():
+    """Nombre de jours de ventes pris en compte pour la vitesse d'écoulement"""
+    return getattr(settings, 'LOW_STOCK_VELOCITY_DAYS', 30)
+
+
+def get_cover_target():
+    """Nombre de jours de couverture visés lors d'un réapprovisionnement"""
+    return getattr(settings, 'REORDER_COVER_DAYS', 30)
+
+
+def sales_velocity(product_id, days=None):
+    """Retourne le nombre moyen d'unités vendues par jour sur la période"""
+    days = days or get_velocity_window()
+    since = timezone.now() - timedelta(days=days)
+    sold = OrderItem.objects.filter(
+        product_id=product_id,
+        order__created_at__gte=since,
+    ).exclude(
+        order__status='annulee'
+    ).aggregate(total=Sum('quantity'))['total'] or 0
+    return Decimal(sold) / Decimal(days)
+
+
+def _queue_values(stock, threshold, velocity):
+    """Calcule les colonnes de la file pour un produit en stock faible"""
+    if velocity > 0:
+        days_of_cover = (Decimal(stock) / velocity).quantize(Decimal('0.1'))
+        target = math.ceil(velocity * get_cover_target())
+    else:
+        days_of_cover = None
+        target = threshold + 1
+    return {
+        'stock': stock,
+        'threshold': threshold,
+        'daily_velocity': velocity.quantize(Decimal('0.01')),
+        'days_of_cover': days_of_cover,
+        'suggested_quantity': max(target - stock, 0),
+    }
+
+
+def evaluate_stock_level(product, threshold=None):
+    """
+    Réévalue un seul produit après un changement de stock.
+
+    Retourne True si le produit est (ou reste) dans la file de réapprovisionnement.
+    """
+    if threshold is None:
+        threshold = product.category.low_stock_threshold
+
+    if not product.available or product.stock > threshold:
+        ReorderItem.objects.filter(product_id=product.pk).delete()
+        return False
+
+    velocity = sales_velocity(product.pk)
+    ReorderItem.objects.update_or_create(
+        product_id=product.pk,
+        defaults=_queue_values(product.stock, threshold, velocity),
+    )
+    return True
+
+
+def rebuild_reorder_queue(products=None):
+    """
+    Reconstruit la file pour un ensemble de produits (tous par défaut).
+
+    Utilisé à l'initialisation, lorsqu'un seuil de catégorie change et pour
+    rafraîchir chaque nuit les vitesses de vente.
+    """
+    if products is None:
+        products = Product.objects.all()
+    low_stock = products.filter(
+        available=True,
+        stock__lte=F('category__low_stock_threshold'),
+    )
+
+    # Retirer d'un coup les produits qui ne sont plus en stock faible
+    ReorderItem.objects.filter(product__in=products).exclude(product__in=low_stock).delete()
+
+    queued = 0
+    for product in low_stock.select_related('category').iterator():
+        evaluate_stock_level(product, product.category.low_stock_threshold)
+        queued += 1
+    return queued
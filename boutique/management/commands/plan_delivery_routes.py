@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from boutique.delivery import parse_date
+from boutique.dispatch import route_plan
+
+
+class Command(BaseCommand):
+    help = "Calcule et met en cache les tournées de livraison d'une date (demain par défaut, à lancer la veille via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Date des livraisons (AAAA-MM-JJ)")
+
+    def handle(self, *args, **options):
+        day = timezone.localdate() + timedelta(days=1)
+        if options['date']:
+            day = parse_date(options['date'])
+            if day is None:
+                raise CommandError("Date invalide, format attendu : AAAA-MM-JJ")
+
+        plan = route_plan(day, refresh=True)
+        stops = sum(len(route['stops']) for route in plan['routes'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(plan['routes'])} tournée(s), {stops} arrêt(s) pour le {day:%d/%m/%Y}."
+        ))
+        if plan['unlocated']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(plan['unlocated'])} commande(s) sans code postal géolocalisé."
+            ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from boutique.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recalcule les produits fréquemment achetés ensemble (à lancer périodiquement, ex. chaque nuit via cron)"
+
+    def handle(self, *args, **options):
+        covered = rebuild_recommendations()
+        self.stdout.write(self.style.SUCCESS(f"Recommandations calculées pour {covered} produit(s)."))
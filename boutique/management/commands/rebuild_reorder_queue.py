@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from boutique.inventory import rebuild_reorder_queue
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la file de réapprovisionnement et rafraîchit les vitesses de vente"
+
+    def handle(self, *args, **options):
+        queued = rebuild_reorder_queue()
+        self.stdout.write(self.style.SUCCESS(
+            f"{queued} produit(s) en stock faible dans la file de réapprovisionnement."
+        ))
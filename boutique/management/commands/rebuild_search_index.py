@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from boutique.autocomplete import index_path, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit depuis la base l'index des suggestions de recherche (via cron, ex. toutes les heures, et après un import en masse)"
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Index des suggestions écrit dans {index_path()}."))
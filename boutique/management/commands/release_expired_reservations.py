@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from boutique.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = "Libère les réservations de stock expirées (à lancer régulièrement, ex. toutes les minutes via cron)"
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"{released} réservation(s) expirée(s) libérée(s)."))
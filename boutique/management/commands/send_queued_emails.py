@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from boutique.outbox import send_queued
+
+
+class Command(BaseCommand):
+    help = "Envoie les e-mails de la boîte d'envoi par lots (via cron, ou en continu avec --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="E-mails par lot (EMAIL_OUTBOX_BATCH_SIZE par défaut)")
+        parser.add_argument('--loop', type=int, metavar='SECONDES', help="Vider la boîte toutes les SECONDES secondes, sans s'arrêter")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, given_up = send_queued(options['batch_size'])
+            if sent or given_up or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"{sent} e-mail(s) envoyé(s), {given_up} abandonné(s)."))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
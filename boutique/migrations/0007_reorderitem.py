@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0006_category_backorder_allowed_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(verbose_name='stock restant')),
+                ('threshold', models.PositiveIntegerField(verbose_name="seuil d'alerte")),
+                ('daily_velocity', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='ventes par jour')),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text='Nombre de jours avant rupture au rythme des ventes récentes (vide si aucune vente).', max_digits=10, null=True, verbose_name='jours de couverture')),
+                ('suggested_quantity', models.PositiveIntegerField(default=0, verbose_name='quantité à commander')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='signalé le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='mis à jour le')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_item', to='boutique.product', verbose_name='produit')),
+            ],
+            options={
+                'verbose_name': 'article à réapprovisionner',
+                'verbose_name_plural': 'articles à réapprovisionner',
+                'ordering': (models.OrderBy(models.F('days_of_cover'), nulls_last=True), 'stock'),
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0007_reorderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='quantité réservée')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='expire le')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='créée le')),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='boutique.cart', verbose_name='panier')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='boutique.product', verbose_name='produit')),
+            ],
+            options={
+                'verbose_name': 'réservation de stock',
+                'verbose_name_plural': 'réservations de stock',
+                'indexes': [models.Index(fields=['product', 'expires_at', 'quantity'], name='reservation_live_idx')],
+                'unique_together': {('cart', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0008_stockreservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'approved', '-created_at', '-id'], name='review_feed_idx'),
+        ),
+    ]
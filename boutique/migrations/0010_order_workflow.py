@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0009_review_feed_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('en_attente', 'En attente de paiement'), ('payee', 'Payée'), ('en_preparation', 'En préparation'), ('prete', 'Prête à être récupérée'), ('expediee', 'Expédiée'), ('en_livraison', 'En cours de livraison'), ('livree', 'Livrée'), ('recuperee', 'Récupérée'), ('annulee', 'Annulée')], max_length=20, verbose_name='statut précédent')),
+                ('to_status', models.CharField(choices=[('en_attente', 'En attente de paiement'), ('payee', 'Payée'), ('en_preparation', 'En préparation'), ('prete', 'Prête à être récupérée'), ('expediee', 'Expédiée'), ('en_livraison', 'En cours de livraison'), ('livree', 'Livrée'), ('recuperee', 'Récupérée'), ('annulee', 'Annulée')], max_length=20, verbose_name='nouveau statut')),
+                ('note', models.CharField(blank=True, max_length=255, verbose_name='note')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='date')),
+            ],
+            options={
+                'verbose_name': 'transition de commande',
+                'verbose_name_plural': 'transitions de commande',
+                'ordering': ('created_at', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ('payee', 'en_preparation', 'prete'))), fields=['status', 'delivery_method', 'created_at'], name='order_work_queue_idx'),
+        ),
+        migrations.AddField(
+            model_name='ordertransition',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='boutique.order', verbose_name='commande'),
+        ),
+        migrations.AddField(
+            model_name='ordertransition',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_transitions', to=settings.AUTH_USER_MODEL, verbose_name='effectué par'),
+        ),
+        migrations.AddIndex(
+            model_name='ordertransition',
+            index=models.Index(fields=['order', 'created_at'], name='order_transition_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordertransition',
+            index=models.Index(fields=['to_status', 'created_at'], name='transition_status_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:12
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0010_order_workflow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivery_weight',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=12, verbose_name='poids à livrer (kg)'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='weight',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Utilisé pour planifier la charge des camions de livraison.', max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='poids unitaire (kg)'),
+        ),
+        migrations.CreateModel(
+            name='DeliverySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('start_time', models.TimeField(verbose_name='début du créneau')),
+                ('truck_capacity', models.PositiveSmallIntegerField(verbose_name='camions disponibles')),
+                ('weight_capacity', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='charge maximale (kg)')),
+                ('trucks_booked', models.PositiveSmallIntegerField(default=0, verbose_name='camions réservés')),
+                ('weight_booked', models.DecimalField(decimal_places=3, default=0, max_digits=12, verbose_name='charge réservée (kg)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='mis à jour le')),
+            ],
+            options={
+                'verbose_name': 'créneau de livraison',
+                'verbose_name_plural': 'créneaux de livraison',
+                'ordering': ('date', 'start_time'),
+                'constraints': [models.UniqueConstraint(fields=('date', 'start_time'), name='delivery_slot_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='boutique.deliveryslot', verbose_name='créneau réservé'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0011_delivery_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostalCodeLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postal_code', models.CharField(max_length=20, unique=True, verbose_name='code postal')),
+                ('zone', models.CharField(max_length=100, verbose_name='zone de livraison')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='latitude')),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='longitude')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='mis à jour le')),
+            ],
+            options={
+                'verbose_name': 'code postal géolocalisé',
+                'verbose_name_plural': 'codes postaux géolocalisés',
+                'ordering': ('zone', 'postal_code'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('delivery_method', 'delivery')), fields=['delivery_date', 'status'], name='order_delivery_date_idx'),
+        ),
+    ]
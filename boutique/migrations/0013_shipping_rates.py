@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:16
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0012_dispatch_routes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shipping_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='frais de livraison'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='volume',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Utilisé avec le poids pour calculer les frais de livraison.', max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='volume unitaire (m³)'),
+        ),
+        migrations.CreateModel(
+            name='ShippingRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zone', models.CharField(blank=True, help_text='Laisser vide pour la grille par défaut, appliquée aux zones sans grille propre.', max_length=100, verbose_name='zone de livraison')),
+                ('min_weight', models.DecimalField(decimal_places=3, default=0, help_text="Poids taxable à partir duquel la tranche s'applique.", max_digits=12, validators=[django.core.validators.MinValueValidator(0)], verbose_name='à partir de (kg)')),
+                ('base_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='forfait')),
+                ('price_per_kg', models.DecimalField(decimal_places=4, default=0, max_digits=10, verbose_name='prix par kg')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='mis à jour le')),
+            ],
+            options={
+                'verbose_name': 'tarif de livraison',
+                'verbose_name_plural': 'tarifs de livraison',
+                'ordering': ('zone', 'min_weight'),
+                'constraints': [models.UniqueConstraint(fields=('zone', 'min_weight'), name='shipping_rate_tier_unique')],
+            },
+        ),
+    ]
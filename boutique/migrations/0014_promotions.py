@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:20
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0013_shipping_rates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Coupon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True, verbose_name='code')),
+                ('kind', models.CharField(choices=[('percent', 'Pourcentage'), ('fixed', 'Montant fixe par unité')], default='percent', max_length=10, verbose_name='type de remise')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='valeur')),
+                ('min_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='sous-total minimum')),
+                ('starts_at', models.DateTimeField(blank=True, null=True, verbose_name='début')),
+                ('ends_at', models.DateTimeField(blank=True, null=True, verbose_name='fin')),
+                ('max_uses', models.PositiveIntegerField(blank=True, help_text='Laisser vide pour un nombre illimité.', null=True, verbose_name='utilisations maximum')),
+                ('used_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='utilisations')),
+                ('active', models.BooleanField(default=True, verbose_name='actif')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='créé le')),
+            ],
+            options={
+                'verbose_name': 'code promo',
+                'verbose_name_plural': 'codes promo',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='remise du code promo'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='coupon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='carts', to='boutique.coupon', verbose_name='code promo'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='coupon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='boutique.coupon', verbose_name='code promo'),
+        ),
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='nom')),
+                ('kind', models.CharField(choices=[('percent', 'Pourcentage'), ('fixed', 'Montant fixe par unité')], default='percent', max_length=10, verbose_name='type de remise')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='valeur')),
+                ('min_quantity', models.PositiveIntegerField(default=1, help_text='Prix dégressif : quantité minimale de la ligne du panier.', validators=[django.core.validators.MinValueValidator(1)], verbose_name='à partir de (quantité)')),
+                ('starts_at', models.DateTimeField(blank=True, null=True, verbose_name='début')),
+                ('ends_at', models.DateTimeField(blank=True, null=True, verbose_name='fin')),
+                ('active', models.BooleanField(default=True, verbose_name='active')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='mis à jour le')),
+                ('category', models.ForeignKey(blank=True, help_text="Sans produit ni catégorie, la remise s'applique à tout le catalogue.", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='boutique.category', verbose_name='catégorie')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='boutique.product', verbose_name='produit')),
+            ],
+            options={
+                'verbose_name': 'promotion',
+                'verbose_name_plural': 'promotions',
+                'ordering': ('-updated_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_price_versions(apps, schema_editor):
+    # Version 1 = prix actuel ; les lignes de panier relevées à un autre prix sont périmées
+    Product = apps.get_model('boutique', 'Product')
+    ProductPriceHistory = apps.get_model('boutique', 'ProductPriceHistory')
+    CartItem = apps.get_model('boutique', 'CartItem')
+    ProductPriceHistory.objects.bulk_create(
+        ProductPriceHistory(product_id=pk, version=1, price=price)
+        for pk, price in Product.objects.values_list('pk', 'price')
+    )
+    CartItem.objects.exclude(price=models.F('product__price')).update(price_version=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0014_promotions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='price_version',
+            field=models.PositiveIntegerField(default=1, help_text='Version du prix produit au moment où `price` a été relevé.', verbose_name='version du prix'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incrémentée à chaque changement de prix, voir ProductPriceHistory.', verbose_name='version du prix'),
+        ),
+        migrations.CreateModel(
+            name='ProductPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='version')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='prix')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='date')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='boutique.product', verbose_name='produit')),
+            ],
+            options={
+                'verbose_name': 'historique de prix',
+                'verbose_name_plural': 'historique des prix',
+                'ordering': ('product', '-version'),
+                'indexes': [models.Index(fields=['product', 'version'], name='price_history_version_idx')],
+            },
+        ),
+        migrations.RunPython(seed_price_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:27
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0015_price_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxClass',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='nom')),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)], verbose_name='taux (%)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='mis à jour le')),
+            ],
+            options={
+                'verbose_name': 'classe de TVA',
+                'verbose_name_plural': 'classes de TVA',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='TVA comprise dans le montant des articles, figée au paiement.', max_digits=10, verbose_name='dont TVA'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='tax_rate',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='taux de TVA (%)'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tax_class',
+            field=models.ForeignKey(blank=True, help_text='Vide : taux par défaut (TAX_DEFAULT_RATE).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='categories', to='boutique.taxclass', verbose_name='classe de TVA'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='tax_class',
+            field=models.ForeignKey(blank=True, help_text='Vide : classe de la catégorie.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='boutique.taxclass', verbose_name='classe de TVA'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0016_tax_classes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="Identifie l'e-mail (ex. confirmation d'une commande) pour ne jamais l'envoyer deux fois.", max_length=100, unique=True, verbose_name='clé')),
+                ('to', models.EmailField(max_length=254, verbose_name='destinataire')),
+                ('subject', models.CharField(max_length=255, verbose_name='objet')),
+                ('body', models.TextField(verbose_name='texte')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML')),
+                ('status', models.CharField(choices=[('pending', 'À envoyer'), ('sent', 'Envoyé'), ('failed', 'Abandonné')], default='pending', max_length=10, verbose_name='statut')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='tentatives')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='prochaine tentative')),
+                ('last_error', models.TextField(blank=True, verbose_name='dernière erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='créé le')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='envoyé le')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='boutique.order', verbose_name='commande')),
+            ],
+            options={
+                'verbose_name': 'e-mail en attente',
+                'verbose_name_plural': "boîte d'envoi",
+                'ordering': ('-created_at',),
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_rating_aggregates(apps, schema_editor):
+    # Les avis déjà publiés sont considérés comme modérés ; agrégats des avis approuvés
+    Product = apps.get_model('boutique', 'Product')
+    Review = apps.get_model('boutique', 'Review')
+    Review.objects.filter(approved=True, moderated_at__isnull=True).update(moderated_at=models.F('created_at'))
+    totals = Review.objects.filter(approved=True).values('product_id').annotate(
+        count=models.Count('pk'), total=models.Sum('rating'),
+    ).order_by()
+    for row in totals:
+        Product.objects.filter(pk=row['product_id']).update(rating_count=row['count'], rating_sum=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0017_email_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="nombre d'avis"),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='somme des notes'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderated_at',
+            field=models.DateTimeField(blank=True, help_text='Vide : avis en attente de modération.', null=True, verbose_name='modéré le'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='moderated_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderated_reviews', to=settings.AUTH_USER_MODEL, verbose_name='modéré par'),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='approved',
+            field=models.BooleanField(default=False, verbose_name='approuvé'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('approved', False), ('moderated_at__isnull', True)), fields=['created_at', 'id'], name='review_pending_idx'),
+        ),
+        migrations.RunPython(seed_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0018_review_moderation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='rang')),
+                ('co_purchases', models.PositiveIntegerField(verbose_name='commandes communes')),
+                ('score', models.FloatField(verbose_name='score')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='calculé le')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='boutique.product', verbose_name='produit')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_with', to='boutique.product', verbose_name='produit recommandé')),
+            ],
+            options={
+                'verbose_name': 'recommandation',
+                'verbose_name_plural': 'recommandations',
+                'ordering': ('product', 'rank'),
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='recommendation_rank_uniq'), models.UniqueConstraint(fields=('product', 'recommended'), name='recommendation_pair_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+def seed_line_totals(apps, schema_editor):
+    # Nombre de lignes et total des commandes existantes
+    Order = apps.get_model('boutique', 'Order')
+    OrderItem = apps.get_model('boutique', 'OrderItem')
+    totals = OrderItem.objects.values('order_id').annotate(
+        count=models.Count('pk'),
+        total=models.Sum(models.F('price') * models.F('quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by()
+    for row in totals:
+        Order.objects.filter(pk=row['order_id']).update(line_count=row['count'], items_total=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0020_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='total des articles'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='nombre de lignes'),
+        ),
+        migrations.RunPython(seed_line_totals, migrations.RunPython.noop),
+    ]
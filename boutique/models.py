@@ -1,22 +1,53 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils.text import slugify
+from django.utils.functional import cached_property
 from decimal import Decimal
+from datetime import timedelta
 import uuid
 from django.core.validators import MinLengthValidator
 
 # Create your models here.
 
+class TaxClass(models.Model):
+    """Classe de TVA (taux normal, réduit, exonéré...) appliquée aux catégories et produits"""
+    name = models.CharField(_('nom'), max_length=100, unique=True)
+    rate = models.DecimalField(
+        _('taux (%)'),
+        max_digits=5,
+        decimal_places=2,
+        validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
+    updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = _('classe de TVA')
+        verbose_name_plural = _('classes de TVA')
+
+    def __str__(self):
+        return f'{self.name} ({self.rate} %)'
+
+
 class Category(models.Model):
     """Catégorie de produits"""
     name = models.CharField(_('nom'), max_length=200, db_index=True)
     slug = models.SlugField(_('slug'), max_length=200, unique=True)
     image = models.ImageField(_('image'), upload_to='categories/%Y/%m/%d', blank=True)
     description = models.TextField(_('description'), blank=True)
+    tax_class = models.ForeignKey(
+        TaxClass,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='categories',
+        verbose_name=_('classe de TVA'),
+        help_text=_('Vide : taux par défaut (TAX_DEFAULT_RATE).')
+    )
     
     # Stock management fields
     manage_stock = models.BooleanField(
@@ -72,6 +103,14 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_threshold = instance.__dict__.get('low_stock_threshold')
+        instance._loaded_tax_class = instance.__dict__.get('tax_class_id')
+        instance._loaded_search = (instance.__dict__.get('name'), instance.__dict__.get('slug'))
+        return instance
+
     def get_absolute_url(self):
         return f'/boutique/category/{self.slug}/'
 
@@ -125,13 +164,51 @@ class Product(models.Model):
     )
     available = models.BooleanField(_('disponible'), default=True)
     stock = models.PositiveIntegerField(_('stock'), default=0)
+    weight = models.DecimalField(
+        _('poids unitaire (kg)'),
+        max_digits=10,
+        decimal_places=3,
+        default=0,
+        validators=[MinValueValidator(0)],
+        help_text=_('Utilisé pour planifier la charge des camions de livraison.')
+    )
+    volume = models.DecimalField(
+        _('volume unitaire (m³)'),
+        max_digits=10,
+        decimal_places=4,
+        default=0,
+        validators=[MinValueValidator(0)],
+        help_text=_('Utilisé avec le poids pour calculer les frais de livraison.')
+    )
+    tax_class = models.ForeignKey(
+        TaxClass,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='products',
+        verbose_name=_('classe de TVA'),
+        help_text=_('Vide : classe de la catégorie.')
+    )
+    price_version = models.PositiveIntegerField(
+        _('version du prix'),
+        default=1,
+        editable=False,
+        help_text=_('Incrémentée à chaque changement de prix, voir ProductPriceHistory.')
+    )
+    rating_count = models.PositiveIntegerField(_("nombre d'avis"), default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(_('somme des notes'), default=0, editable=False)
     created_at = models.DateTimeField(_('créé le'), auto_now_add=True)
     updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
 
+    # Agrégats des avis approuvés, tenus par `reviews` (UPDATE incrémentaux)
+    RATING_FIELDS = ('rating_count', 'rating_sum')
+
     class Meta:
         ordering = ('name',)
         indexes = [
             models.Index(fields=['id', 'slug']),
+            # Synchronisation de l'index des facettes et ETag du catalogue
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
         ]
         verbose_name = _('produit')
         verbose_name_plural = _('produits')
@@ -139,6 +216,43 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser l'état du stock chargé pour ne réévaluer les alertes que s'il change
+        instance._loaded_stock_state = (
+            instance.__dict__.get('stock'),
+            instance.__dict__.get('available'),
+        )
+        instance._loaded_price = instance.__dict__.get('price')
+        instance._loaded_search = (
+            instance.__dict__.get('name'),
+            instance.__dict__.get('slug'),
+            instance.__dict__.get('available'),
+        )
+        return instance
+
+    @property
+    def price_changed(self):
+        loaded = getattr(self, '_loaded_price', None)
+        return loaded is not None and self.price != loaded
+
+    def save(self, *args, **kwargs):
+        # Un nouveau prix ouvre une nouvelle version (les paniers la comparent au paiement)
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and self.price_changed and (update_fields is None or 'price' in update_fields):
+            self.price_version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'price_version'}
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Ne pas écraser les agrégats d'avis avec les valeurs chargées (modérées entre-temps)
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return f'/boutique/produits/{self.id}/{self.slug}/'
         
@@ -151,35 +265,176 @@ class Product(models.Model):
     @property
     def in_stock(self):
         return self.stock > 0
+
+    @property
+    def is_new(self):
+        days = getattr(settings, 'NEW_PRODUCT_DAYS', 30)
+        return self.created_at is not None and self.created_at >= timezone.now() - timedelta(days=days)
+
+    @property
+    def get_discounted_price(self):
+        """Prix unitaire après la meilleure promotion en cours (à l'unité)"""
+        from .pricing import unit_price
+        return unit_price(self, 1)
+
+    @property
+    def get_discount_amount(self):
+        return self.price - self.get_discounted_price
+
+    @property
+    def tax_rate(self):
+        from .taxes import rate_for
+        return rate_for(self)
+
+    @property
+    def tax_included(self):
+        # Les prix sont TTC : la TVA n'est mentionnée que si elle s'applique
+        return self.tax_rate > 0
+
+    @property
+    def get_tax_amount(self):
+        """TVA comprise dans le prix unitaire remisé"""
+        from .taxes import included_tax
+        return included_tax(self.get_discounted_price, self.tax_rate)
+
+    @property
+    def discount_percentage(self):
+        if not self.price:
+            return 0
+        return int(round(self.get_discount_amount / self.price * 100))
         
+    @property
+    def average_rating(self):
+        """Note moyenne des avis approuvés, sans requête (None sans avis)"""
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
     def get_rating_count(self):
-        """Retourne un dictionnaire avec le nombre d'avis par note"""
-        from collections import defaultdict
-        
-        # Initialiser le dictionnaire avec des zéros pour toutes les notes possibles
-        rating_count = {str(i): {'count': 0, 'percentage': 0} for i in range(1, 6)}
-        
-        # Compter les avis par note
-        reviews = self.reviews.all()
-        total_reviews = reviews.count()
-        
-        for review in reviews:
-            rating = str(review.rating)
-            rating_count[rating]['count'] += 1
-        
-        # Calculer les pourcentages
-        for rating, data in rating_count.items():
-            if total_reviews > 0:
-                data['percentage'] = (data['count'] / total_reviews) * 100
-            else:
-                data['percentage'] = 0
-        
-        return rating_count
+        """Retourne un dictionnaire avec le nombre d'avis approuvés par note"""
+        from .reviews import rating_summary
+        return rating_summary(self.pk)['distribution']
+
+
+class ProductPriceHistory(models.Model):
+    """Prix d'un produit pour chacune de ses versions (journal en ajout seul)"""
+    product = models.ForeignKey(
+        Product,
+        related_name='price_history',
+        on_delete=models.CASCADE,
+        verbose_name=_('produit')
+    )
+    version = models.PositiveIntegerField(_('version'))
+    price = models.DecimalField(_('prix'), max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(_('date'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('historique de prix')
+        verbose_name_plural = _('historique des prix')
+        ordering = ('product', '-version')
+        indexes = [
+            models.Index(fields=['product', 'version'], name='price_history_version_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product} v{self.version} : {self.price}'
+
+
+class Promotion(models.Model):
+    """Remise automatique sur un produit, une catégorie ou tout le catalogue"""
+    KIND_CHOICES = (
+        ('percent', _('Pourcentage')),
+        ('fixed', _('Montant fixe par unité')),
+    )
+
+    name = models.CharField(_('nom'), max_length=100)
+    kind = models.CharField(_('type de remise'), max_length=10, choices=KIND_CHOICES, default='percent')
+    value = models.DecimalField(_('valeur'), max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name=_('produit')
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name=_('catégorie'),
+        help_text=_('Sans produit ni catégorie, la remise s\'applique à tout le catalogue.')
+    )
+    min_quantity = models.PositiveIntegerField(
+        _('à partir de (quantité)'),
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text=_('Prix dégressif : quantité minimale de la ligne du panier.')
+    )
+    starts_at = models.DateTimeField(_('début'), null=True, blank=True)
+    ends_at = models.DateTimeField(_('fin'), null=True, blank=True)
+    active = models.BooleanField(_('active'), default=True)
+    updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
+
+    class Meta:
+        ordering = ('-updated_at',)
+        verbose_name = _('promotion')
+        verbose_name_plural = _('promotions')
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.product_id and self.category_id:
+            raise ValidationError(_("Choisissez un produit ou une catégorie, pas les deux."))
+        if self.kind == 'percent' and self.value > 100:
+            raise ValidationError({'value': _("Un pourcentage ne peut pas dépasser 100.")})
+        if self.starts_at and self.ends_at and self.ends_at <= self.starts_at:
+            raise ValidationError({'ends_at': _("La fin doit suivre le début.")})
+
+
+class Coupon(models.Model):
+    """Code promo saisi par le client, appliqué au sous-total du panier"""
+    code = models.CharField(_('code'), max_length=50, unique=True)
+    kind = models.CharField(_('type de remise'), max_length=10, choices=Promotion.KIND_CHOICES, default='percent')
+    value = models.DecimalField(_('valeur'), max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    min_subtotal = models.DecimalField(_('sous-total minimum'), max_digits=12, decimal_places=2, default=0)
+    starts_at = models.DateTimeField(_('début'), null=True, blank=True)
+    ends_at = models.DateTimeField(_('fin'), null=True, blank=True)
+    max_uses = models.PositiveIntegerField(
+        _('utilisations maximum'),
+        null=True,
+        blank=True,
+        help_text=_('Laisser vide pour un nombre illimité.')
+    )
+    used_count = models.PositiveIntegerField(_('utilisations'), default=0, editable=False)
+    active = models.BooleanField(_('actif'), default=True)
+    created_at = models.DateTimeField(_('créé le'), auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = _('code promo')
+        verbose_name_plural = _('codes promo')
+
+    def __str__(self):
+        return self.code
+
+    def save(self, *args, **kwargs):
+        self.code = self.code.strip().upper()
+        super().save(*args, **kwargs)
 
 
 class Cart(models.Model):
     """Panier d'achat"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='carts',
+        verbose_name=_('code promo')
+    )
     created_at = models.DateTimeField(_('créé le'), auto_now_add=True)
     updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
 
@@ -191,49 +446,52 @@ class Cart(models.Model):
     def __str__(self):
         return f'Panier {self.id}'
 
+    @cached_property
+    def pricing(self):
+        # Lignes et remises calculées une fois par instance, voir pricing.price_cart
+        from .pricing import price_cart
+        return price_cart(self)
+
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.pricing.subtotal
 
     @property
     def total_quantity(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.pricing.quantity
         
     @property
     def get_subtotal(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.pricing.subtotal
         
     @property
     def discount_amount(self):
-        # À implémenter si vous avez un système de réduction
-        return 0
+        return self.pricing.discount_amount
         
     @property
     def discount_code(self):
-        # À implémenter si vous avez un système de code de réduction
-        return ""
+        return self.pricing.coupon.code if self.pricing.coupon else ""
         
     @property
     def tax_rate(self):
-        # Taux de TVA en pourcentage
-        return 20  # 20% de TVA par défaut
+        # Taux de TVA s'il est le même pour toutes les lignes, voir taxes.py
+        return self.pricing.tax_rate
         
     @property
     def tax_amount(self):
-        # Montant de la TVA
-        return round(self.get_subtotal * (self.tax_rate / 100), 2)
+        # TVA comprise dans le montant des articles (prix TTC)
+        return self.pricing.tax_amount
         
-    @property
+    @cached_property
     def get_shipping_cost(self):
-        # Frais de livraison gratuits pour les commandes de plus de 100€, sinon 5.99€
-        if self.get_subtotal > 100:
-            return 0
-        return 5.99
+        # Tarif de la zone par défaut (l'adresse n'est connue qu'au paiement), voir shipping.py
+        from .shipping import quote_pricing
+        return quote_pricing(self.pricing)
         
     @property
     def get_total(self):
-        # Total TTC (sous-total + frais de livraison)
-        return self.get_subtotal + self.get_shipping_cost
+        # Total TTC (sous-total - code promo + frais de livraison)
+        return self.get_subtotal - self.discount_amount + self.get_shipping_cost
 
 
 class CartItem(models.Model):
@@ -257,6 +515,11 @@ class CartItem(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(0.01)]
     )
+    price_version = models.PositiveIntegerField(
+        _('version du prix'),
+        default=1,
+        help_text=_('Version du prix produit au moment où `price` a été relevé.')
+    )
     created_at = models.DateTimeField(_('créé le'), auto_now_add=True)
     updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
 
@@ -268,17 +531,138 @@ class CartItem(models.Model):
     def __str__(self):
         return f'{self.quantity} x {self.product.name}'
 
+    @property
+    def get_discounted_price(self):
+        # Prix unitaire après promotions (prix dégressifs compris) pour la quantité de la ligne
+        from .pricing import unit_price
+        return unit_price(self.product, self.quantity, base_price=self.price)
+
     @property
     def total_price(self):
-        return self.quantity * self.price
+        return self.quantity * self.get_discounted_price
 
     def clean(self):
-        if self.quantity > self.product.stock:
+        from .reservations import available_to_sell
+        if self.quantity > available_to_sell(self.product, exclude_cart=self.cart_id):
             raise ValidationError({
                 'quantity': _("La quantité demandée n'est pas disponible en stock.")
             })
 
 
+class StockReservation(models.Model):
+    """Réservation temporaire du stock d'un article de panier pendant le paiement"""
+    cart = models.ForeignKey(
+        Cart,
+        related_name='reservations',
+        on_delete=models.CASCADE,
+        verbose_name=_('panier')
+    )
+    product = models.ForeignKey(
+        Product,
+        related_name='reservations',
+        on_delete=models.CASCADE,
+        verbose_name=_('produit')
+    )
+    quantity = models.PositiveIntegerField(_('quantité réservée'))
+    expires_at = models.DateTimeField(_('expire le'), db_index=True)
+    created_at = models.DateTimeField(_('créée le'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('réservation de stock')
+        verbose_name_plural = _('réservations de stock')
+        unique_together = (('cart', 'product'),)
+        indexes = [
+            # Index couvrant : la somme des réservations actives se lit dans l'index
+            models.Index(fields=['product', 'expires_at', 'quantity'], name='reservation_live_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product} ({self.cart_id})'
+
+    @property
+    def is_active(self):
+        return self.expires_at > timezone.now()
+
+
+class DeliverySlot(models.Model):
+    """Occupation d'un créneau de livraison (camions et tonnage réservés)"""
+    date = models.DateField(_('date'))
+    start_time = models.TimeField(_('début du créneau'))
+    truck_capacity = models.PositiveSmallIntegerField(_('camions disponibles'))
+    weight_capacity = models.DecimalField(_('charge maximale (kg)'), max_digits=12, decimal_places=3)
+    trucks_booked = models.PositiveSmallIntegerField(_('camions réservés'), default=0)
+    weight_booked = models.DecimalField(_('charge réservée (kg)'), max_digits=12, decimal_places=3, default=0)
+    updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
+
+    class Meta:
+        ordering = ('date', 'start_time')
+        verbose_name = _('créneau de livraison')
+        verbose_name_plural = _('créneaux de livraison')
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'start_time'], name='delivery_slot_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.date:%d/%m/%Y} {self.start_time:%H:%M}'
+
+    @property
+    def remaining_trucks(self):
+        return max(self.truck_capacity - self.trucks_booked, 0)
+
+    @property
+    def remaining_weight(self):
+        return max(self.weight_capacity - self.weight_booked, Decimal('0'))
+
+
+class PostalCodeLocation(models.Model):
+    """Géocodage local d'un code postal : zone de livraison et coordonnées"""
+    postal_code = models.CharField(_('code postal'), max_length=20, unique=True)
+    zone = models.CharField(_('zone de livraison'), max_length=100)
+    latitude = models.DecimalField(_('latitude'), max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(_('longitude'), max_digits=9, decimal_places=6)
+    updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
+
+    class Meta:
+        ordering = ('zone', 'postal_code')
+        verbose_name = _('code postal géolocalisé')
+        verbose_name_plural = _('codes postaux géolocalisés')
+
+    def __str__(self):
+        return f'{self.postal_code} ({self.zone})'
+
+
+class ShippingRate(models.Model):
+    """Tranche de la grille tarifaire de livraison d'une zone"""
+    zone = models.CharField(
+        _('zone de livraison'),
+        max_length=100,
+        blank=True,
+        help_text=_('Laisser vide pour la grille par défaut, appliquée aux zones sans grille propre.')
+    )
+    min_weight = models.DecimalField(
+        _('à partir de (kg)'),
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        validators=[MinValueValidator(0)],
+        help_text=_('Poids taxable à partir duquel la tranche s\'applique.')
+    )
+    base_price = models.DecimalField(_('forfait'), max_digits=10, decimal_places=2, default=0)
+    price_per_kg = models.DecimalField(_('prix par kg'), max_digits=10, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
+
+    class Meta:
+        ordering = ('zone', 'min_weight')
+        verbose_name = _('tarif de livraison')
+        verbose_name_plural = _('tarifs de livraison')
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'min_weight'], name='shipping_rate_tier_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.zone or _("Par défaut")} ≥ {self.min_weight} kg'
+
+
 class Order(models.Model):
     """Commande client"""
     STATUS_CHOICES = (
@@ -339,6 +723,21 @@ class Order(models.Model):
         blank=True,
         help_text=_('Heure à laquelle le client souhaite être livré ou récupérer sa commande.')
     )
+    delivery_slot = models.ForeignKey(
+        DeliverySlot,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='orders',
+        verbose_name=_('créneau réservé')
+    )
+    delivery_weight = models.DecimalField(
+        _('poids à livrer (kg)'),
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        editable=False
+    )
     delivery_address = models.TextField(
         _('adresse de livraison'),
         blank=True,
@@ -367,25 +766,96 @@ class Order(models.Model):
         max_length=100,
         blank=True
     )
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders',
+        verbose_name=_('code promo')
+    )
+    discount_amount = models.DecimalField(
+        _('remise du code promo'),
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+    shipping_cost = models.DecimalField(
+        _('frais de livraison'),
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+    tax_amount = models.DecimalField(
+        _('dont TVA'),
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text=_('TVA comprise dans le montant des articles, figée au paiement.')
+    )
     total_amount = models.DecimalField(
         _('montant total'),
         max_digits=10,
         decimal_places=2,
         validators=[MinValueValidator(0.01)]
     )
+    line_count = models.PositiveIntegerField(_('nombre de lignes'), default=0, editable=False)
+    items_total = models.DecimalField(
+        _('total des articles'),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
     created_at = models.DateTimeField(_('créée le'), default=timezone.now)
     updated_at = models.DateTimeField(_('mise à jour le'), auto_now=True)
 
+    # Agrégats des lignes (OrderItem), tenus par leurs signaux (UPDATE incrémentaux)
+    LINE_FIELDS = ('line_count', 'items_total')
+
     class Meta:
         ordering = ('-created_at',)
         verbose_name = _('commande')
         verbose_name_plural = _('commandes')
+        indexes = [
+            # Index partiel des files de travail (voir orders.WORK_QUEUES)
+            models.Index(
+                fields=['status', 'delivery_method', 'created_at'],
+                name='order_work_queue_idx',
+                condition=models.Q(status__in=('payee', 'en_preparation', 'prete')),
+            ),
+            # Tournées d'une date de livraison (voir dispatch.deliverable_orders)
+            models.Index(
+                fields=['delivery_date', 'status'],
+                name='order_delivery_date_idx',
+                condition=models.Q(delivery_method='delivery'),
+            ),
+        ]
 
     def __str__(self):
         return f'Commande {self.id}'
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Ne pas écraser les agrégats des lignes avec les valeurs chargées (lignes ajoutées entre-temps)
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.LINE_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def get_total_cost(self):
-        return sum(item.get_cost() for item in self.items.all())
+        return self.items_total
+
+    def get_line_count(self):
+        return self.line_count
+
+    @property
+    def tax_rate(self):
+        # Taux unique des lignes (préchargées ou non), sinon None
+        rates = {item.tax_rate for item in self.items.all()}
+        return rates.pop() if len(rates) == 1 else None
 
 
 class OrderItem(models.Model):
@@ -410,6 +880,7 @@ class OrderItem(models.Model):
         validators=[MinValueValidator(0.01)]
     )
     quantity = models.PositiveIntegerField(_('quantité'), default=1)
+    tax_rate = models.DecimalField(_('taux de TVA (%)'), max_digits=5, decimal_places=2, default=0)
 
     class Meta:
         verbose_name = _('article de commande')
@@ -418,10 +889,57 @@ class OrderItem(models.Model):
     def __str__(self):
         return f'{self.quantity} x {self.product.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Montant chargé, pour ne reporter sur la commande que l'écart d'une modification
+        price, quantity = instance.__dict__.get('price'), instance.__dict__.get('quantity')
+        instance._loaded_cost = price * quantity if price is not None and quantity is not None else None
+        return instance
+
     def get_cost(self):
         return self.price * self.quantity
 
 
+class OrderTransition(models.Model):
+    """Changement de statut d'une commande (journal en ajout seul)"""
+    order = models.ForeignKey(
+        Order,
+        related_name='transitions',
+        on_delete=models.CASCADE,
+        verbose_name=_('commande')
+    )
+    from_status = models.CharField(_('statut précédent'), max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(_('nouveau statut'), max_length=20, choices=Order.STATUS_CHOICES)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order_transitions',
+        verbose_name=_('effectué par')
+    )
+    note = models.CharField(_('note'), max_length=255, blank=True)
+    created_at = models.DateTimeField(_('date'), default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ('created_at', 'id')
+        verbose_name = _('transition de commande')
+        verbose_name_plural = _('transitions de commande')
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='order_transition_idx'),
+            models.Index(fields=['to_status', 'created_at'], name='transition_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} : {self.from_status} → {self.to_status}'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError(_("Le journal des transitions ne peut pas être modifié."))
+        super().save(*args, **kwargs)
+
+
 class Review(models.Model):
     """Avis client sur un produit"""
     RATING_CHOICES = (
@@ -450,7 +968,21 @@ class Review(models.Model):
         validators=[MinValueValidator(1), MaxValueValidator(5)]
     )
     comment = models.TextField(_('commentaire'), blank=True)
-    approved = models.BooleanField(_('approuvé'), default=True)
+    approved = models.BooleanField(_('approuvé'), default=False)
+    moderated_at = models.DateTimeField(
+        _('modéré le'),
+        null=True,
+        blank=True,
+        help_text=_('Vide : avis en attente de modération.')
+    )
+    moderated_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='moderated_reviews',
+        verbose_name=_('modéré par')
+    )
     created_at = models.DateTimeField(_('créé le'), auto_now_add=True)
     updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
 
@@ -459,10 +991,31 @@ class Review(models.Model):
         verbose_name = _('avis')
         verbose_name_plural = _('avis')
         unique_together = (('product', 'user'),)
+        indexes = [
+            # Flux des avis approuvés d'un produit, pagination par curseur
+            models.Index(fields=['product', 'approved', '-created_at', '-id'], name='review_feed_idx'),
+            # File de modération : index partiel limité aux avis en attente
+            models.Index(
+                fields=['created_at', 'id'],
+                name='review_pending_idx',
+                condition=models.Q(approved=False, moderated_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f'Avis de {self.user} sur {self.product}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Part de l'avis dans les agrégats du produit telle que chargée
+        instance._loaded_rating = (instance.__dict__.get('approved'), instance.__dict__.get('rating'))
+        return instance
+
+    @property
+    def pending(self):
+        return not self.approved and self.moderated_at is None
+
 
 class ProductSpecification(models.Model):
     """Spécification technique d'un produit"""
@@ -506,6 +1059,154 @@ class ProductSpecification(models.Model):
             })
 
 
+class ReorderItem(models.Model):
+    """Produit en stock faible à réapprovisionner (file matérialisée)"""
+    product = models.OneToOneField(
+        Product,
+        related_name='reorder_item',
+        on_delete=models.CASCADE,
+        verbose_name=_('produit')
+    )
+    stock = models.PositiveIntegerField(_('stock restant'))
+    threshold = models.PositiveIntegerField(_('seuil d\'alerte'))
+    daily_velocity = models.DecimalField(
+        _('ventes par jour'),
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+    days_of_cover = models.DecimalField(
+        _('jours de couverture'),
+        max_digits=10,
+        decimal_places=1,
+        null=True,
+        blank=True,
+        help_text=_('Nombre de jours avant rupture au rythme des ventes récentes (vide si aucune vente).')
+    )
+    suggested_quantity = models.PositiveIntegerField(_('quantité à commander'), default=0)
+    created_at = models.DateTimeField(_('signalé le'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('mis à jour le'), auto_now=True)
+
+    class Meta:
+        ordering = (models.F('days_of_cover').asc(nulls_last=True), 'stock')
+        verbose_name = _('article à réapprovisionner')
+        verbose_name_plural = _('articles à réapprovisionner')
+
+    def __str__(self):
+        return f'{self.product} ({self.stock})'
+
+
+class ProductRecommendation(models.Model):
+    """Produit souvent acheté avec un autre (voisins précalculés par `recommendations`)"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name=_('produit')
+    )
+    recommended = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommended_with',
+        verbose_name=_('produit recommandé')
+    )
+    rank = models.PositiveSmallIntegerField(_('rang'))
+    co_purchases = models.PositiveIntegerField(_('commandes communes'))
+    score = models.FloatField(_('score'))
+    created_at = models.DateTimeField(_('calculé le'), auto_now_add=True)
+
+    class Meta:
+        ordering = ('product', 'rank')
+        verbose_name = _('recommandation')
+        verbose_name_plural = _('recommandations')
+        constraints = [
+            # Lecture de la fiche produit : voisins d'un produit dans l'ordre
+            models.UniqueConstraint(fields=['product', 'rank'], name='recommendation_rank_uniq'),
+            models.UniqueConstraint(fields=['product', 'recommended'], name='recommendation_pair_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} → {self.recommended_id} ({self.co_purchases})'
+
+
+class OutboxEmail(models.Model):
+    """E-mail transactionnel en attente d'envoi (boîte d'envoi, vidée par `send_queued_emails`)"""
+    STATUS_CHOICES = (
+        ('pending', _('À envoyer')),
+        ('sent', _('Envoyé')),
+        ('failed', _('Abandonné')),
+    )
+
+    key = models.CharField(
+        _('clé'),
+        max_length=100,
+        unique=True,
+        help_text=_("Identifie l'e-mail (ex. confirmation d'une commande) pour ne jamais l'envoyer deux fois.")
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emails',
+        verbose_name=_('commande')
+    )
+    to = models.EmailField(_('destinataire'))
+    subject = models.CharField(_('objet'), max_length=255)
+    body = models.TextField(_('texte'))
+    html_body = models.TextField(_('HTML'), blank=True)
+    status = models.CharField(_('statut'), max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(_('tentatives'), default=0)
+    next_attempt_at = models.DateTimeField(_('prochaine tentative'), default=timezone.now)
+    last_error = models.TextField(_('dernière erreur'), blank=True)
+    created_at = models.DateTimeField(_('créé le'), auto_now_add=True)
+    sent_at = models.DateTimeField(_('envoyé le'), null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = _('e-mail en attente')
+        verbose_name_plural = _("boîte d'envoi")
+        indexes = [
+            # Lots à envoyer : e-mails en attente arrivés à échéance
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.to}'
+
+
+# Signaux pour tenir le nombre de lignes et le total des commandes
+def shift_order_totals(item, lines, amount):
+    if not lines and not amount:
+        return
+    Order.objects.filter(pk=item.order_id).update(
+        line_count=models.F('line_count') + lines,
+        items_total=models.F('items_total') + amount,
+        updated_at=timezone.now(),
+    )
+    # Commande déjà en mémoire (création de la commande puis de ses lignes)
+    if OrderItem.order.is_cached(item):
+        item.order.line_count += lines
+        item.order.items_total += amount
+
+
+def update_order_totals(sender, instance, created, **kwargs):
+    cost = instance.get_cost()
+    if created:
+        shift_order_totals(instance, 1, cost)
+    elif getattr(instance, '_loaded_cost', None) is not None:
+        shift_order_totals(instance, 0, cost - instance._loaded_cost)
+    instance._loaded_cost = cost
+
+
+def remove_order_line(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_cost', None)
+    shift_order_totals(instance, -1, -(instance.get_cost() if loaded is None else loaded))
+
+models.signals.post_save.connect(update_order_totals, sender=OrderItem)
+models.signals.post_delete.connect(remove_order_line, sender=OrderItem)
+
+
 # Signal pour mettre à jour le stock après une commande
 def update_stock(sender, instance, created, **kwargs):
     if created and instance.product:
@@ -513,3 +1214,141 @@ def update_stock(sender, instance, created, **kwargs):
         instance.product.save()
 
 models.signals.post_save.connect(update_stock, sender=OrderItem)
+
+
+# Signal pour libérer le créneau de livraison d'une commande supprimée
+def release_delivery_slot(sender, instance, **kwargs):
+    if instance.delivery_slot_id:
+        from .delivery import _release, trucks_needed
+        _release(instance.delivery_slot_id, trucks_needed(instance.delivery_weight), instance.delivery_weight)
+
+models.signals.post_delete.connect(release_delivery_slot, sender=Order)
+
+
+# Signaux pour recharger la grille tarifaire de livraison
+def reload_shipping_rates(sender, **kwargs):
+    from .shipping import invalidate_rates
+    invalidate_rates()
+
+models.signals.post_save.connect(reload_shipping_rates, sender=ShippingRate)
+models.signals.post_delete.connect(reload_shipping_rates, sender=ShippingRate)
+
+
+# Signaux pour recompiler les promotions
+def reload_promotions(sender, **kwargs):
+    from .pricing import invalidate_promotions
+    invalidate_promotions()
+
+models.signals.post_save.connect(reload_promotions, sender=Promotion)
+models.signals.post_delete.connect(reload_promotions, sender=Promotion)
+
+
+# Signal pour historiser chaque version du prix d'un produit
+def record_price_history(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    if created or instance.price_changed:
+        ProductPriceHistory.objects.create(product=instance, version=instance.price_version, price=instance.price)
+    instance._loaded_price = instance.price
+
+models.signals.post_save.connect(record_price_history, sender=Product)
+
+
+# Signaux pour recompiler les taux de TVA
+def reload_tax_rates(sender, **kwargs):
+    from .taxes import invalidate_taxes
+    invalidate_taxes()
+
+models.signals.post_save.connect(reload_tax_rates, sender=TaxClass)
+models.signals.post_delete.connect(reload_tax_rates, sender=TaxClass)
+
+
+def check_category_tax_class(sender, instance, created, **kwargs):
+    if instance.tax_class_id != getattr(instance, '_loaded_tax_class', None):
+        reload_tax_rates(sender)
+    instance._loaded_tax_class = instance.tax_class_id
+
+models.signals.post_save.connect(check_category_tax_class, sender=Category)
+
+
+# Signaux pour tenir les agrégats d'avis des produits
+def update_product_rating(sender, instance, created, **kwargs):
+    from .reviews import rating_delta, apply_rating_deltas
+    current = (instance.approved, instance.rating)
+    loaded = (False, 0) if created else getattr(instance, '_loaded_rating', current)
+    delta = rating_delta(*current)
+    previous = rating_delta(*loaded)
+    apply_rating_deltas({instance.product_id: (delta[0] - previous[0], delta[1] - previous[1])})
+    instance._loaded_rating = current
+
+
+def remove_product_rating(sender, instance, **kwargs):
+    from .reviews import rating_delta, apply_rating_deltas
+    count, total = rating_delta(*getattr(instance, '_loaded_rating', (instance.approved, instance.rating)))
+    apply_rating_deltas({instance.product_id: (-count, -total)})
+
+models.signals.post_save.connect(update_product_rating, sender=Review)
+models.signals.post_delete.connect(remove_product_rating, sender=Review)
+
+
+# Signaux pour tenir l'index des suggestions de recherche
+def index_product(sender, instance, created, **kwargs):
+    state = (instance.name, instance.slug, instance.available)
+    if created or state != getattr(instance, '_loaded_search', None):
+        from .autocomplete import PRODUCT, product_entry, schedule_change
+        schedule_change(PRODUCT, instance.pk, product_entry(instance))
+    instance._loaded_search = state
+
+
+def index_category(sender, instance, created, **kwargs):
+    state = (instance.name, instance.slug)
+    if created or state != getattr(instance, '_loaded_search', None):
+        from .autocomplete import CATEGORY, category_entry, schedule_change
+        schedule_change(CATEGORY, instance.pk, category_entry(instance))
+    instance._loaded_search = state
+
+
+def unindex(sender, instance, **kwargs):
+    from .autocomplete import CATEGORY, PRODUCT, schedule_change
+    schedule_change(PRODUCT if sender is Product else CATEGORY, instance.pk, None)
+
+models.signals.post_save.connect(index_product, sender=Product)
+models.signals.post_save.connect(index_category, sender=Category)
+models.signals.post_delete.connect(unindex, sender=Product)
+models.signals.post_delete.connect(unindex, sender=Category)
+
+
+# Signaux pour tenir l'index des facettes du catalogue
+def refresh_facets(sender, **kwargs):
+    from .facets import expire
+    transaction.on_commit(expire)
+
+
+def touch_specified_product(sender, instance, **kwargs):
+    # Une spécification modifiée doit être relue par les autres processus avec son produit
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+    refresh_facets(sender)
+
+models.signals.post_save.connect(refresh_facets, sender=Product)
+models.signals.post_delete.connect(refresh_facets, sender=Product)
+models.signals.post_save.connect(touch_specified_product, sender=ProductSpecification)
+models.signals.post_delete.connect(touch_specified_product, sender=ProductSpecification)
+
+
+# Signaux pour l'alerte de stock faible
+def check_low_stock(sender, instance, created, **kwargs):
+    state = (instance.stock, instance.available)
+    if created or state != getattr(instance, '_loaded_stock_state', None):
+        from .inventory import evaluate_stock_level
+        evaluate_stock_level(instance)
+    instance._loaded_stock_state = state
+
+
+def check_category_threshold(sender, instance, created, **kwargs):
+    if not created and instance.low_stock_threshold != getattr(instance, '_loaded_threshold', None):
+        from .inventory import rebuild_reorder_queue
+        rebuild_reorder_queue(Product.objects.filter(category=instance))
+    instance._loaded_threshold = instance.low_stock_threshold
+
+models.signals.post_save.connect(check_low_stock, sender=Product)
+models.signals.post_save.connect(check_category_threshold, sender=Category)
@@ -0,0 +1,241 @@
+"""
+Commandes : lecture pour l'affichage et cycle de vie.
+
+Chaque commande enregistre son nombre de lignes et son total (`line_count`,
+`items_total`, tenus par les signaux de `OrderItem`). `with_lines` précharge
+les lignes avec leur produit : une page de commandes se rend en un nombre
+constant de requêtes, quel que soit le nombre de commandes ou de lignes.
+
+`transition` fait avancer une commande dans son cycle de vie : seules les
+transitions de `TRANSITIONS` sont permises (selon le mode de livraison), chaque
+changement est journalisé dans `OrderTransition` et n'écrit que les colonnes
+modifiées ; une commande annulée libère son créneau de livraison. Les files de
+travail (`WORK_QUEUES`) sont servies par l'index partiel
+`order_work_queue_idx`.
+
+`bulk_transition` et `assign_tracking_numbers` traitent des centaines de
+commandes à la fois : validation sur une seule lecture verrouillée, puis un
+seul UPDATE ensembliste et un seul INSERT dans le journal.
+"""
+import csv
+import io
+import uuid
+
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Prefetch, Q, Value, When
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .delivery import release as release_slot, release_orders
+from .models import Order, OrderItem, OrderTransition
+
+
+class TransitionError(Exception):
+    """Changement de statut non autorisé depuis le statut actuel"""
+
+
+# Statuts atteignables depuis chaque statut
+TRANSITIONS = {
+    'en_attente': ('payee', 'annulee'),
+    'payee': ('en_preparation', 'annulee'),
+    'en_preparation': ('prete', 'expediee', 'annulee'),
+    'prete': ('recuperee', 'annulee'),
+    'expediee': ('en_livraison', 'livree'),
+    'en_livraison': ('livree',),
+    'livree': (),
+    'recuperee': (),
+    'annulee': (),
+}
+
+# Statuts propres à un mode de livraison
+PICKUP_STATUSES = ('prete', 'recuperee')
+DELIVERY_STATUSES = ('expediee', 'en_livraison', 'livree')
+
+# Files de travail : (libellé, filtre). Leurs statuts doivent rester ceux de la
+# condition de l'index partiel `order_work_queue_idx`.
+QUEUE_STATUSES = ('payee', 'en_preparation', 'prete')
+WORK_QUEUES = {
+    'a_preparer': (_('À préparer'), Q(status='payee')),
+    'a_expedier': (_('À expédier'), Q(status='en_preparation', delivery_method='delivery')),
+    'prets_retrait': (_('Prêtes au retrait'), Q(status='prete', delivery_method='pickup')),
+}
+
+
+def with_lines(queryset):
+    """Précharger les lignes et leurs produits d'un queryset de commandes pour l'affichage"""
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+
+
+def allowed_transitions(order, status=None):
+    """Statuts atteignables depuis `status` (par défaut le statut de la commande)"""
+    excluded = DELIVERY_STATUSES if order.delivery_method == 'pickup' else PICKUP_STATUSES
+    return [
+        target for target in TRANSITIONS.get(status or order.status, ())
+        if target not in excluded
+    ]
+
+
+def status_choices(order):
+    """Choix (valeur, libellé) des transitions possibles, pour les formulaires"""
+    labels = dict(Order.STATUS_CHOICES)
+    return [(status, labels[status]) for status in allowed_transitions(order)]
+
+
+def transition(order, status, user=None, note='', **fields):
+    """
+    Fait passer la commande au statut `status` et journalise le changement.
+
+    Le statut courant est relu sous verrou pour que deux changements
+    simultanés ne puissent pas partir du même état. `fields` permet d'écrire
+    en même temps d'autres colonnes (numéro de suivi, identifiant de paiement).
+    Lève `TransitionError` si la transition n'est pas permise.
+    """
+    with transaction.atomic():
+        current = Order.objects.select_for_update().filter(pk=order.pk).values_list('status', flat=True).get()
+        if status not in allowed_transitions(order, current):
+            labels = dict(Order.STATUS_CHOICES)
+            raise TransitionError(
+                _("Impossible de passer la commande de « %(current)s » à « %(status)s ».") % {
+                    'current': labels.get(current, current),
+                    'status': labels.get(status, status),
+                }
+            )
+
+        order.status = status
+        update_fields = ['status', 'updated_at', *fields]
+        for name, value in fields.items():
+            setattr(order, name, value)
+        if status == 'payee' and not order.paid:
+            order.paid = True
+            update_fields.append('paid')
+        order.save(update_fields=update_fields)
+        if status == 'annulee':
+            release_slot(order)
+
+        OrderTransition.objects.create(
+            order=order,
+            from_status=current,
+            to_status=status,
+            user=user if user is not None and user.is_authenticated else None,
+            note=note,
+        )
+    return order
+
+
+def bulk_transition(order_ids, status, user=None, note='', tracking_numbers=None):
+    """
+    Fait passer plusieurs commandes au statut `status`.
+
+    Les commandes dont le statut actuel ne permet pas la transition sont
+    écartées, les autres sont mises à jour par un seul UPDATE et journalisées
+    par un seul INSERT. `tracking_numbers` ({id: numéro}) est écrit dans le
+    même UPDATE, et aussi pour les commandes écartées (statut inchangé).
+    Retourne (identifiants mis à jour, {identifiant: statut actuel} des
+    commandes écartées).
+    """
+    tracking_numbers = tracking_numbers or {}
+    with transaction.atomic():
+        rows = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=list(order_ids))
+            .values_list('pk', 'status', 'delivery_method')
+        )
+        updated, rejected = [], {}
+        for pk, current, delivery_method in rows:
+            if status in allowed_transitions(Order(status=current, delivery_method=delivery_method)):
+                updated.append((pk, current))
+            else:
+                rejected[pk] = current
+
+        now = timezone.now()
+        kept = [pk for pk in rejected if pk in tracking_numbers]
+        if kept:
+            Order.objects.filter(pk__in=kept).update(
+                tracking_number=_tracking_case(tracking_numbers, kept),
+                updated_at=now,
+            )
+        if not updated:
+            return [], rejected
+
+        values = {'status': status, 'updated_at': now}
+        if status == 'payee':
+            values['paid'] = True
+        tracked = [pk for pk, _current in updated if pk in tracking_numbers]
+        if tracked:
+            values['tracking_number'] = _tracking_case(tracking_numbers, tracked)
+        Order.objects.filter(pk__in=[pk for pk, _current in updated]).update(**values)
+        if status == 'annulee':
+            release_orders([pk for pk, _current in updated])
+
+        author = user if user is not None and user.is_authenticated else None
+        OrderTransition.objects.bulk_create([
+            OrderTransition(order_id=pk, from_status=current, to_status=status, user=author, note=note, created_at=now)
+            for pk, current in updated
+        ])
+    return [pk for pk, _current in updated], rejected
+
+
+def _tracking_case(tracking_numbers, order_ids):
+    return Case(
+        *(When(pk=pk, then=Value(tracking_numbers[pk])) for pk in order_ids),
+        default=F('tracking_number'),
+        output_field=CharField(),
+    )
+
+
+def assign_tracking_numbers(tracking_numbers):
+    """Écrit {id de commande: numéro de suivi} en un seul UPDATE ; retourne le nombre de commandes modifiées"""
+    if not tracking_numbers:
+        return 0
+    return Order.objects.filter(pk__in=list(tracking_numbers)).update(
+        tracking_number=_tracking_case(tracking_numbers, list(tracking_numbers)),
+        updated_at=timezone.now(),
+    )
+
+
+def parse_tracking_numbers(text):
+    """
+    Lit une liste collée ou un fichier CSV « identifiant de commande ; numéro
+    de suivi » (séparateur `;`, `,` ou tabulation). Retourne ({UUID: numéro},
+    [numéros des lignes invalides]).
+    """
+    first_line = text.strip().split('\n', 1)[0]
+    delimiter = next((d for d in (';', '\t', ',') if d in first_line), ';')
+
+    numbers, invalid = {}, []
+    for line_number, row in enumerate(csv.reader(io.StringIO(text), delimiter=delimiter), start=1):
+        row = [cell.strip() for cell in row]
+        if not any(row):
+            continue
+        try:
+            order_id = uuid.UUID(row[0].lstrip('#'))
+            tracking_number = row[1]
+        except (ValueError, IndexError):
+            # Une ligne d'en-tête éventuelle n'est pas une erreur
+            if line_number > 1:
+                invalid.append(line_number)
+            continue
+        if not tracking_number or len(tracking_number) > 100:
+            invalid.append(line_number)
+            continue
+        numbers[order_id] = tracking_number
+    return numbers, invalid
+
+
+def work_queue(name):
+    """Commandes d'une file de travail, les plus anciennes d'abord"""
+    _label, condition = WORK_QUEUES[name]
+    return Order.objects.filter(condition).order_by('created_at')
+
+
+def work_queue_counts():
+    """Nombre de commandes dans chaque file, en une requête"""
+    counts = Order.objects.filter(status__in=QUEUE_STATUSES).aggregate(**{
+        name: Count('pk', filter=condition) for name, (_label, condition) in WORK_QUEUES.items()
+    })
+    return [
+        {'name': name, 'label': label, 'count': counts[name]}
+        for name, (label, _condition) in WORK_QUEUES.items()
+    ]
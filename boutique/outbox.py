@@ -0,0 +1,179 @@
+"""
+Boîte d'envoi des e-mails transactionnels.
+
+Aucun e-mail n'est envoyé pendant une requête : `queue_email` l'enregistre
+(`OutboxEmail`) dans la transaction qui modifie la commande. L'e-mail existe
+donc si et seulement si le changement est validé, et le webhook Stripe ou la
+page de paiement ne subissent pas la latence SMTP.
+
+`send_queued` (commande `send_queued_emails`) vide ensuite la boîte par lots
+(`EMAIL_OUTBOX_BATCH_SIZE`) sur une seule connexion SMTP. Un lot est réservé
+sous verrou le temps de son envoi, plusieurs workers peuvent donc tourner en
+parallèle. Un envoi en échec est retenté plus tard, avec un délai doublé à
+chaque tentative (`EMAIL_OUTBOX_RETRY_DELAY`), puis abandonné après
+`EMAIL_OUTBOX_MAX_ATTEMPTS` tentatives.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def batch_size():
+    return getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+
+
+def max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def retry_delay(attempts):
+    """Délai avant la tentative suivant la `attempts`-ième"""
+    return timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60) * 2 ** (attempts - 1))
+
+
+def lease():
+    """Durée de réservation d'un lot : passé ce délai, un lot non traité (worker arrêté) est repris"""
+    return timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE', 300))
+
+
+def queue_email(key, to, subject, template, context, order=None):
+    """
+    Met un e-mail dans la boîte d'envoi, à appeler dans la transaction du
+    changement qu'il annonce. `template` est le chemin sans extension des
+    gabarits texte (.txt) et HTML (.html). Un e-mail de même `key` n'est
+    enregistré qu'une fois.
+    """
+    email, _created = OutboxEmail.objects.get_or_create(key=key, defaults={
+        'order': order,
+        'to': to,
+        'subject': subject,
+        'body': render_to_string(f'{template}.txt', context),
+        'html_body': render_to_string(f'{template}.html', context),
+    })
+    return email
+
+
+def queue_order_confirmation(order):
+    """E-mail de confirmation d'une commande payée"""
+    return queue_email(
+        f'order-confirmation:{order.pk}',
+        order.email,
+        _('Confirmation de votre commande #%(number)s') % {'number': str(order.pk)[:8]},
+        'boutique/emails/order_confirmation',
+        {'order': order, 'items': order.items.select_related('product')},
+        order=order,
+    )
+
+
+def claim_batch(size):
+    """Réserve les prochains e-mails à envoyer (ignorés par les autres workers pendant `lease()`)"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        OutboxEmail.objects.filter(pk__in=ids).update(next_attempt_at=now + lease())
+    return list(OutboxEmail.objects.filter(pk__in=ids).order_by('created_at', 'pk'))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject,
+        email.body,
+        settings.DEFAULT_FROM_EMAIL,
+        [email.to],
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _failed(email, error):
+    attempts = email.attempts + 1
+    given_up = attempts >= max_attempts()
+    OutboxEmail.objects.filter(pk=email.pk).update(
+        attempts=attempts,
+        status='failed' if given_up else 'pending',
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        last_error=str(error)[:1000],
+    )
+    if given_up:
+        logger.error("E-mail %s abandonné après %s tentatives : %s", email.key, attempts, error)
+    return given_up
+
+
+def send_batch(emails, connection):
+    """
+    Envoie un lot sur la connexion ouverte. Retourne (envoyés, abandonnés,
+    interrompu) : si la connexion perdue ne peut pas être rouverte, le reste
+    du lot est rendu à la boîte pour le prochain passage.
+    """
+    sent, given_up, interrupted = [], 0, False
+    try:
+        for position, email in enumerate(emails):
+            try:
+                if not connection.send_messages([build_message(email, connection)]):
+                    raise smtplib.SMTPException(_("Message refusé par le backend."))
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as exc:
+                given_up += _failed(email, exc)
+                # Connexion perdue : la rouvrir pour la suite du lot
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as exc:
+                    logger.warning("Connexion SMTP impossible à rouvrir, envoi interrompu : %s", exc)
+                    OutboxEmail.objects.filter(pk__in=[rest.pk for rest in emails[position + 1:]]).update(
+                        next_attempt_at=timezone.now(),
+                    )
+                    interrupted = True
+                    break
+            except Exception as exc:
+                given_up += _failed(email, exc)
+            else:
+                sent.append(email.pk)
+    finally:
+        # Même si le lot s'arrête sur une erreur : un e-mail parti ne doit pas être renvoyé
+        OutboxEmail.objects.filter(pk__in=sent).update(
+            status='sent',
+            sent_at=timezone.now(),
+            attempts=F('attempts') + 1,
+            last_error='',
+        )
+    return len(sent), given_up, interrupted
+
+
+def send_queued(size=None, connection=None):
+    """
+    Vide la boîte d'envoi : lots successifs sur une même connexion, jusqu'à
+    épuisement des e-mails arrivés à échéance. Retourne (envoyés, abandonnés).
+    """
+    size = size or batch_size()
+    connection = connection or get_connection()
+    sent = given_up = 0
+    with connection:
+        while True:
+            emails = claim_batch(size)
+            if not emails:
+                break
+            batch_sent, batch_given_up, interrupted = send_batch(emails, connection)
+            sent += batch_sent
+            given_up += batch_given_up
+            if interrupted or len(emails) < size:
+                break
+    return sent, given_up
@@ -0,0 +1,139 @@
+"""
+Mise en page PDF des factures et des bons de livraison (ReportLab).
+
+Ce module ne dépend pas de Django : il est exécuté dans les processus du pool
+de `documents` et ne reçoit que des données simples, préparées par
+`documents.order_data` (textes et montants déjà formatés).
+"""
+import io
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+STYLES = getSampleStyleSheet()
+
+TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f3f5')),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+    ('LINEBELOW', (0, 1), (-1, -1), 0.25, colors.lightgrey),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+
+def _text(value, style='Normal'):
+    # Paragraph interprète un balisage XML : échapper les textes saisis
+    return Paragraph(escape(str(value)), STYLES[style])
+
+
+def _lines(lines):
+    return Paragraph('<br/>'.join(escape(line) for line in lines if line), STYLES['Normal'])
+
+
+def _header(data, title):
+    parties = Table(
+        [[_lines(data['seller']), _lines(data['customer'])]],
+        colWidths=[90 * mm, 80 * mm],
+    )
+    parties.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+    return [
+        _text(f"{title} {data['number']}", 'Title'),
+        _text(f"Commande {data['order_number']} du {data['date']}"),
+        Spacer(1, 6 * mm),
+        parties,
+        Spacer(1, 8 * mm),
+    ]
+
+
+def _build(story, title):
+    output = io.BytesIO()
+    document = SimpleDocTemplate(
+        output, pagesize=A4, title=title,
+        leftMargin=20 * mm, rightMargin=20 * mm, topMargin=18 * mm, bottomMargin=18 * mm,
+    )
+    document.build(story)
+    return output.getvalue()
+
+
+def render_invoice(data):
+    """Facture : lignes au prix payé, code promo, livraison, total TTC et TVA comprise"""
+    rows = [['Produit', 'Qté', 'Prix unitaire', 'TVA', 'Total TTC']]
+    rows += [
+        [_text(line['name']), line['quantity'], line['unit_price'], line['tax_rate'], line['total']]
+        for line in data['lines']
+    ]
+    lines = Table(rows, colWidths=[75 * mm, 15 * mm, 30 * mm, 20 * mm, 30 * mm], repeatRows=1)
+    lines.setStyle(TABLE_STYLE)
+
+    totals = [['Sous-total', data['subtotal']]]
+    if data['discount']:
+        totals.append([f"Code promo {data['coupon']}", f"-{data['discount']}"])
+    totals.append(['Livraison', data['shipping']])
+    totals.append(['Total TTC', data['total']])
+    totals.append(['Dont TVA', data['tax']])
+    summary = Table(totals, colWidths=[50 * mm, 30 * mm], hAlign='RIGHT')
+    summary.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('FONTNAME', (0, -2), (-1, -2), 'Helvetica-Bold'),
+        ('LINEABOVE', (0, -2), (-1, -2), 0.5, colors.grey),
+    ]))
+
+    story = _header(data, 'Facture')
+    story += [lines, Spacer(1, 6 * mm), summary, Spacer(1, 10 * mm)]
+    story.append(_text(f"Paiement : {data['payment']}"))
+    return _build(story, f"Facture {data['number']}")
+
+
+def render_delivery_note(data):
+    """Bon de livraison : créneau, adresse, articles et poids, cadre de signature"""
+    delivery = data['delivery']
+    rows = [['Produit', 'Qté', 'Poids (kg)']]
+    rows += [[_text(line['name']), line['quantity'], line['weight']] for line in data['lines']]
+    rows.append(['Total', data['quantity'], data['weight']])
+    lines = Table(rows, colWidths=[110 * mm, 25 * mm, 35 * mm], repeatRows=1)
+    lines.setStyle(TABLE_STYLE)
+    lines.setStyle(TableStyle([('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')]))
+
+    signature = Table(
+        [['Reçu par (nom) :', 'Date et heure :'], ['Signature :', ''], ['', '']],
+        colWidths=[85 * mm, 85 * mm], rowHeights=[10 * mm, 10 * mm, 15 * mm],
+    )
+    signature.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+
+    story = _header(data, 'Bon de livraison')
+    story += [
+        _text(delivery['method'], 'Heading4'),
+        _lines([
+            f"Créneau : {delivery['slot']}" if delivery['slot'] else '',
+            f"Adresse : {delivery['address']}",
+            f"Téléphone : {delivery['phone']}" if delivery['phone'] else '',
+            f"Suivi : {delivery['tracking_number']}" if delivery['tracking_number'] else '',
+        ]),
+        Spacer(1, 6 * mm),
+        lines,
+        Spacer(1, 12 * mm),
+        signature,
+    ]
+    return _build(story, f"Bon de livraison {data['number']}")
+
+
+RENDERERS = {
+    'invoice': render_invoice,
+    'delivery_note': render_delivery_note,
+}
+
+
+def render(kind, data):
+    """Point d'entrée des processus du pool : octets du PDF demandé"""
+    return RENDERERS[kind](data)
@@ -0,0 +1,267 @@
+"""
+Prix de vente : promotions, prix dégressifs et codes promo.
+
+Les promotions (`Promotion`) s'appliquent au prix unitaire d'une ligne : sur
+un produit, une catégorie ou tout le catalogue, en pourcentage ou en montant
+fixe, éventuellement à partir d'une quantité (prix dégressif pour le ciment en
+gros). Pour une ligne, seule la remise la plus avantageuse est retenue.
+
+Les promotions en cours sont compilées en mémoire, indexées par produit et par
+catégorie : le prix d'une ligne ne parcourt que les règles qui la concernent.
+La structure est recompilée quand la version des promotions en base
+(dernière modification et nombre, relus au plus toutes les
+`PROMOTIONS_CHECK_INTERVAL` secondes) change, par quelque worker que ce soit,
+et à la prochaine date de début ou de fin d'une promotion (`valid_until`).
+
+Le code promo (`Coupon`) s'applique ensuite au sous-total du panier. La TVA
+comprise (`taxes.cart_tax`) est calculée dans le même passage.
+
+Une ligne de panier garde le prix relevé à l'ajout et sa version
+(`Product.price_version`, historisée dans `ProductPriceHistory`). Au
+paiement, `reprice_cart` aligne en une seule requête les lignes dont la
+version est périmée : la commande reprend exactement les prix affichés.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from itertools import chain
+
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .caching import CompiledTable, latest_change
+from .models import CartItem, Coupon, Product, Promotion
+from .taxes import cart_tax, tax_table
+
+CENT = Decimal('0.01')
+
+Rule = namedtuple('Rule', 'pk name kind value min_quantity')
+
+
+class CouponError(Exception):
+    """Code promo inconnu, expiré ou inapplicable au panier"""
+
+
+def apply_discount(price, kind, value):
+    """Prix (ou montant) après une remise en pourcentage ou en montant fixe"""
+    if kind == 'percent':
+        discounted = price * (100 - value) / 100
+    else:
+        discounted = price - value
+    return max(discounted, Decimal('0')).quantize(CENT)
+
+
+class PromotionTable:
+    """Promotions en cours indexées par produit, par catégorie et pour tout le catalogue"""
+
+    def __init__(self, promotions, now):
+        self.by_product, self.by_category, self.storewide = {}, {}, []
+        boundaries = []
+        for promotion in promotions:
+            boundaries.extend(
+                moment for moment in (promotion.starts_at, promotion.ends_at)
+                if moment is not None and moment > now
+            )
+            if promotion.starts_at is not None and promotion.starts_at > now:
+                continue
+            rule = Rule(promotion.pk, promotion.name, promotion.kind, promotion.value, promotion.min_quantity)
+            if promotion.product_id:
+                self.by_product.setdefault(promotion.product_id, []).append(rule)
+            elif promotion.category_id:
+                self.by_category.setdefault(promotion.category_id, []).append(rule)
+            else:
+                self.storewide.append(rule)
+        # Recompiler dès qu'une promotion commence ou se termine
+        self.valid_until = min(boundaries) if boundaries else None
+
+    def best(self, base_price, product_id, category_id, quantity):
+        """(prix unitaire, règle appliquée ou None) pour `quantity` unités"""
+        price, applied = base_price, None
+        rules = chain(self.by_product.get(product_id, ()), self.by_category.get(category_id, ()), self.storewide)
+        for rule in rules:
+            if rule.min_quantity > quantity:
+                continue
+            candidate = apply_discount(base_price, rule.kind, rule.value)
+            if candidate < price:
+                price, applied = candidate, rule
+        return price, applied
+
+
+def _build_table():
+    now = timezone.now()
+    promotions = Promotion.objects.filter(active=True).filter(Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+    return PromotionTable(promotions, now)
+
+
+_promotions = CompiledTable(
+    _build_table,
+    lambda: latest_change(Promotion.objects.all()),
+    'PROMOTIONS_CHECK_INTERVAL',
+)
+
+
+def promotion_table():
+    return _promotions.get()
+
+
+def invalidate_promotions():
+    """Recompile les promotions de ce processus (les autres relisent la version en base)"""
+    _promotions.invalidate()
+
+
+def promotions_fingerprint():
+    """
+    (dernier changement, nombre) des promotions pour les ETag du catalogue :
+    une promotion modifiée, commencée ou terminée change l'empreinte.
+    """
+    now = timezone.now()
+    stats = Promotion.objects.aggregate(
+        updated=Max('updated_at'),
+        started=Max('starts_at', filter=Q(starts_at__lte=now)),
+        ended=Max('ends_at', filter=Q(ends_at__lte=now)),
+        count=Count('pk'),
+    )
+    moments = [stats[key] for key in ('updated', 'started', 'ended') if stats[key] is not None]
+    return (max(moments) if moments else None), stats['count']
+
+
+def unit_price(product, quantity=1, base_price=None):
+    """Prix unitaire de `product` pour une ligne de `quantity` unités, sans requête"""
+    base_price = product.price if base_price is None else base_price
+    return promotion_table().best(base_price, product.pk, product.category_id, quantity)[0]
+
+
+def coupon_discount(coupon, subtotal, now=None):
+    """
+    Remise du code promo sur `subtotal`. Lève `CouponError` si le code ne
+    s'applique pas (inactif, hors période, épuisé, sous-total insuffisant).
+    """
+    now = now or timezone.now()
+    if (
+        not coupon.active
+        or (coupon.starts_at and coupon.starts_at > now)
+        or (coupon.ends_at and coupon.ends_at <= now)
+        or (coupon.max_uses is not None and coupon.used_count >= coupon.max_uses)
+    ):
+        raise CouponError(_("Le code promo %(code)s n'est plus valable.") % {'code': coupon.code})
+    if subtotal < coupon.min_subtotal:
+        raise CouponError(
+            _("Le code promo %(code)s est valable à partir de %(amount)s BIF d'achats.") % {
+                'code': coupon.code,
+                'amount': f'{coupon.min_subtotal:.0f}',
+            }
+        )
+    return subtotal - apply_discount(subtotal, coupon.kind, coupon.value)
+
+
+def find_coupon(code):
+    """Code promo saisi par le client (insensible à la casse)"""
+    coupon = Coupon.objects.filter(code=(code or '').strip().upper()).first()
+    if coupon is None:
+        raise CouponError(_("Ce code promo n'existe pas."))
+    return coupon
+
+
+def redeem_coupon(coupon):
+    """Compte une utilisation du code, sans jamais dépasser `max_uses` (UPDATE conditionnel)"""
+    redeemed = Coupon.objects.filter(pk=coupon.pk, active=True).filter(
+        Q(max_uses__isnull=True) | Q(used_count__lt=F('max_uses'))
+    ).update(used_count=F('used_count') + 1)
+    if not redeemed:
+        raise CouponError(_("Le code promo %(code)s n'est plus valable.") % {'code': coupon.code})
+
+
+def release_coupon(coupon_id):
+    """Rend l'utilisation comptée par `redeem_coupon` (commande abandonnée avant paiement)"""
+    Coupon.objects.filter(pk=coupon_id, used_count__gt=0).update(used_count=F('used_count') - 1)
+
+
+class CartLine:
+    """Ligne du panier tarifée"""
+
+    def __init__(self, item_id, product_id, quantity, base_price, unit_price, promotion, tax_rate, stale=False):
+        self.item_id = item_id
+        self.product_id = product_id
+        self.quantity = quantity
+        self.base_price = base_price
+        self.unit_price = unit_price
+        self.promotion = promotion
+        self.tax_rate = tax_rate
+        self.stale = stale  # prix relevé sur une version antérieure du prix produit
+        self.total = unit_price * quantity
+
+
+class CartPricing:
+    """Lignes tarifées, sous-total, code promo, TVA et charge (poids / volume) d'un panier"""
+
+    def __init__(self, lines, coupon, discount_amount, coupon_error, weight, volume):
+        self.lines = lines
+        self.coupon = coupon
+        self.discount_amount = discount_amount
+        self.coupon_error = coupon_error
+        self.weight = weight
+        self.volume = volume
+        self.subtotal = sum((line.total for line in lines), Decimal('0'))
+        self.quantity = sum(line.quantity for line in lines)
+        self.tax_amount, self.tax_breakdown = cart_tax(lines, self.total)
+
+    @property
+    def total(self):
+        """Montant des articles après code promo (hors livraison)"""
+        return self.subtotal - self.discount_amount
+
+    @property
+    def tax_rate(self):
+        """Taux de TVA du panier s'il est unique, sinon None"""
+        rates = {line.tax_rate for line in self.lines}
+        return rates.pop() if len(rates) == 1 else None
+
+    @property
+    def stale_lines(self):
+        return [line for line in self.lines if line.stale]
+
+
+def price_cart(cart):
+    """Tarifie le panier : une requête pour les lignes, une pour le code promo éventuel"""
+    table, taxes = promotion_table(), tax_table()
+    rows = CartItem.objects.filter(cart=cart).values_list(
+        'pk', 'product_id', 'product__category_id', 'product__tax_class_id', 'quantity', 'price',
+        'product__weight', 'product__volume', 'price_version', 'product__price_version',
+    ).order_by('pk')
+
+    lines, weight, volume = [], Decimal('0'), Decimal('0')
+    for (item_id, product_id, category_id, tax_class_id, quantity, base_price,
+         unit_weight, unit_volume, version, current) in rows:
+        price, rule = table.best(base_price, product_id, category_id, quantity)
+        lines.append(CartLine(
+            item_id, product_id, quantity, base_price, price, rule,
+            tax_rate=taxes.rate(tax_class_id, category_id),
+            stale=version != current,
+        ))
+        weight += unit_weight * quantity
+        volume += unit_volume * quantity
+
+    coupon, discount, error = None, Decimal('0'), None
+    if cart.coupon_id:
+        coupon = Coupon.objects.filter(pk=cart.coupon_id).first()
+    if coupon is not None and lines:
+        subtotal = sum((line.total for line in lines), Decimal('0'))
+        try:
+            discount = coupon_discount(coupon, subtotal)
+        except CouponError as exc:
+            error = str(exc)
+    return CartPricing(lines, coupon, discount, error, weight, volume)
+
+
+def reprice_cart(cart):
+    """
+    Reporte le prix actuel sur les lignes du panier relevées sur une version
+    antérieure du prix produit, en une seule requête. Retourne le nombre de
+    lignes modifiées.
+    """
+    current = Product.objects.filter(pk=OuterRef('product_id')).order_by()
+    return CartItem.objects.filter(cart=cart).exclude(price_version=F('product__price_version')).update(
+        price=Subquery(current.values('price')[:1]),
+        price_version=Subquery(current.values('price_version')[:1]),
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,135 @@
+"""
+Produits fréquemment achetés ensemble.
+
+La commande `rebuild_recommendations` (à lancer périodiquement, ex. chaque
+nuit) parcourt les lignes des commandes des `RECOMMENDATIONS_DAYS` derniers
+jours, par paquets et triées par commande, et compte les paires de produits
+achetés dans une même commande. Le comptage est creux : seules les paires
+réellement observées occupent de la mémoire. Chaque paire reçoit un score
+cosinus (commandes communes / √(commandes de a × commandes de b)), qui évite
+de recommander partout les produits les plus vendus. Les `RECOMMENDATIONS_TOP_K`
+meilleurs voisins de chaque produit sont enregistrés dans
+`ProductRecommendation`.
+
+La fiche produit lit ces voisins par clé primaire (`related_products`), et
+complète avec des produits de la même catégorie tant que l'historique ne
+suffit pas.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import OrderItem, Product, ProductRecommendation
+
+
+def top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 8)
+
+
+def min_support():
+    """Commandes communes minimales pour qu'une paire soit retenue"""
+    return getattr(settings, 'RECOMMENDATIONS_MIN_SUPPORT', 2)
+
+
+def window():
+    return getattr(settings, 'RECOMMENDATIONS_DAYS', 365)
+
+
+def max_basket():
+    """Au-delà de ce nombre de produits, une commande (chantier, revendeur) n'apporte pas de paires"""
+    return getattr(settings, 'RECOMMENDATIONS_MAX_BASKET', 30)
+
+
+def order_baskets(since):
+    """Ensembles de produits de chaque commande non annulée depuis `since`, lus par paquets"""
+    rows = OrderItem.objects.filter(
+        order__created_at__gte=since,
+        product__isnull=False,
+    ).exclude(order__status='annulee').order_by('order_id').values_list('order_id', 'product_id')
+    for _order_id, items in groupby(rows.iterator(chunk_size=2000), key=itemgetter(0)):
+        yield {product_id for _order, product_id in items}
+
+
+def co_purchase_counts(baskets):
+    """(commandes par produit, commandes communes par paire (a, b) avec a < b)"""
+    orders, pairs = Counter(), Counter()
+    limit = max_basket()
+    for basket in baskets:
+        orders.update(basket)
+        if 1 < len(basket) <= limit:
+            pairs.update(combinations(sorted(basket), 2))
+    return orders, pairs
+
+
+def neighbors(orders, pairs, k=None, support=None):
+    """{produit: [(voisin, commandes communes, score), …]} : les `k` meilleurs voisins de chaque produit"""
+    k = k or top_k()
+    support = support or min_support()
+    candidates = defaultdict(list)
+    for (a, b), count in pairs.items():
+        if count < support:
+            continue
+        score = count / math.sqrt(orders[a] * orders[b])
+        candidates[a].append((b, count, score))
+        candidates[b].append((a, count, score))
+    return {
+        product_id: heapq.nlargest(k, scored, key=lambda neighbor: (neighbor[2], neighbor[1], -neighbor[0]))
+        for product_id, scored in candidates.items()
+    }
+
+
+def rebuild_recommendations():
+    """Recalcule et remplace toutes les recommandations. Retourne le nombre de produits couverts."""
+    since = timezone.now() - timedelta(days=window())
+    orders, pairs = co_purchase_counts(order_baskets(since))
+    table = neighbors(orders, pairs)
+    rows = [
+        ProductRecommendation(
+            product_id=product_id,
+            recommended_id=recommended_id,
+            rank=rank,
+            co_purchases=count,
+            score=score,
+        )
+        for product_id, scored in table.items()
+        for rank, (recommended_id, count, score) in enumerate(scored, start=1)
+    ]
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len(table)
+
+
+def related_products(product, limit=4):
+    """
+    Produits à proposer sur la fiche de `product` : ses voisins précalculés
+    encore disponibles, complétés par des produits de sa catégorie.
+    """
+    related = list(
+        Product.objects.filter(recommended_with__product_id=product.pk, available=True)
+        .order_by('recommended_with__rank')[:limit]
+    )
+    if len(related) < limit:
+        related += Product.objects.filter(category_id=product.category_id, available=True).exclude(
+            pk__in=[product.pk, *(item.pk for item in related)]
+        )[:limit - len(related)]
+    return related
+
+
+def recommendations_fingerprint(product_id):
+    """(dernier changement, nombre) des voisins de `product_id`, pour l'ETag de la fiche produit"""
+    stats = ProductRecommendation.objects.filter(product_id=product_id).aggregate(
+        computed=Max('created_at'),
+        updated=Max('recommended__updated_at'),
+        count=Count('pk'),
+    )
+    moments = [stats[key] for key in ('computed', 'updated') if stats[key] is not None]
+    return (max(moments) if moments else None), stats['count']
@@ -0,0 +1,96 @@
+"""
+Réservations de stock pendant le paiement.
+
+Lorsqu'un client arrive sur la page de paiement, les quantités de son panier
+sont réservées pour une durée limitée (`STOCK_RESERVATION_TTL`). Le stock
+disponible à la vente est alors `Product.stock` moins la somme des
+réservations encore actives des autres paniers, calculée sur l'index
+`reservation_live_idx`. Les réservations expirées ne comptent plus dès leur
+échéance ; la commande `release_expired_reservations` les purge.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+def get_reservation_ttl():
+    """Durée de vie d'une réservation"""
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def _live_reservations(exclude_cart=None):
+    reservations = StockReservation.objects.filter(expires_at__gt=timezone.now())
+    if exclude_cart is not None:
+        reservations = reservations.exclude(cart_id=exclude_cart)
+    return reservations
+
+
+def reserved_quantities(product_ids, exclude_cart=None):
+    """Retourne {product_id: quantité réservée} en une seule requête groupée"""
+    rows = _live_reservations(exclude_cart).filter(
+        product_id__in=product_ids
+    ).values('product_id').annotate(total=Sum('quantity'))
+    return {row['product_id']: row['total'] for row in rows}
+
+
+def available_to_sell(product, exclude_cart=None):
+    """Stock disponible à la vente : stock physique moins les réservations actives"""
+    reserved = _live_reservations(exclude_cart).filter(
+        product_id=product.pk
+    ).aggregate(total=Sum('quantity'))['total'] or 0
+    return max(product.stock - reserved, 0)
+
+
+def reserve_cart(cart):
+    """
+    Réserve (ou prolonge) le stock de tous les articles du panier.
+
+    Les produits sont verrouillés le temps de la vérification pour que deux
+    paiements simultanés ne puissent pas réserver la même unité. Retourne la
+    liste des articles qui ne peuvent pas être servis ; dans ce cas aucune
+    réservation n'est modifiée.
+    """
+    with transaction.atomic():
+        items = list(cart.items.all())
+        product_ids = [item.product_id for item in items]
+        stock = dict(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .values_list('pk', 'stock')
+        )
+        reserved = reserved_quantities(product_ids, exclude_cart=cart.pk)
+
+        unavailable = [
+            item for item in items
+            if item.quantity > stock.get(item.product_id, 0) - reserved.get(item.product_id, 0)
+        ]
+        if unavailable:
+            return unavailable
+
+        expires_at = timezone.now() + get_reservation_ttl()
+        StockReservation.objects.filter(cart=cart).delete()
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                cart=cart,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                expires_at=expires_at,
+            )
+            for item in items
+        ])
+    return []
+
+
+def release_cart(cart):
+    """Libère les réservations d'un panier (commande créée ou panier abandonné)"""
+    return StockReservation.objects.filter(cart=cart).delete()[0]
+
+
+def release_expired():
+    """Supprime les réservations expirées ; retourne le nombre de lignes purgées"""
+    return StockReservation.objects.filter(expires_at__lte=timezone.now()).delete()[0]
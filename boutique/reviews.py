@@ -0,0 +1,211 @@
+"""
+Flux des avis clients d'un produit et modération.
+
+Seuls les avis approuvés sont servis, par pages de `REVIEWS_PAGE_SIZE`, avec
+une pagination par curseur (created_at, id) : chaque page est une lecture
+bornée sur l'index `review_feed_idx`, quelle que soit sa profondeur, et les
+utilisateurs sont joints dans la même requête.
+
+`submit_review` enregistre l'avis d'un client en un seul INSERT : la
+contrainte d'unicité (produit, utilisateur) tranche les doubles envois, et un
+second avis du même client modifie le premier.
+
+Un nouvel avis (ou un avis modifié) attend la modération. La file des avis en attente est lue de
+la même façon, sur l'index partiel `review_pending_idx` qui ne contient que
+ces avis. `moderate_reviews` approuve ou rejette une sélection en un seul
+UPDATE et reporte l'écart sur les agrégats des produits concernés
+(`Product.rating_count`, `rating_sum`) en un second UPDATE, sans recompter
+leurs avis.
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Product, Review
+
+PENDING = Q(approved=False, moderated_at__isnull=True)
+
+
+def get_page_size():
+    return getattr(settings, 'REVIEWS_PAGE_SIZE', 5)
+
+
+def encode_cursor(review):
+    raw = f"{review.created_at.isoformat()}|{review.pk}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Retourne (created_at, id) ou None si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def _after(reviews, cursor, descending=True):
+    position = decode_cursor(cursor) if cursor else None
+    if not position:
+        return reviews
+    created_at, pk = position
+    if descending:
+        return reviews.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return reviews.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+
+def _page(reviews, limit):
+    page = list(reviews[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def review_feed(product_id, after=None, limit=None):
+    """
+    Retourne (avis, curseur_suivant) pour un produit.
+
+    `after` est le curseur renvoyé par la page précédente ; le curseur suivant
+    vaut None lorsqu'il n'y a plus d'avis à charger.
+    """
+    limit = limit or get_page_size()
+    reviews = Review.objects.filter(
+        product_id=product_id,
+        approved=True,
+    ).select_related('user').order_by('-created_at', '-id')
+    return _page(_after(reviews, after), limit)
+
+
+def rating_summary(product_id):
+    """Note moyenne, nombre d'avis et répartition par note (avis approuvés) en une requête"""
+    rows = Review.objects.filter(
+        product_id=product_id,
+        approved=True,
+    ).values('rating').annotate(count=Count('id')).order_by()
+
+    counts = {str(i): 0 for i in range(1, 6)}
+    for row in rows:
+        counts[str(row['rating'])] = row['count']
+    total = sum(counts.values())
+
+    distribution = {
+        rating: {
+            'count': count,
+            'percentage': (count / total) * 100 if total else 0,
+        }
+        for rating, count in counts.items()
+    }
+    average = (
+        sum(int(rating) * count for rating, count in counts.items()) / total
+        if total else None
+    )
+    return {'average': average, 'count': total, 'distribution': distribution}
+
+
+def rating_delta(approved, rating):
+    """Part d'un avis dans les agrégats de son produit : (nombre, somme des notes)"""
+    return (1, rating) if approved else (0, 0)
+
+
+def apply_rating_deltas(deltas):
+    """Reporte {produit: (écart du nombre, écart de la somme)} sur les agrégats, en un seul UPDATE"""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+
+    def shift(index):
+        return Case(
+            *(When(pk=pk, then=Value(delta[index])) for pk, delta in deltas.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    Product.objects.filter(pk__in=deltas).update(
+        rating_count=F('rating_count') + shift(0),
+        rating_sum=F('rating_sum') + shift(1),
+        updated_at=timezone.now(),
+    )
+
+
+def pending_reviews(after=None, limit=None):
+    """(avis, curseur_suivant) de la file de modération, les plus anciens d'abord"""
+    limit = limit or getattr(settings, 'REVIEWS_MODERATION_PAGE_SIZE', 50)
+    reviews = Review.objects.filter(PENDING).select_related('product', 'user').order_by('created_at', 'id')
+    return _page(_after(reviews, after, descending=False), limit)
+
+
+def pending_count(cap=1000):
+    """Nombre d'avis en attente, compté au plus jusqu'à `cap` (lecture bornée de l'index partiel)"""
+    return Review.objects.filter(PENDING).order_by()[:cap].count()
+
+
+def moderate_reviews(review_ids, approve, user=None):
+    """
+    Approuve (`approve`) ou rejette les avis `review_ids` et met à jour les
+    agrégats de leurs produits. Les avis déjà dans l'état demandé sont
+    ignorés. Retourne le nombre d'avis modérés.
+    """
+    with transaction.atomic():
+        rows = list(
+            Review.objects.select_for_update()
+            .filter(pk__in=review_ids)
+            .filter(Q(moderated_at__isnull=True) | ~Q(approved=approve))
+            .values_list('pk', 'product_id', 'rating', 'approved')
+        )
+        if not rows:
+            return 0
+        now = timezone.now()
+        Review.objects.filter(pk__in=[pk for pk, *_rest in rows]).update(
+            approved=approve,
+            moderated_at=now,
+            moderated_by=user if user is not None and user.is_authenticated else None,
+            updated_at=now,
+        )
+
+        deltas = {}
+        for _pk, product_id, rating, approved in rows:
+            if approved == approve:
+                continue
+            count, total = rating_delta(True, rating)
+            sign = 1 if approve else -1
+            previous = deltas.get(product_id, (0, 0))
+            deltas[product_id] = (previous[0] + sign * count, previous[1] + sign * total)
+        apply_rating_deltas(deltas)
+    return len(rows)
+
+
+def submit_review(product_id, user, rating, comment=''):
+    """
+    Enregistre l'avis de `user` sur le produit et retourne (avis, créé).
+
+    Le cas courant est un seul INSERT. Si l'avis existe déjà (contrainte
+    d'unicité), il est modifié sur place et repasse en modération ; sa part
+    dans les agrégats du produit est retirée dans la même transaction (signal
+    `update_product_rating`). Lève `Product.DoesNotExist` si le produit
+    n'existe pas.
+    """
+    try:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    review = Review.objects.create(product_id=product_id, user=user, rating=rating, comment=comment)
+                return review, True
+            except IntegrityError:
+                review = Review.objects.select_for_update().filter(product_id=product_id, user=user).first()
+                if review is None:
+                    # Violation de la clé étrangère : produit inexistant
+                    raise
+            review.rating = rating
+            review.comment = comment
+            review.approved = False
+            review.moderated_at = None
+            review.moderated_by = None
+            review.save()
+            return review, False
+    except IntegrityError:
+        # Clé étrangère vérifiée à la validation de la transaction (PostgreSQL, SQLite)
+        raise Product.DoesNotExist
@@ -0,0 +1,105 @@
+"""
+Calcul des frais de livraison.
+
+Le prix dépend du poids taxable de l'envoi (le plus grand du poids réel et
+du poids volumétrique, `volume × SHIPPING_VOLUMETRIC_KG_PER_M3`) et de la
+zone de livraison (`PostalCodeLocation.zone`). Chaque zone a sa grille par
+tranches de poids (`ShippingRate`) ; une zone sans grille utilise la grille
+par défaut (zone vide). Sans grille applicable (aucun tarif saisi), le
+forfait `SHIPPING_FALLBACK_FEE` s'applique et une erreur est journalisée.
+
+Les grilles sont compilées en mémoire (pour chaque zone, les seuils triés et
+les tarifs correspondants) : un devis est une recherche dichotomique, sans
+requête. Chaque processus relit au plus toutes les
+`SHIPPING_RATES_CHECK_INTERVAL` secondes la version des tarifs en base
+(dernière modification et nombre de tarifs) et recompile sa grille si elle a
+changé : un tarif modifié par un autre worker est donc pris en compte.
+"""
+import logging
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+
+from .caching import CompiledTable, latest_change
+from .dispatch import normalize_postal_code
+from .models import PostalCodeLocation, ShippingRate
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+
+class RateTable:
+    """Grilles tarifaires compilées : {zone: (seuils triés, [(forfait, prix par kg)])}"""
+
+    def __init__(self, rates):
+        self.zones = {}
+        for rate in rates:
+            thresholds, prices = self.zones.setdefault(rate.zone, ([], []))
+            thresholds.append(rate.min_weight)
+            prices.append((rate.base_price, rate.price_per_kg))
+        if '' not in self.zones:
+            # Tarifs pas encore saisis (ou grille par défaut supprimée) : ne pas livrer gratuitement
+            logger.error(
+                "Pas de grille de livraison par défaut, forfait SHIPPING_FALLBACK_FEE appliqué hors des zones : %s",
+                ', '.join(sorted(self.zones)) or '-',
+            )
+
+    def price(self, weight, zone=''):
+        grid = self.zones.get(zone) or self.zones.get('')
+        if grid is None:
+            return Decimal(str(getattr(settings, 'SHIPPING_FALLBACK_FEE', 10000))).quantize(CENT)
+        thresholds, prices = grid
+        # Sous le premier seuil, la première tranche s'applique
+        base_price, price_per_kg = prices[max(bisect_right(thresholds, weight) - 1, 0)]
+        return (base_price + price_per_kg * weight).quantize(CENT)
+
+
+_rates = CompiledTable(
+    lambda: RateTable(ShippingRate.objects.order_by('zone', 'min_weight')),
+    lambda: latest_change(ShippingRate.objects.all()),
+    'SHIPPING_RATES_CHECK_INTERVAL',
+)
+
+
+def rate_table():
+    """Grille compilée, recompilée si les tarifs ont changé depuis la dernière vérification"""
+    return _rates.get()
+
+
+def invalidate_rates():
+    """Recompile la grille de ce processus (les autres relisent la version en base)"""
+    _rates.invalidate()
+
+
+def chargeable_weight(weight, volume):
+    """Poids taxable (kg) : poids réel ou poids volumétrique s'il est plus grand"""
+    factor = Decimal(str(getattr(settings, 'SHIPPING_VOLUMETRIC_KG_PER_M3', 333)))
+    return max(Decimal(weight), Decimal(volume) * factor)
+
+
+def zone_for_postal_code(postal_code):
+    """Zone de livraison d'un code postal ('' s'il n'est pas géolocalisé)"""
+    zone = PostalCodeLocation.objects.filter(
+        postal_code=normalize_postal_code(postal_code)
+    ).values_list('zone', flat=True).first()
+    return zone or ''
+
+
+def quote(weight, volume=0, zone=''):
+    """Frais de livraison d'un envoi de `weight` kg et `volume` m³ vers `zone`"""
+    return rate_table().price(chargeable_weight(weight, volume), zone)
+
+
+def quote_pricing(pricing, zone=''):
+    """Frais de livraison d'un panier tarifé (`pricing.price_cart`), sans requête"""
+    if not pricing.lines:
+        return Decimal('0')
+    return quote(pricing.weight, pricing.volume, zone)
+
+
+def quote_cart(cart, postal_code=None):
+    """Frais de livraison du panier (plus une requête pour la zone si `postal_code` est donné)"""
+    zone = zone_for_postal_code(postal_code) if postal_code else ''
+    return quote_pricing(cart.pricing, zone)
@@ -0,0 +1,84 @@
+"""
+Stockage des fichiers statiques pour la production.
+
+`collectstatic` produit des fichiers nommés d'après leur empreinte (cache
+navigateur « immutable » d'un an servi par WhiteNoise), accompagnés de leurs
+variantes gzip et brotli. Nos propres JS/CSS (dossier `static/` du projet)
+sont minifiés juste avant le calcul de l'empreinte ; les fichiers des
+applications tierces (admin, allauth...) sont laissés tels quels.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+try:
+    from rjsmin import jsmin
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    jsmin = None
+
+try:
+    from rcssmin import cssmin
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    cssmin = None
+
+logger = logging.getLogger(__name__)
+
+
+class MinifiedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Minifie les JS/CSS du projet puis les hache et les compresse (gzip/brotli)"""
+
+    def _get_minifier(self, path):
+        if path.endswith('.min.js') or path.endswith('.min.css'):
+            return None
+        if path.endswith('.js'):
+            return jsmin
+        if path.endswith('.css'):
+            return cssmin
+        return None
+
+    def _is_project_file(self, storage):
+        location = getattr(storage, 'location', None)
+        if not location:
+            return False
+        project_dirs = {
+            os.path.abspath(d[1] if isinstance(d, (list, tuple)) else d)
+            for d in settings.STATICFILES_DIRS
+        }
+        return os.path.abspath(location) in project_dirs
+
+    def minify_project_files(self, paths):
+        for prefixed_path, (storage, path) in list(paths.items()):
+            if not self._is_project_file(storage):
+                continue
+            minifier = self._get_minifier(prefixed_path)
+            if minifier is None:
+                if prefixed_path.endswith(('.js', '.css')) and not prefixed_path.endswith(('.min.js', '.min.css')):
+                    logger.warning("Minification ignorée pour %s (rjsmin/rcssmin non installé)", prefixed_path)
+                continue
+
+            with self.open(prefixed_path) as original:
+                content = original.read().decode('utf-8')
+            minified = minifier(content)
+            if len(minified) >= len(content):
+                continue
+            self.delete(prefixed_path)
+            self._save(prefixed_path, ContentFile(minified.encode('utf-8')))
+            # Le hachage relit la source : la faire pointer vers la copie minifiée
+            paths[prefixed_path] = (self, prefixed_path)
+
+    def stored_name(self, name):
+        # Certains gabarits référencent des images absentes du dépôt (logos de paiement...) :
+        # servir l'URL non hachée plutôt que lever une erreur 500
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            logger.warning("Fichier statique absent du manifeste : %s", name)
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self.minify_project_files(paths)
+        yield from super().post_process(paths, dry_run, **options)
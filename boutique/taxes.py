@@ -0,0 +1,89 @@
+"""
+TVA.
+
+Un produit relève de sa classe de TVA (`TaxClass`), sinon de celle de sa
+catégorie, sinon du taux par défaut `TAX_DEFAULT_RATE`. Les prix sont
+affichés TTC : la TVA d'une ligne est la part de taxe comprise dans son
+montant, après promotions et au prorata du code promo.
+
+Les taux et le rattachement des catégories sont compilés en mémoire : le taux
+d'une ligne se lit sans requête. Chaque processus relit au plus toutes les
+`TAX_RATES_CHECK_INTERVAL` secondes la version des classes de TVA et des
+catégories en base, et recompile sa table si elle a changé : une classe
+modifiée par un autre worker est prise en compte avant d'être figée dans une
+commande.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+
+from .caching import CompiledTable, latest_change
+from .models import Category, TaxClass
+
+CENT = Decimal('0.01')
+
+
+def default_rate():
+    return Decimal(str(getattr(settings, 'TAX_DEFAULT_RATE', 18)))
+
+
+class TaxTable:
+    """Taux de chaque classe de TVA et classe de chaque catégorie"""
+
+    def __init__(self, rates, categories):
+        self.rates = dict(rates)
+        self.categories = dict(categories)
+        self.default = default_rate()
+
+    def rate(self, tax_class_id, category_id):
+        tax_class_id = tax_class_id or self.categories.get(category_id)
+        return self.rates.get(tax_class_id, self.default)
+
+
+_taxes = CompiledTable(
+    lambda: TaxTable(
+        TaxClass.objects.values_list('pk', 'rate'),
+        Category.objects.exclude(tax_class=None).values_list('pk', 'tax_class_id'),
+    ),
+    # Le rattachement d'une catégorie change son updated_at
+    lambda: (latest_change(TaxClass.objects.all()), latest_change(Category.objects.all())),
+    'TAX_RATES_CHECK_INTERVAL',
+)
+
+
+def tax_table():
+    return _taxes.get()
+
+
+def invalidate_taxes():
+    """Recompile les taux de ce processus (les autres relisent la version en base)"""
+    _taxes.invalidate()
+
+
+def rate_for(product):
+    """Taux de TVA (%) du produit, sans requête"""
+    return tax_table().rate(product.tax_class_id, product.category_id)
+
+
+def included_tax(amount, rate):
+    """TVA comprise dans un montant TTC"""
+    return (amount * rate / (100 + rate)).quantize(CENT)
+
+
+def cart_tax(lines, total):
+    """
+    TVA comprise dans `total` (montant des lignes tarifées après code promo),
+    ventilée par taux : (montant, {taux: montant}). La remise du code promo
+    est répartie sur les lignes au prorata de leur montant.
+    """
+    bases = {}
+    for line in lines:
+        bases[line.tax_rate] = bases.get(line.tax_rate, Decimal('0')) + line.total
+    subtotal = sum(bases.values(), Decimal('0'))
+    if not subtotal:
+        return Decimal('0'), {}
+    breakdown = {
+        rate: included_tax(base * total / subtotal, rate)
+        for rate, base in sorted(bases.items()) if rate
+    }
+    return sum(breakdown.values(), Decimal('0')), breakdown
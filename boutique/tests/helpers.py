@@ -0,0 +1,49 @@
+"""Objets de test communs : catégories, produits et commandes minimaux"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.text import slugify
+
+from boutique.models import Category, Order, Product
+
+# Les pages rendues en test ne dépendent pas d'un `collectstatic` préalable
+PLAIN_STATIC_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def make_category(slug='ciment', **fields):
+    return Category.objects.create(name=fields.pop('name', slug.title()), slug=slug, **fields)
+
+
+def make_product(category, name='CEM II 42.5', price=30000, stock=100, **fields):
+    return Product.objects.create(
+        category=category,
+        name=name,
+        slug=fields.pop('slug', slugify(name)),
+        price=Decimal(price),
+        stock=stock,
+        image=fields.pop('image', 'products/test.jpg'),
+        **fields,
+    )
+
+
+def make_user(username='client', **fields):
+    return get_user_model().objects.create_user(username, f'{username}@example.com', 'secret', **fields)
+
+
+def make_order(user=None, **fields):
+    values = {
+        'first_name': 'Jean',
+        'last_name': 'Ndayishimiye',
+        'email': 'jean@example.com',
+        'address': 'Avenue de la Plage 12',
+        'postal_code': '1000',
+        'city': 'Bujumbura',
+        'country': 'BI',
+        'total_amount': Decimal('0'),
+    }
+    values.update(fields)
+    return Order.objects.create(user=user, **values)
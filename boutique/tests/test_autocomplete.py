@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from boutique import autocomplete
+from boutique.autocomplete import PRODUCT, apply_changes, product_entry, rebuild_index, suggest
+
+from .helpers import make_category, make_product
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            AUTOCOMPLETE_INDEX_PATH=os.path.join(directory, 'autocomplete.idx'),
+            AUTOCOMPLETE_CHECK_INTERVAL=0,
+            AUTOCOMPLETE_COMPACT_AFTER=200,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        autocomplete._state.update(index=None, identity=None, checked_at=0.0)
+
+        self.category = make_category('ciment')
+        self.portland = make_product(self.category, name='Ciment Portland CEM II')
+
+    def product_names(self, query):
+        return [product['name'] for product in suggest(query)['products']]
+
+    def test_first_search_builds_missing_index(self):
+        self.assertEqual(self.product_names('port'), ['Ciment Portland CEM II'])
+        self.assertEqual([category['name'] for category in suggest('cim')['categories']], ['Ciment'])
+
+    def test_matches_inner_words_without_accents(self):
+        make_product(self.category, name='Béton prêt à l\'emploi')
+        rebuild_index()
+        self.assertEqual(self.product_names('pret'), ["Béton prêt à l'emploi"])
+        self.assertEqual(self.product_names('BETON'), ["Béton prêt à l'emploi"])
+
+    def test_changes_are_merged_over_the_base_index(self):
+        rebuild_index()
+        added = make_product(self.category, name='Ciment Prompt')
+        self.portland.name = 'Ciment Blanc'
+
+        apply_changes({
+            (PRODUCT, added.pk): product_entry(added),
+            (PRODUCT, self.portland.pk): product_entry(self.portland),
+        })
+
+        self.assertEqual(self.product_names('ciment'), ['Ciment Blanc', 'Ciment Prompt'])
+        self.assertEqual(self.product_names('portland'), [])
+
+        apply_changes({(PRODUCT, added.pk): None})
+        self.assertEqual(self.product_names('prompt'), [])
+
+    def test_compaction_keeps_merged_entries(self):
+        rebuild_index()
+        with override_settings(AUTOCOMPLETE_COMPACT_AFTER=1):
+            added = make_product(self.category, name='Ciment Prompt')
+            apply_changes({(PRODUCT, added.pk): product_entry(added)})
+            apply_changes({(PRODUCT, self.portland.pk): None})
+
+        self.assertEqual(os.path.getsize(autocomplete.delta_path()), 0)
+        self.assertEqual(self.product_names('ciment'), ['Ciment Prompt'])
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import stripe
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from boutique.models import Coupon, DeliverySlot, Order, OrderTransition, ShippingRate
+from boutique.orders import transition
+
+from .helpers import PLAIN_STATIC_STORAGES, make_category, make_order, make_product, make_user
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class CartApiTests(TestCase):
+    def setUp(self):
+        self.product = make_product(make_category())
+        self.client.force_login(make_user())
+
+    def test_json_body_must_be_an_object(self):
+        for body in ('[]', '[1, 2]', '"x"', '3'):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    reverse('boutique:cart_api_add', args=[self.product.pk]), body, content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class CheckoutFailureTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        self.product = make_product(make_category(), weight=Decimal('50'))
+        self.coupon = Coupon.objects.create(code='bienvenue', kind='percent', value=5, max_uses=1)
+        ShippingRate.objects.create(zone='', min_weight=0, base_price=5000, price_per_kg=10)
+        self.day = timezone.localdate() + timedelta(days=2)
+
+    def checkout(self):
+        self.client.post(reverse('boutique:cart_api_add', args=[self.product.pk]), {'quantity': 10})
+        self.client.post(reverse('boutique:apply_coupon'), {'code': 'bienvenue'})
+        return self.client.post(reverse('boutique:checkout'), {
+            'first_name': 'Jean', 'last_name': 'N', 'email': 'jean@example.com', 'address': 'Avenue 1',
+            'postal_code': '1000', 'city': 'Bujumbura', 'country': 'BI',
+            'delivery_method': 'delivery', 'delivery_date': self.day.isoformat(), 'delivery_time': '08:00',
+            'card_number': '4242424242424242', 'card_exp_month': '01',
+            'card_exp_year': str(timezone.now().year + 1), 'card_cvv': '123',
+        })
+
+    @mock.patch('stripe.PaymentIntent.create', side_effect=stripe.error.APIConnectionError('hors ligne'))
+    def test_failed_intent_releases_slot_and_coupon(self, create_intent):
+        with self.assertLogs('boutique.views', 'ERROR'):
+            self.checkout()
+
+        order = Order.objects.get()
+        self.assertEqual(order.status, 'annulee')
+        self.assertIsNone(order.delivery_slot_id)
+        self.assertEqual(DeliverySlot.objects.get(date=self.day).trucks_booked, 0)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+
+        # Un nouvel essai peut utiliser le même créneau et le même code
+        with self.assertLogs('boutique.views', 'ERROR'):
+            self.checkout()
+        self.assertEqual(Order.objects.filter(coupon=self.coupon).count(), 2)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class PaymentTests(TestCase):
+    card = {
+        'card_number': '4242424242424242', 'card_exp_month': '01',
+        'card_exp_year': str(timezone.now().year + 1), 'card_cvv': '123',
+    }
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        self.order = make_order(user=self.user, total_amount=Decimal('60000'))
+        patcher = mock.patch.multiple(
+            stripe,
+            Token=mock.Mock(create=mock.Mock(return_value=SimpleNamespace(id='tok_1'))),
+            Customer=mock.Mock(create=mock.Mock(return_value=SimpleNamespace(id='cus_1'))),
+            Charge=mock.Mock(create=mock.Mock(return_value=SimpleNamespace(id='ch_1'))),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pay(self):
+        return self.client.post(reverse('boutique:payment', args=[self.order.pk]), self.card)
+
+    def test_payment_moves_order_to_paid(self):
+        response = self.pay()
+
+        self.assertRedirects(response, reverse('boutique:payment_success', args=[self.order.pk]), fetch_redirect_response=False)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.paid), ('payee', True))
+        self.assertEqual(OrderTransition.objects.get(order=self.order).note, 'Stripe ch_1')
+
+    def test_cancelled_order_is_not_charged(self):
+        transition(self.order, 'annulee')
+
+        response = self.pay()
+
+        self.assertRedirects(response, reverse('boutique:order_detail', args=[self.order.pk]), fetch_redirect_response=False)
+        stripe.Charge.create.assert_not_called()
+
+    def test_order_cancelled_during_charge_is_not_retried(self):
+        def cancel_then_charge(**kwargs):
+            transition(Order.objects.get(pk=self.order.pk), 'annulee')
+            return SimpleNamespace(id='ch_2')
+        stripe.Charge.create.side_effect = cancel_then_charge
+
+        with self.assertLogs('boutique.views', 'ERROR') as logs:
+            response = self.pay()
+
+        self.assertRedirects(response, reverse('boutique:order_detail', args=[self.order.pk]), fetch_redirect_response=False)
+        self.assertIn('ch_2', logs.output[0])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'annulee')
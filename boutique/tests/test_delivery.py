@@ -0,0 +1,58 @@
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from boutique.delivery import SlotUnavailable, book
+from boutique.models import DeliverySlot
+from boutique.orders import transition
+
+from .helpers import make_order
+
+
+@override_settings(DELIVERY_SLOT_TRUCKS=2, DELIVERY_TRUCK_PAYLOAD_KG=10000, DELIVERY_MIN_LEAD_DAYS=1)
+class SlotBookingTests(TestCase):
+    def setUp(self):
+        self.day = timezone.localdate() + timedelta(days=2)
+
+    def order(self):
+        return make_order(delivery_date=self.day, delivery_time=time(8))
+
+    def slot(self):
+        return DeliverySlot.objects.get(date=self.day, start_time=time(8))
+
+    def test_booking_stops_at_truck_capacity(self):
+        book(self.order(), Decimal('4000'))
+        book(self.order(), Decimal('4000'))
+        with self.assertRaises(SlotUnavailable):
+            book(self.order(), Decimal('500'))
+
+        slot = self.slot()
+        self.assertEqual((slot.trucks_booked, slot.weight_booked), (2, Decimal('8000')))
+
+    def test_booking_stops_at_weight_capacity(self):
+        DeliverySlot.objects.create(
+            date=self.day, start_time=time(8), truck_capacity=5, weight_capacity=Decimal('6000'),
+        )
+        book(self.order(), Decimal('5000'))
+        with self.assertRaises(SlotUnavailable):
+            book(self.order(), Decimal('1500'))
+        self.assertEqual(self.slot().weight_booked, Decimal('5000'))
+
+    def test_heavy_order_needs_several_trucks(self):
+        book(self.order(), Decimal('15000'))
+        self.assertEqual(self.slot().trucks_booked, 2)
+
+    def test_cancelled_order_frees_its_place(self):
+        order = self.order()
+        book(order, Decimal('15000'))
+        transition(order, 'annulee')
+
+        slot = self.slot()
+        self.assertEqual((slot.trucks_booked, slot.weight_booked), (0, Decimal('0')))
+        book(self.order(), Decimal('15000'))
+
+    def test_date_outside_booking_window_is_refused(self):
+        with self.assertRaises(SlotUnavailable):
+            book(make_order(delivery_date=timezone.localdate(), delivery_time=time(8)), Decimal('100'))
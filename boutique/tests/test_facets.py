@@ -0,0 +1,72 @@
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from boutique import facets
+from boutique.models import Product, ProductSpecification
+
+from .helpers import make_category, make_product
+
+
+@override_settings(FACETS_PRICE_BANDS=[20000, 40000], FACETS_CHECK_INTERVAL=0)
+class FacetSearchTests(TestCase):
+    def setUp(self):
+        facets._state.update(index=None, checked_at=0.0)
+        self.cement = make_category('ciment')
+        self.sand = make_category('sable')
+        self.products = {}
+        for name, category, price, stock, grade in (
+            ('CEM I 42.5', self.cement, 35000, 10, '42.5'),
+            ('CEM II 42.5', self.cement, 30000, 0, '42.5'),
+            ('CEM II 32.5', self.cement, 25000, 5, '32.5'),
+            ('CEM III 52.5', self.cement, 45000, 5, '52.5'),
+            ('Sable fin', self.sand, 8000, 50, None),
+        ):
+            product = make_product(category, name=name, price=price, stock=stock)
+            if grade:
+                ProductSpecification.objects.create(product=product, name='Classe', value=grade)
+            self.products[name] = product
+
+    def search(self, query='', category=None):
+        return facets.search(QueryDict(query), category=category)
+
+    def spec_counts(self, result, name='Classe'):
+        return {value: count for spec, values in result.specifications if spec == name for value, count, _checked in values}
+
+    def test_counts_without_filter(self):
+        result = self.search()
+        self.assertEqual(len(result.products), 5)
+        self.assertEqual(result.categories, {self.cement.pk: 4, self.sand.pk: 1})
+        self.assertEqual(result.in_stock, (4, False))
+        self.assertEqual(self.spec_counts(result), {'32.5': 1, '42.5': 2, '52.5': 1})
+
+    def test_filter_narrows_other_facets_but_not_its_own(self):
+        result = self.search('spec=Classe:42.5')
+
+        self.assertEqual({product.name for product in result.products[:10]}, {'CEM I 42.5', 'CEM II 42.5'})
+        self.assertEqual(result.categories, {self.cement.pk: 2, self.sand.pk: 0})
+        self.assertEqual(result.in_stock, (1, False))
+        self.assertEqual(
+            [(key, count) for key, _label, count, _checked in result.prices],
+            [('-20000', 0), ('20000-40000', 2), ('40000-', 0)],
+        )
+        # Les autres classes restent proposées avec leur effectif
+        self.assertEqual(self.spec_counts(result), {'32.5': 1, '42.5': 2, '52.5': 1})
+
+    def test_filters_combine_across_facets(self):
+        result = self.search('spec=Classe:42.5&spec=Classe:32.5&en_stock=1', category=self.cement)
+        self.assertEqual({product.name for product in result.products[:10]}, {'CEM I 42.5', 'CEM II 32.5'})
+        self.assertTrue(result.active)
+
+    def test_changed_product_is_picked_up(self):
+        self.assertEqual(self.search('en_stock=1').products.size, 4)
+        Product.objects.filter(pk=self.products['Sable fin'].pk).update(stock=0, updated_at=timezone.now())
+        self.assertEqual(self.search('en_stock=1').products.size, 3)
+
+    def test_unavailable_products_are_left_out(self):
+        product = self.products['CEM III 52.5']
+        product.available = False
+        product.save()
+        result = self.search()
+        self.assertEqual(len(result.products), 4)
+        self.assertNotIn('52.5', self.spec_counts(result))
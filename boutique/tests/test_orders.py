@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from boutique.models import Order, OrderItem, OrderTransition
+from boutique.orders import TransitionError, allowed_transitions, bulk_transition, transition
+
+from .helpers import make_category, make_order, make_product, make_user
+
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('staff', is_staff=True)
+
+    def test_allowed_transition_is_logged(self):
+        order = make_order()
+        transition(order, 'payee', user=self.staff, note='virement')
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'payee')
+        self.assertTrue(order.paid)
+        log = OrderTransition.objects.get(order=order)
+        self.assertEqual((log.from_status, log.to_status), ('en_attente', 'payee'))
+        self.assertEqual((log.user, log.note), (self.staff, 'virement'))
+
+    def test_rejected_transition_changes_nothing(self):
+        order = make_order(status='livree')
+        with self.assertRaises(TransitionError):
+            transition(order, 'annulee', user=self.staff)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'livree')
+        self.assertFalse(OrderTransition.objects.filter(order=order).exists())
+
+    def test_status_is_read_under_lock(self):
+        order = make_order()
+        Order.objects.filter(pk=order.pk).update(status='annulee')
+        # L'instance en mémoire est périmée : c'est le statut en base qui compte
+        with self.assertRaises(TransitionError):
+            transition(order, 'payee')
+
+    def test_delivery_method_limits_transitions(self):
+        self.assertNotIn('prete', allowed_transitions(make_order(status='en_preparation', delivery_method='delivery')))
+        self.assertNotIn('expediee', allowed_transitions(make_order(status='en_preparation', delivery_method='pickup')))
+
+
+class BulkTransitionTests(TestCase):
+    def test_updates_allowed_orders_and_reports_rejected(self):
+        pending, paid, delivered = make_order(), make_order(status='payee'), make_order(status='livree')
+
+        updated, rejected = bulk_transition([pending.pk, paid.pk, delivered.pk], 'annulee', note='lot')
+
+        self.assertCountEqual(updated, [pending.pk, paid.pk])
+        self.assertEqual(rejected, {delivered.pk: 'livree'})
+        self.assertEqual(
+            dict(Order.objects.values_list('pk', 'status')),
+            {pending.pk: 'annulee', paid.pk: 'annulee', delivered.pk: 'livree'},
+        )
+        self.assertCountEqual(
+            OrderTransition.objects.values_list('order_id', 'from_status', 'to_status'),
+            [(pending.pk, 'en_attente', 'annulee'), (paid.pk, 'payee', 'annulee')],
+        )
+
+    def test_tracking_numbers_written_per_order(self):
+        first = make_order(status='en_preparation')
+        second = make_order(status='en_preparation')
+        delivered = make_order(status='livree')
+
+        updated, rejected = bulk_transition(
+            [first.pk, second.pk, delivered.pk], 'expediee',
+            tracking_numbers={first.pk: 'TRK-1', second.pk: 'TRK-2', delivered.pk: 'TRK-3'},
+        )
+
+        self.assertCountEqual(updated, [first.pk, second.pk])
+        self.assertEqual(list(rejected), [delivered.pk])
+        self.assertEqual(
+            dict(Order.objects.values_list('pk', 'tracking_number')),
+            {first.pk: 'TRK-1', second.pk: 'TRK-2', delivered.pk: 'TRK-3'},
+        )
+        self.assertEqual(Order.objects.get(pk=delivered.pk).status, 'livree')
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        category = make_category()
+        self.cement = make_product(category, price=30000)
+        self.sand = make_product(category, name='Sable', price=5000)
+
+    def test_line_count_and_total_follow_lines(self):
+        order = make_order()
+        first = OrderItem.objects.create(order=order, product=self.cement, price=Decimal('30000'), quantity=2)
+        OrderItem.objects.create(order=order, product=self.sand, price=Decimal('5000'), quantity=4)
+
+        order.refresh_from_db()
+        self.assertEqual(order.get_line_count(), 2)
+        self.assertEqual(order.get_total_cost(), Decimal('80000'))
+
+        first.quantity = 1
+        first.save()
+        order.refresh_from_db()
+        self.assertEqual(order.get_total_cost(), Decimal('50000'))
+
+        first.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.get_line_count(), 1)
+        self.assertEqual(order.get_total_cost(), Decimal('20000'))
+
+    def test_stale_order_save_keeps_totals(self):
+        order = make_order()
+        stale = Order.objects.get(pk=order.pk)
+        OrderItem.objects.create(order=order, product=self.cement, price=Decimal('30000'), quantity=1)
+
+        stale.notes = 'Livrer avant midi'
+        stale.save()
+
+        order.refresh_from_db()
+        self.assertEqual((order.get_line_count(), order.get_total_cost()), (1, Decimal('30000')))
@@ -0,0 +1,103 @@
+import smtplib
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from boutique.models import OutboxEmail
+from boutique.outbox import claim_batch, send_batch, send_queued
+
+
+class FakeConnection:
+    """Connexion SMTP de test : `failures` associe un destinataire à l'exception levée à son envoi"""
+
+    def __init__(self, failures=None, reopen_error=None):
+        self.failures = failures or {}
+        self.reopen_error = reopen_error
+        self.sent = []
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        if self.opened > 1 and self.reopen_error:
+            raise self.reopen_error
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.failures.get(message.to[0])
+            if error:
+                raise error
+            self.sent.append(message.to[0])
+        return len(messages)
+
+
+def queue(*recipients):
+    return [
+        OutboxEmail.objects.create(key=f'test:{to}', to=to, subject='Commande', body='Merci')
+        for to in recipients
+    ]
+
+
+@override_settings(EMAIL_OUTBOX_RETRY_DELAY=60, EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_LEASE=300)
+class OutboxTests(TestCase):
+    def test_failed_send_is_retried_later(self):
+        queue('a@example.com', 'b@example.com')
+        connection = FakeConnection(failures={'a@example.com': smtplib.SMTPRecipientsRefused({})})
+
+        self.assertEqual(send_queued(connection=connection), (1, 0))
+
+        failed = OutboxEmail.objects.get(to='a@example.com')
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(OutboxEmail.objects.get(to='b@example.com').status, 'sent')
+        # Pas encore à échéance : rien à renvoyer
+        self.assertEqual(claim_batch(10), [])
+
+        OutboxEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued(connection=FakeConnection()), (1, 0))
+        self.assertEqual(OutboxEmail.objects.get(pk=failed.pk).status, 'sent')
+
+    def test_gives_up_after_max_attempts(self):
+        email, = queue('a@example.com')
+        OutboxEmail.objects.filter(pk=email.pk).update(attempts=2)
+        connection = FakeConnection(failures={'a@example.com': smtplib.SMTPException('refusé')})
+
+        with self.assertLogs('boutique.outbox', 'ERROR'):
+            self.assertEqual(send_queued(connection=connection), (0, 1))
+        self.assertEqual(OutboxEmail.objects.get(pk=email.pk).status, 'failed')
+
+    def test_interrupted_batch_keeps_sent_emails(self):
+        first, second, third = queue('a@example.com', 'b@example.com', 'c@example.com')
+        connection = FakeConnection(
+            failures={'b@example.com': smtplib.SMTPServerDisconnected()},
+            reopen_error=ConnectionRefusedError(),
+        )
+        connection.open()
+
+        with self.assertLogs('boutique.outbox', 'WARNING'):
+            sent, given_up, interrupted = send_batch(claim_batch(10), connection)
+
+        self.assertEqual((sent, given_up, interrupted), (1, 0, True))
+        statuses = {email.to: (email.status, email.attempts) for email in OutboxEmail.objects.all()}
+        self.assertEqual(statuses, {
+            'a@example.com': ('sent', 1),
+            'b@example.com': ('pending', 1),
+            'c@example.com': ('pending', 0),
+        })
+        # Le reste du lot est rendu à la boîte sans attendre la fin de la réservation
+        self.assertEqual([email.pk for email in claim_batch(10)], [third.pk])
+
+    def test_claimed_batch_is_skipped_by_other_workers(self):
+        queue('a@example.com')
+        self.assertEqual(len(claim_batch(10)), 1)
+        self.assertEqual(claim_batch(10), [])
@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from boutique.models import Cart, CartItem, Coupon, Promotion, TaxClass
+from boutique.pricing import CartLine, CouponError, invalidate_promotions, price_cart, redeem_coupon, release_coupon
+from boutique.taxes import cart_tax, included_tax, invalidate_taxes
+
+from .helpers import make_category, make_product
+
+
+class PricingTestCase(TestCase):
+    def setUp(self):
+        # Les tables compilées survivent au rollback des tests précédents
+        invalidate_promotions()
+        invalidate_taxes()
+        self.category = make_category()
+        self.cement = make_product(self.category, price=30000)
+
+    def cart(self, quantity, product=None, coupon=None):
+        product = product or self.cement
+        cart = Cart.objects.create(coupon=coupon)
+        CartItem.objects.create(cart=cart, product=product, quantity=quantity, price=product.price)
+        return cart
+
+
+class PromotionTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        Promotion.objects.create(name='Remise sac', kind='amount', value=2000, product=self.cement)
+        Promotion.objects.create(name='Gros volume', kind='percent', value=10, category=self.category, min_quantity=10)
+
+    def test_best_discount_applies(self):
+        self.assertEqual(price_cart(self.cart(5)).lines[0].unit_price, Decimal('28000'))
+
+    def test_quantity_break_wins_from_its_threshold(self):
+        pricing = price_cart(self.cart(10))
+        self.assertEqual(pricing.lines[0].unit_price, Decimal('27000'))
+        self.assertEqual(pricing.subtotal, Decimal('270000'))
+
+    def test_inactive_promotion_is_ignored(self):
+        Promotion.objects.update(active=False)
+        invalidate_promotions()
+        self.assertEqual(price_cart(self.cart(10)).lines[0].unit_price, Decimal('30000'))
+
+
+class CouponTests(PricingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.coupon = Coupon.objects.create(code='bienvenue', kind='percent', value=10, max_uses=2)
+
+    def test_coupon_discounts_subtotal(self):
+        pricing = price_cart(self.cart(2, coupon=self.coupon))
+        self.assertEqual(pricing.discount_amount, Decimal('6000'))
+        self.assertEqual(pricing.total, Decimal('54000'))
+        self.assertIsNone(pricing.coupon_error)
+
+    def test_redemption_stops_at_max_uses(self):
+        redeem_coupon(self.coupon)
+        redeem_coupon(self.coupon)
+        with self.assertRaises(CouponError):
+            redeem_coupon(self.coupon)
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 2)
+        self.assertIsNotNone(price_cart(self.cart(1, coupon=self.coupon)).coupon_error)
+
+    def test_released_use_can_be_redeemed_again(self):
+        redeem_coupon(self.coupon)
+        redeem_coupon(self.coupon)
+        release_coupon(self.coupon.pk)
+        redeem_coupon(self.coupon)
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 2)
+
+
+class TaxTests(PricingTestCase):
+    def test_included_tax_is_rounded_to_the_cent(self):
+        self.assertEqual(included_tax(Decimal('100'), Decimal('18')), Decimal('15.25'))
+        self.assertEqual(included_tax(Decimal('30000'), Decimal('18')), Decimal('4576.27'))
+
+    def test_coupon_is_spread_over_rates(self):
+        lines = [
+            CartLine(1, 1, 1, Decimal('10000'), Decimal('10000'), None, tax_rate=Decimal('18')),
+            CartLine(2, 2, 1, Decimal('10000'), Decimal('10000'), None, tax_rate=Decimal('0')),
+        ]
+        amount, breakdown = cart_tax(lines, Decimal('18000'))
+        self.assertEqual(breakdown, {Decimal('18'): Decimal('1372.88')})
+        self.assertEqual(amount, Decimal('1372.88'))
+
+    def test_product_class_overrides_category_class(self):
+        reduced = TaxClass.objects.create(name='Réduit', rate=Decimal('10'))
+        self.category.tax_class = TaxClass.objects.create(name='Normal', rate=Decimal('18'))
+        self.category.save()
+        sand = make_product(self.category, name='Sable', price=11000, tax_class=reduced)
+
+        self.assertEqual(price_cart(self.cart(1)).tax_rate, Decimal('18'))
+        pricing = price_cart(self.cart(1, product=sand))
+        self.assertEqual((pricing.tax_rate, pricing.tax_amount), (Decimal('10'), Decimal('1000.00')))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from boutique.models import Cart, CartItem, StockReservation
+from boutique.reservations import available_to_sell, release_expired, reserve_cart
+
+from .helpers import make_category, make_product
+
+
+@override_settings(STOCK_RESERVATION_TTL=600)
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.product = make_product(make_category(), stock=10)
+
+    def cart(self, quantity):
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=self.product, quantity=quantity, price=self.product.price)
+        return cart
+
+    def test_reservation_holds_stock_for_other_carts(self):
+        first, second = self.cart(7), self.cart(4)
+
+        self.assertEqual(reserve_cart(first), [])
+        unavailable = reserve_cart(second)
+
+        self.assertEqual([item.cart_id for item in unavailable], [second.pk])
+        self.assertEqual(available_to_sell(self.product), 3)
+        self.assertEqual(available_to_sell(self.product, exclude_cart=first.pk), 10)
+
+    def test_expired_reservation_no_longer_counts(self):
+        first, second = self.cart(7), self.cart(4)
+        reserve_cart(first)
+        StockReservation.objects.filter(cart=first).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(reserve_cart(second), [])
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(available_to_sell(self.product), 6)
+
+    def test_reserving_again_extends_instead_of_adding(self):
+        cart = self.cart(5)
+        reserve_cart(cart)
+        reserve_cart(cart)
+
+        reservation = StockReservation.objects.get(cart=cart)
+        self.assertEqual(reservation.quantity, 5)
+        self.assertGreater(reservation.expires_at, timezone.now() + timedelta(seconds=590))
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from boutique.models import Product, Review
+from boutique.reviews import moderate_reviews
+
+from .helpers import make_category, make_product, make_user
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.product = make_product(make_category())
+        self.users = [make_user(f'client{number}') for number in range(3)]
+
+    def aggregates(self):
+        product = Product.objects.get(pk=self.product.pk)
+        return product.rating_count, product.rating_sum
+
+    def review(self, user, rating, approved=True):
+        return Review.objects.create(product=self.product, user=user, rating=rating, approved=approved)
+
+    def test_only_approved_reviews_count(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 3)
+        self.review(self.users[2], 1, approved=False)
+        self.assertEqual(self.aggregates(), (2, 8))
+
+    def test_edit_and_delete_keep_aggregates_exact(self):
+        first = self.review(self.users[0], 5)
+        second = self.review(self.users[1], 3)
+
+        second.rating = 4
+        second.save()
+        self.assertEqual(self.aggregates(), (2, 9))
+
+        first.delete()
+        self.assertEqual(self.aggregates(), (1, 4))
+
+        # Une instance relue depuis la base retire bien sa propre note
+        Review.objects.get(pk=second.pk).delete()
+        self.assertEqual(self.aggregates(), (0, 0))
+
+    def test_bulk_moderation_updates_aggregates(self):
+        pending = [self.review(user, rating, approved=False) for user, rating in zip(self.users, (5, 4, 2))]
+
+        moderate_reviews([review.pk for review in pending[:2]], approve=True)
+        self.assertEqual(self.aggregates(), (2, 9))
+
+        Review.objects.get(pk=pending[0].pk).delete()
+        self.assertEqual(self.aggregates(), (1, 4))
@@ -3,12 +3,18 @@ from django.views.generic import RedirectView
 from django.utils.translation import gettext_lazy as _
 from . import views
 from . import views_landing
+from . import views_cart_api
 from .views_admin import ProductCreateView as CustomProductCreateView
 from .admin_views import (
     CategoryListView, CategoryUpdateView, CategoryDeleteView,
     ProductListView, ProductCreateView, ProductUpdateView, ProductDeleteView,
     UserListView, UserDetailView,
-    OrderListView, OrderDetailView, OrderDeleteView
+    OrderListView, OrderDetailView, OrderDeleteView,
+    OrderBulkStatusView, OrderTrackingImportView,
+    DispatchPlanView, DispatchManifestView,
+    OrderDocumentView, MonthlyInvoicesView,
+    ReviewModerationView,
+    ReorderQueueExportView
 )
 
 app_name = 'boutique'
@@ -18,10 +24,14 @@ urlpatterns = [
     path('', views_landing.LandingPageView.as_view(), name='home'),
     path('boutique/', views.HomeView.as_view(), name='boutique'),
     path('mentions-legales/', views.LegalNoticeView.as_view(), name='legal_notice'),
+    path('chatbot/widget/', views.chatbot_widget, name='chatbot_widget'),
     
     # Produits
     path('produits/', views.ProductListView.as_view(), name='product_list'),
+    path('recherche/suggestions/', views.search_suggestions, name='search_suggestions'),
     path('categorie/<slug:category_slug>/', views.ProductListView.as_view(), name='product_list_by_category'),
+    path('produit/<int:product_id>/avis/', views.product_reviews, name='product_reviews'),
+    path('produit/<int:product_id>/ajouter-avis/', views.add_review, name='add_review'),
     path('produit/<int:pk>/<slug:slug>/', views.ProductDetailView.as_view(), name='product_detail'),
     
     # Panier
@@ -30,10 +40,23 @@ urlpatterns = [
     path('panier/mettre-a-jour/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('panier/supprimer/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('panier/vider/', views.clear_cart, name='clear_cart'),
+    path('panier/commande-rapide/', views.QuickOrderView.as_view(), name='quick_order'),
+    path('panier/code-promo/', views.apply_coupon, name='apply_coupon'),
+    
+    # API JSON du panier
+    path('panier/api/', views_cart_api.cart_detail, name='cart_api'),
+    path('panier/api/ajouter/<int:product_id>/', views_cart_api.cart_add, name='cart_api_add'),
+    path('panier/api/lignes/<int:item_id>/', views_cart_api.cart_line, name='cart_api_line'),
+    path('panier/api/ajouter/', views_cart_api.cart_add_many, name='cart_api_add_many'),
+    path('panier/api/quantites/', views_cart_api.cart_set_quantities, name='cart_api_set_quantities'),
+    path('panier/api/vider/', views_cart_api.cart_clear, name='cart_api_clear'),
+    path('panier/api/code-promo/', views_cart_api.cart_coupon, name='cart_api_coupon'),
     
     # Paiement
     path('paiement/process/', views.process_payment, name='process_payment'),
     path('paiement/checkout/', views.CheckoutView.as_view(), name='checkout'),
+    path('paiement/creneaux/', views.delivery_slots, name='delivery_slots'),
+    path('paiement/frais-de-livraison/', views.shipping_quote, name='shipping_quote'),
     path('paiement/<uuid:order_id>/', views.PaymentView.as_view(), name='payment'),
     path('paiement/succes/<uuid:order_id>/', views.PaymentSuccessView.as_view(), name='payment_success'),
     path('paiement/annule/', views.PaymentCancelledView.as_view(), name='payment_cancelled'),
@@ -42,9 +65,8 @@ urlpatterns = [
     # Historique des commandes
     path('mon-compte/commandes/', views.OrderHistoryView.as_view(), name='order_history'),
     path('mon-compte/commandes/<uuid:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
-    
-    # Avis
-    path('produit/<int:product_id>/ajouter-avis/', views.add_review, name='add_review'),
+    path('mon-compte/commandes/<uuid:pk>/recommander/', views.reorder, name='reorder'),
+    path('mon-compte/commandes/<uuid:pk>/facture/', views.order_invoice, name='order_invoice'),
     
     # Administration
     path('admin/dashboard/', views.AdminDashboardView.as_view(), name='admin_dashboard'),
@@ -62,13 +84,26 @@ urlpatterns = [
     path('admin/produits/<int:pk>/supprimer/', ProductDeleteView.as_view(), name='admin_product_delete'),
     path('admin/produits/images/<int:pk>/supprimer/', views.delete_product_image, name='delete_product_image'),
     
+    # Réapprovisionnement
+    path('admin/reapprovisionnement/export/', ReorderQueueExportView.as_view(), name='admin_reorder_export'),
+    
     # Gestion des utilisateurs
     path('admin/utilisateurs/', UserListView.as_view(), name='admin_user_list'),
     path('admin/utilisateurs/<int:pk>/', UserDetailView.as_view(), name='admin_user_detail'),
     
+    # Modération des avis
+    path('admin/avis/', ReviewModerationView.as_view(), name='admin_review_moderation'),
+    
     # Gestion des commandes
     path('admin/commandes/', OrderListView.as_view(), name='admin_order_list'),
+    path('admin/commandes/actions/statut/', OrderBulkStatusView.as_view(), name='admin_order_bulk_status'),
+    path('admin/commandes/suivi/import/', OrderTrackingImportView.as_view(), name='admin_order_tracking_import'),
+    path('admin/commandes/tournees/', DispatchPlanView.as_view(), name='admin_dispatch_plan'),
+    path('admin/commandes/tournees/<str:date>/camion/<int:number>/', DispatchManifestView.as_view(), name='admin_dispatch_manifest'),
+    path('admin/commandes/factures/', MonthlyInvoicesView.as_view(), name='admin_monthly_invoices'),
     path('admin/commandes/<uuid:pk>/', OrderDetailView.as_view(), name='admin_order_detail'),
+    path('admin/commandes/<uuid:pk>/facture/', OrderDocumentView.as_view(kind='invoice'), name='admin_order_invoice'),
+    path('admin/commandes/<uuid:pk>/bon-de-livraison/', OrderDocumentView.as_view(kind='delivery_note'), name='admin_order_delivery_note'),
     path('admin/commandes/<uuid:pk>/supprimer/', OrderDeleteView.as_view(), name='admin_order_delete'),
     
     # Redirections
@@ -1,9 +1,9 @@
 from django.shortcuts import render, get_object_or_404, redirect, reverse
 from django.views.generic import ListView, DetailView, View, TemplateView, CreateView
-from django.views.decorators.http import require_POST, require_http_methods
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseRedirect
 from django.db.models import Q, Count, Avg
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -13,22 +13,45 @@ from django.contrib.auth import get_user_model
 from django.db.models import Sum
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.views.decorators.vary import vary_on_cookie
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.utils import timezone
 from django.utils.text import slugify
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from django.template.loader import render_to_string
+from django.db import transaction
 from decimal import Decimal
 import os
 import json
+import logging
 import stripe
 
-from .models import Category, Product, Cart, CartItem, Order, OrderItem, Review, ProductImage, ProductSpecification
-from .forms import AddToCartForm, PaymentForm, CheckoutForm, ProductForm, CategoryForm
+from .models import Category, Product, Cart, CartItem, Order, OrderItem, Review, ProductImage, ProductSpecification, ReorderItem
+from .forms import AddToCartForm, PaymentForm, CheckoutForm, ProductForm, CategoryForm, QuickOrderForm, ReviewForm
+from .reservations import reserve_cart, release_cart
+from .cart import CartError, get_session_cart
+from . import cart as cart_service
+from . import views_cart_api
+from .caching import ConditionalGetMixin, latest_change
+from .reviews import review_feed, rating_summary, submit_review
+from .recommendations import recommendations_fingerprint, related_products
+from .autocomplete import suggest
+from .facets import search as facet_search
+from .orders import TransitionError, allowed_transitions, with_lines, transition
+from .shipping import quote_cart
+from .pricing import CouponError, promotions_fingerprint, redeem_coupon, release_coupon, reprice_cart
+from .documents import document_response
+from .outbox import queue_order_confirmation
+from .delivery import SlotUnavailable, availability, book as book_delivery_slot, booking_window as delivery_window, cart_weight, parse_date
+
+logger = logging.getLogger(__name__)
 
 # Configuration de Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
-class HomeView(ListView):
+class HomeView(ConditionalGetMixin, ListView):
     template_name = 'boutique/home.html'
     model = Product
     context_object_name = 'products'
@@ -37,6 +60,9 @@ class HomeView(ListView):
     def get_queryset(self):
         return Product.objects.filter(available=True).order_by('-created_at')
 
+    def get_last_modified_parts(self):
+        return [latest_change(self.get_queryset()), latest_change(Category.objects.all()), promotions_fingerprint()]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['all_categories'] = Category.objects.annotate(
@@ -46,21 +72,22 @@ class HomeView(ListView):
         return context
 
 
-class ProductListView(ListView):
+class ProductListView(ConditionalGetMixin, ListView):
     model = Product
     template_name = 'boutique/product_list.html'
     context_object_name = 'products'
     paginate_by = 12
 
-    def get_queryset(self):
-        # Par défaut, trier par date de création (du plus récent au plus ancien)
-        queryset = Product.objects.filter(available=True).order_by('-created_at')
+    def get_base_queryset(self):
+        """Produits du catalogue avant les filtres à facettes"""
+        queryset = Product.objects.filter(available=True)
         
         # Filtrage par catégorie
+        self.category = None
         category_slug = self.kwargs.get('category_slug')
         if category_slug:
-            category = get_object_or_404(Category, slug=category_slug)
-            queryset = queryset.filter(category=category)
+            self.category = get_object_or_404(Category, slug=category_slug)
+            queryset = queryset.filter(category=self.category)
         
         # Filtrage par recherche
         query = self.request.GET.get('q')
@@ -73,49 +100,118 @@ class ProductListView(ListView):
             
         return queryset
     
+    def get_queryset(self):
+        # Du plus récent au plus ancien, filtré et compté par l'index des facettes
+        queryset = self.get_base_queryset()
+        self.facets = facet_search(
+            self.request.GET,
+            category=self.category,
+            queryset=queryset if self.request.GET.get('q') else None,
+        )
+        return self.facets.products
+    
+    def get_last_modified_parts(self):
+        return [latest_change(self.get_base_queryset()), latest_change(Category.objects.all()), promotions_fingerprint()]
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.all()
+        context['category'] = self.category
+        context['category_facets'] = [
+            (category, self.facets.categories.get(category.pk, 0)) for category in context['categories']
+        ]
+        context['facets'] = self.facets
         context['current_category'] = self.kwargs.get('category_slug')
         context['q'] = self.request.GET.get('q', '')
         return context
 
 
-class ProductDetailView(DetailView):
+class ProductDetailView(ConditionalGetMixin, DetailView):
     model = Product
     template_name = 'boutique/product_detail.html'
     context_object_name = 'product'
     
+    def get_last_modified_parts(self):
+        product = Product.objects.filter(pk=self.kwargs['pk']).values(
+            'updated_at', 'category_id', 'category__updated_at'
+        ).first()
+        if product is None:
+            return None
+        return [
+            (product['updated_at'], 1),
+            (product['category__updated_at'], 1),
+            latest_change(Review.objects.filter(product_id=self.kwargs['pk'])),
+            latest_change(ProductSpecification.objects.filter(product_id=self.kwargs['pk'])),
+            latest_change(ProductImage.objects.filter(product_id=self.kwargs['pk'])),
+            latest_change(Product.objects.filter(category_id=product['category_id'], available=True)),
+            recommendations_fingerprint(self.kwargs['pk']),
+            promotions_fingerprint(),
+        ]
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = AddToCartForm(initial={'quantity': 1})
-        context['related_products'] = Product.objects.filter(
-            category=self.object.category,
-            available=True
-        ).exclude(id=self.object.id)[:4]
-        
-        # Récupérer les avis avec pagination
-        reviews = self.object.reviews.all().order_by('-created_at')
-        paginator = Paginator(reviews, 5)
-        page = self.request.GET.get('page')
+        context['related_products'] = related_products(self.object)
         
-        try:
-            reviews = paginator.page(page)
-        except PageNotAnInteger:
-            reviews = paginator.page(1)
-        except EmptyPage:
-            reviews = paginator.page(paginator.num_pages)
-            
+        # Avis approuvés : première page seulement, la suite est chargée à la demande
+        reviews, next_cursor = review_feed(self.object.pk)
         context['reviews'] = reviews
+        context['reviews_next_url'] = self._reviews_url(next_cursor)
         
-        # Calculer la note moyenne
-        if reviews:
-            context['average_rating'] = self.object.reviews.aggregate(
-                avg_rating=Avg('rating')
-            )['avg_rating']
+        summary = rating_summary(self.object.pk)
+        context['average_rating'] = summary['average']
+        context['review_count'] = summary['count']
+        context['rating_distribution'] = summary['distribution']
         
         return context
 
+    def _reviews_url(self, cursor):
+        if not cursor:
+            return None
+        url = reverse('boutique:product_reviews', kwargs={'product_id': self.object.pk})
+        return f"{url}?{urlencode({'after': cursor})}"
+
+
+@require_GET
+@cache_control(max_age=60)
+def search_suggestions(request):
+    """Suggestions de produits et de catégories pendant la saisie (`?q=`, 2 caractères minimum)"""
+    query = request.GET.get('q', '').strip()
+    if len(query) < 2:
+        return JsonResponse({'products': [], 'categories': []})
+    return JsonResponse(suggest(query[:100]))
+
+
+@require_http_methods(["GET"])
+def product_reviews(request, product_id):
+    """Page suivante des avis approuvés d'un produit (fragment HTML ou JSON)"""
+    reviews, next_cursor = review_feed(product_id, after=request.GET.get('after'))
+    next_url = None
+    if next_cursor:
+        next_url = f"{reverse('boutique:product_reviews', kwargs={'product_id': product_id})}?{urlencode({'after': next_cursor})}"
+    html = render_to_string('boutique/partials/review_list.html', {'reviews': reviews}, request=request)
+    
+    if request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse({
+            'html': html,
+            'next_url': next_url,
+            'reviews': [
+                {
+                    'id': review.pk,
+                    'user': review.user.get_full_name() or review.user.username,
+                    'rating': review.rating,
+                    'comment': review.comment,
+                    'created_at': review.created_at.isoformat(),
+                }
+                for review in reviews
+            ],
+        })
+    
+    response = HttpResponse(html)
+    if next_url:
+        response['X-Next-Page'] = next_url
+    return response
+
 
 class CartView(View):
     def get(self, request, *args, **kwargs):
@@ -141,8 +237,43 @@ class CartView(View):
         })
 
 
+class QuickOrderView(LoginRequiredMixin, View):
+    """Commande rapide : toutes les quantités d'une livraison de chantier en un envoi"""
+    template_name = 'boutique/quick_order.html'
+    login_url = reverse_lazy('account_login')
+
+    def get_products(self):
+        return Product.objects.filter(available=True).select_related('category').order_by('category__name', 'name')
+
+    def get(self, request, *args, **kwargs):
+        form = QuickOrderForm(products=self.get_products())
+        return render(request, self.template_name, {'form': form})
+
+    def post(self, request, *args, **kwargs):
+        form = QuickOrderForm(request.POST, products=self.get_products())
+        if form.is_valid():
+            try:
+                with transaction.atomic():
+                    lines = cart_service.add_items(get_session_cart(request), form.get_entries())
+            except CartError as error:
+                for product_id, available in error.errors.items():
+                    form.add_error(
+                        f'quantity_{product_id}',
+                        _("Quantité totale disponible : %(available)s") % {'available': available},
+                    )
+                messages.error(request, error.message)
+            else:
+                messages.success(request, _("%(count)s produit(s) ajouté(s) à votre panier.") % {'count': len(lines)})
+                return redirect('boutique:cart')
+        return render(request, self.template_name, {'form': form})
+
+
 @require_POST
 def add_to_cart(request, product_id):
+    # Les appels AJAX reçoivent la ligne et les totaux en JSON, sans redirection
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return views_cart_api.cart_add(request, product_id)
+
     # Vérifier si l'utilisateur est connecté
     if not request.user.is_authenticated:
         messages.info(request, _("Veuillez vous connecter pour ajouter des articles à votre panier."))
@@ -151,30 +282,16 @@ def add_to_cart(request, product_id):
             request.path
         ))
     
-    cart_id = request.session.get('cart_id')
-    
-    if not cart_id:
-        cart = Cart.objects.create()
-        request.session['cart_id'] = str(cart.id)
-    else:
-        cart = get_object_or_404(Cart, id=cart_id)
-    
     product = get_object_or_404(Product, id=product_id)
     form = AddToCartForm(request.POST)
     
     if form.is_valid():
-        quantity = form.cleaned_data['quantity']
-        
-        # Vérifier si le produit est déjà dans le panier
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity, 'price': product.price}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        try:
+            with transaction.atomic():
+                cart_service.add_item(get_session_cart(request), product.pk, form.cleaned_data['quantity'])
+        except CartError as error:
+            messages.error(request, error.message)
+            return redirect('boutique:product_detail', pk=product_id, slug=product.slug)
         
         messages.success(request, _("Le produit a été ajouté à votre panier."))
         
@@ -188,141 +305,54 @@ def add_to_cart(request, product_id):
 
 @require_POST
 def update_cart_item(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id)
-    
-    if 'quantity' in request.POST:
-        try:
-            quantity = int(request.POST['quantity'])
-            if quantity > 0:
-                cart_item.quantity = quantity
-                cart_item.save()
-                
-                # Calculer les totaux mis à jour
-                cart = cart_item.cart
-                cart_items = cart.items.all()
-                cart_total = sum(item.total_price for item in cart_items)
-                cart_total_quantity = sum(item.quantity for item in cart_items)
-                
-                response_data = {
-                    'success': True,
-                    'quantity': cart_item.quantity,
-                    'item_total': str(cart_item.total_price),
-                    'cart_total': str(cart_total),
-                    'cart_total_quantity': cart_total_quantity,
-                    'message': _("La quantité a été mise à jour.")
-                }
-                
-                return JsonResponse(response_data)
-                
-            else:
-                # Si la quantité est 0, supprimer l'article
-                cart = cart_item.cart
-                cart_item.delete()
-                
-                # Vérifier si le panier est vide
-                cart_items = cart.items.all()
-                if not cart_items.exists():
-                    response_data = {
-                        'success': True,
-                        'quantity': 0,
-                        'cart_empty': True,
-                        'message': _("L'article a été retiré du panier.")
-                    }
-                else:
-                    # Calculer les totaux mis à jour
-                    cart_total = sum(item.total_price for item in cart_items)
-                    cart_total_quantity = sum(item.quantity for item in cart_items)
-                    
-                    response_data = {
-                        'success': True,
-                        'quantity': 0,
-                        'cart_total': str(cart_total),
-                        'cart_total_quantity': cart_total_quantity,
-                        'message': _("L'article a été retiré du panier.")
-                    }
-                
-                return JsonResponse(response_data)
-                
-        except (ValueError, TypeError):
-            return JsonResponse({
-                'success': False,
-                'message': _("Quantité invalide.")
-            }, status=400)
+    if 'quantity' not in request.POST:
+        return JsonResponse({
+            'success': False,
+            'message': _("Requête invalide.")
+        }, status=400)
     
-    return JsonResponse({
-        'success': False,
-        'message': _("Requête invalide.")
-    }, status=400)
-
+    # Même traitement que l'API : ligne du panier de la session uniquement
+    return views_cart_api.update_line(request, item_id, request.POST['quantity'])
 
-from django.views.decorators.http import require_http_methods
 
 @require_http_methods(["DELETE", "POST"])
 def remove_from_cart(request, item_id):
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return views_cart_api.remove_line(request, item_id)
+    
+    cart = get_session_cart(request, create=False)
     try:
-        cart_item = get_object_or_404(CartItem, id=item_id)
-        cart_id = str(cart_item.cart.id)
-        cart_item.delete()
-        
-        # Vérifier si le panier est vide après suppression
-        cart = get_object_or_404(Cart, id=cart_id)
-        is_cart_empty = cart.items.count() == 0
-        
-        # Préparer la réponse
-        response_data = {
-            'success': True,
-            'message': 'L\'article a été retiré du panier.',
-            'is_cart_empty': is_cart_empty,
-            'item_id': item_id
-        }
-        
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            from django.template.loader import render_to_string
-            from django.http import JsonResponse
-            
-            # Récupérer le panier mis à jour
-            cart = get_object_or_404(Cart, id=cart_id)
-            cart_items = cart.items.select_related('product')
-            
-            # Calculer les totaux
-            cart_total = sum(item.total_price() for item in cart_items)
-            
-            # Mettre à jour les données de réponse
-            response_data.update({
-                'cart_total': f"{cart_total:.2f}",
-                'item_count': cart_items.count(),
-                'html': render_to_string('boutique/partials/cart_items.html', {
-                    'cart': cart,
-                    'cart_items': cart_items
-                }) if not is_cart_empty else ''
-            })
-            
-            return JsonResponse(response_data)
-        
-        messages.success(request, _("L'article a été retiré du panier."))
-        return redirect('boutique:cart')
-        
-    except CartItem.DoesNotExist:
-        error_msg = _("L'article demandé n'existe pas ou a déjà été supprimé.")
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({
-                'success': False,
-                'message': error_msg
-            }, status=404)
-        messages.error(request, error_msg)
-        return redirect('boutique:cart')
-    except Exception as e:
-        import traceback
-        error_msg = _("Une erreur est survenue lors de la suppression de l'article: {}").format(str(e))
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({
-                'success': False,
-                'message': error_msg,
-                'error_details': str(e),
-                'traceback': traceback.format_exc()
-            }, status=500)
-        messages.error(request, error_msg)
+        if cart is None:
+            raise CartError(_("L'article demandé n'existe pas ou a déjà été supprimé."), status=404)
+        cart_service.remove_item(cart, item_id)
+    except CartError as error:
+        messages.error(request, error.message)
         return redirect('boutique:cart')
+    
+    messages.success(request, _("L'article a été retiré du panier."))
+    return redirect('boutique:cart')
+
+
+@require_POST
+def apply_coupon(request):
+    """Applique le code promo saisi (retire le code actuel si `remove` est envoyé)"""
+    code = '' if 'remove' in request.POST else request.POST.get('code', '').strip()
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return views_cart_api.set_coupon(request, code)
+    
+    cart = get_session_cart(request, create=False)
+    try:
+        if cart is None:
+            raise CartError(_("Votre panier est vide."))
+        if code:
+            cart_service.apply_coupon(cart, code)
+            messages.success(request, _("Le code promo a été appliqué."))
+        else:
+            cart_service.remove_coupon(cart)
+            messages.success(request, _("Le code promo a été retiré."))
+    except CartError as error:
+        messages.error(request, error.message)
+    return redirect('boutique:cart')
 
 
 class CheckoutView(LoginRequiredMixin, View):
@@ -432,54 +462,6 @@ class CheckoutView(LoginRequiredMixin, View):
         })
 
 
-class PaymentSuccessView(TemplateView):
-    template_name = 'boutique/payment_success.html'
-    
-    def get(self, request, *args, **kwargs):
-        session_id = request.GET.get('session_id')
-        order_id = request.GET.get('order_id')
-        
-        if not session_id or not order_id:
-            messages.error(request, _("Session de paiement invalide."))
-            return redirect('boutique:home')
-        
-        try:
-            # Récupérer la session Stripe
-            session = stripe.checkout.Session.retrieve(session_id)
-            
-            # Vérifier que la commande existe
-            order = get_object_or_404(Order, id=order_id)
-            
-            # Mettre à jour le statut de la commande
-            if session.payment_status == 'paid':
-                order.status = 'payee'
-                order.paid = True
-                order.stripe_payment_intent = session.payment_intent
-                order.save()
-                
-                # Vider le panier
-                if 'cart_id' in request.session:
-                    del request.session['cart_id']
-                
-                # Envoyer un email de confirmation (à implémenter)
-                # send_order_confirmation_email(order)
-                
-                messages.success(
-                    request,
-                    _("Votre commande a été passée avec succès. Un email de confirmation vous a été envoyé.")
-                )
-            
-            return render(request, self.template_name, {'order': order})
-            
-        except Exception as e:
-            messages.error(
-                request,
-                _("Une erreur est survenue lors de la vérification de votre paiement. "
-                  "Veuillez nous contacter si vous avez des questions.")
-            )
-            return redirect('boutique:order_history')
-
-
 class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     template_name = 'boutique/admin/dashboard.html'
     login_url = reverse_lazy('account_login')
@@ -494,6 +476,10 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         # Récupérer les commandes récentes
         context['latest_orders'] = Order.objects.select_related('user').order_by('-created_at')[:5]
         
+        # Produits en stock faible à réapprovisionner
+        context['reorder_queue'] = ReorderItem.objects.select_related('product')[:10]
+        context['reorder_count'] = ReorderItem.objects.count()
+        
         # Récupérer les modèles à afficher dans le tableau de bord
         context['models'] = [
             {
@@ -558,43 +544,35 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
 
 
 @login_required
+@require_POST
 def add_review(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
+    """Avis du client (formulaire de la fiche produit) : un second envoi modifie le premier"""
+    form = ReviewForm(request.POST)
     
-    if request.method == 'POST':
-        form = ReviewForm(request.POST)
+    if form.is_valid():
+        try:
+            review, created = submit_review(
+                product_id,
+                request.user,
+                form.cleaned_data['rating'],
+                form.cleaned_data['comment'],
+            )
+        except Product.DoesNotExist:
+            raise Http404
         
-        if form.is_valid():
-            # Vérifier si l'utilisateur a déjà laissé un avis pour ce produit
-            existing_review = Review.objects.filter(
-                product=product,
-                user=request.user
-            ).exists()
-            
-            if existing_review:
-                messages.error(
-                    request,
-                    _("Vous avez déjà laissé un avis pour ce produit.")
-                )
-            else:
-                review = form.save(commit=False)
-                review.product = product
-                review.user = request.user
-                review.save()
-                
-                messages.success(
-                    request,
-                    _("Merci pour votre avis ! Il sera publié après modération.")
-                )
-            
-            return redirect('boutique:product_detail', pk=product.id, slug=product.slug)
+        if created:
+            messages.success(request, _("Merci pour votre avis ! Il sera publié après modération."))
+        else:
+            messages.success(request, _("Votre avis a été mis à jour. Il sera publié après modération."))
     else:
-        form = ReviewForm()
+        messages.error(request, _("Votre avis n'a pas pu être enregistré : choisissez une note de 1 à 5."))
     
-    return render(request, 'boutique/add_review.html', {
-        'form': form,
-        'product': product
-    })
+    # Retour à la page d'où vient le formulaire, à défaut à la fiche produit
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        return redirect(next_url)
+    product = get_object_or_404(Product, pk=product_id)
+    return redirect('boutique:product_detail', pk=product.pk, slug=product.slug)
 
 
 @csrf_exempt
@@ -625,20 +603,63 @@ def stripe_webhook(request):
             try:
                 order = Order.objects.get(id=order_id)
                 
-                if session.payment_status == 'paid':
-                    order.status = 'payee'
-                    order.paid = True
-                    order.stripe_payment_intent = session.payment_intent
-                    order.save()
-                    
-                    # Envoyer un email de confirmation (à implémenter)
-                    # send_order_confirmation_email(order)
+                # Stripe peut rejouer l'événement : ne passer qu'une fois à « payée »
+                if session.payment_status == 'paid' and order.status == 'en_attente':
+                    with transaction.atomic():
+                        transition(order, 'payee', note='Stripe Checkout', stripe_payment_intent=session.payment_intent)
+                        queue_order_confirmation(order)
             except Order.DoesNotExist:
                 pass
     
     return JsonResponse({'status': 'success'})
 
 
+def checkout_totals(cart, postal_code=None, pickup=False):
+    """Sous-total, remise, frais de livraison et total du panier pour la page de paiement"""
+    pricing = cart.pricing
+    shipping_cost = Decimal('0') if pickup else quote_cart(cart, postal_code)
+    return {
+        'cart_subtotal': pricing.subtotal,
+        'discount_amount': pricing.discount_amount,
+        'shipping_cost': shipping_cost,
+        'cart_total': pricing.total + shipping_cost,
+    }
+
+
+@require_GET
+def shipping_quote(request):
+    """Frais de livraison du panier de la session vers `code_postal` (mode `retrait` : gratuit)"""
+    cart = get_session_cart(request, create=False)
+    if cart is None:
+        totals = dict.fromkeys(('cart_subtotal', 'discount_amount', 'shipping_cost', 'cart_total'), Decimal('0'))
+    else:
+        totals = checkout_totals(cart, request.GET.get('code_postal'), pickup=request.GET.get('mode') == 'pickup')
+    return JsonResponse({key: f'{value:.2f}' for key, value in totals.items()})
+
+
+@require_GET
+def delivery_slots(request):
+    """
+    Disponibilité des créneaux de livraison pour le formulaire de paiement.
+
+    Paramètres : `date` (premier jour, AAAA-MM-JJ) et `jours` (7 par défaut,
+    31 au plus). Les créneaux trop petits pour le poids du panier de la
+    session sont marqués indisponibles.
+    """
+    first, _last = delivery_window()
+    start = parse_date(request.GET.get('date')) or first
+    try:
+        days = min(max(int(request.GET.get('jours', 7)), 1), 31)
+    except ValueError:
+        days = 7
+    cart = get_session_cart(request, create=False)
+    weight = cart_weight(cart) if cart else 0
+    return JsonResponse({
+        'weight': f'{weight:.0f}',
+        'days': availability(start, days, weight),
+    })
+
+
 class CheckoutView(LoginRequiredMixin, View):
     """Vue pour le processus de paiement"""
     login_url = reverse_lazy('account_login')
@@ -656,15 +677,20 @@ class CheckoutView(LoginRequiredMixin, View):
             messages.warning(request, _("Votre panier est vide."))
             return redirect('boutique:home')
         
-        # Vérifier le stock des produits
-        for item in cart_items:
-            if item.quantity > item.product.stock:
-                messages.error(
-                    request, 
-                    _("Désolé, la quantité demandée pour %(product)s n'est plus disponible.") % 
-                    {'product': item.product.name}
-                )
-                return redirect('boutique:cart')
+        # Vérifier le stock et réserver les articles le temps du paiement
+        unavailable = reserve_cart(cart)
+        if unavailable:
+            messages.error(
+                request, 
+                _("Désolé, la quantité demandée pour %(product)s n'est plus disponible.") % 
+                {'product': unavailable[0].product.name}
+            )
+            return redirect('boutique:cart')
+        
+        # Reporter les changements de prix survenus depuis l'ajout au panier
+        repriced = reprice_cart(cart)
+        if repriced:
+            messages.info(request, _("Le prix de %(count)s article(s) a changé depuis leur ajout au panier.") % {'count': repriced})
         
         # Initialiser le formulaire avec les données de l'utilisateur connecté
         initial_data = {}
@@ -700,6 +726,7 @@ class CheckoutView(LoginRequiredMixin, View):
             'cart_items': cart_items,
             'form': checkout_form,  # Changé de 'checkout_form' à 'form' pour correspondre au template
             'payment_form': payment_form,
+            **checkout_totals(cart, initial_data.get('postal_code')),
         }
         
         return render(request, 'boutique/checkout.html', context)
@@ -718,53 +745,88 @@ class CheckoutView(LoginRequiredMixin, View):
             messages.warning(request, _("Votre panier est vide."))
             return redirect('boutique:cart')
         
-        # Vérifier le stock des produits
-        for item in cart_items:
-            if item.quantity > item.product.stock:
-                messages.error(
-                    request, 
-                    _("Désolé, la quantité demandée pour %(product)s n'est plus disponible.") % 
-                    {'product': item.product.name}
-                )
-                return redirect('boutique:cart')
-        
         checkout_form = CheckoutForm(request.POST or None)
         payment_form = PaymentForm(request.POST or None)
         
         if checkout_form.is_valid() and payment_form.is_valid():
+            # Un prix a changé depuis l'affichage : faire confirmer le nouveau total
+            repriced = reprice_cart(cart)
+            if repriced:
+                messages.warning(
+                    request,
+                    _("Le prix de %(count)s article(s) a changé. Vérifiez le nouveau total avant de valider.") % {'count': repriced}
+                )
+                return redirect('boutique:checkout')
+            
             try:
-                # Créer la commande
-                order = checkout_form.save(commit=False)
-                order.user = request.user
-                order.total_amount = cart.get_total()
-                order.save()
-                
-                # Ajouter les articles de la commande
-                for item in cart_items:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item.product,
-                        price=item.product.price,
-                        quantity=item.quantity
-                    )
+                with transaction.atomic():
+                    # Revalider (et prolonger) la réservation avant de consommer le stock
+                    unavailable = reserve_cart(cart)
+                    if unavailable:
+                        messages.error(
+                            request, 
+                            _("Désolé, la quantité demandée pour %(product)s n'est plus disponible.") % 
+                            {'product': unavailable[0].product.name}
+                        )
+                        return redirect('boutique:cart')
                     
-                    # Mettre à jour le stock
-                    item.product.stock -= item.quantity
-                    item.product.save()
-                
-                # Vider le panier
-                cart.items.all().delete()
+                    # Tarifer le panier (promotions, code promo) une seule fois
+                    pricing = cart.pricing
+                    if pricing.coupon_error:
+                        raise CouponError(pricing.coupon_error)
+                    
+                    # Créer la commande
+                    order = checkout_form.save(commit=False)
+                    order.user = request.user
+                    if pricing.coupon is not None:
+                        redeem_coupon(pricing.coupon)
+                        order.coupon = pricing.coupon
+                        order.discount_amount = pricing.discount_amount
+                    if order.delivery_method == 'delivery':
+                        order.shipping_cost = quote_cart(cart, order.postal_code)
+                    order.tax_amount = pricing.tax_amount
+                    order.total_amount = pricing.total + order.shipping_cost
+                    order.save()
+                    
+                    # Réserver la place dans le créneau de livraison choisi
+                    if order.delivery_method == 'delivery':
+                        book_delivery_slot(order, pricing.weight)
+                    
+                    # Ajouter les articles aux prix du panier, remisés (le stock est décrémenté par le signal update_stock)
+                    for line in pricing.lines:
+                        OrderItem.objects.create(
+                            order=order,
+                            product_id=line.product_id,
+                            price=line.unit_price,
+                            quantity=line.quantity,
+                            tax_rate=line.tax_rate
+                        )
+                    
+                    # Le stock est désormais engagé par la commande : libérer la réservation
+                    release_cart(cart)
+                    
+                    # Vider le panier
+                    cart.items.all().delete()
                 
                 # Créer un paiement Stripe
                 stripe.api_key = settings.STRIPE_SECRET_KEY
-                intent = stripe.PaymentIntent.create(
-                    amount=int(cart.get_total()),  # Montant en FBu (pas de centimes pour le BIF)
-                    currency='bif',
-                    metadata={
-                        'order_id': order.id,
-                        'user_id': request.user.id
-                    }
-                )
+                try:
+                    intent = stripe.PaymentIntent.create(
+                        amount=int(order.total_amount),  # Montant en FBu (pas de centimes pour le BIF)
+                        currency='bif',
+                        metadata={
+                            'order_id': order.id,
+                            'user_id': request.user.id
+                        }
+                    )
+                except Exception:
+                    # Commande impossible à payer : l'annuler libère son créneau de livraison
+                    # et rend l'utilisation du code promo
+                    with transaction.atomic():
+                        transition(order, 'annulee', user=request.user, note='Échec de la création du paiement Stripe')
+                        if order.coupon_id:
+                            release_coupon(order.coupon_id)
+                    raise
                 
                 # Mettre à jour la commande avec l'ID de l'intention de paiement
                 order.stripe_payment_intent = intent.id
@@ -773,6 +835,11 @@ class CheckoutView(LoginRequiredMixin, View):
                 # Rediriger vers la page de paiement
                 return redirect('boutique:payment', order_id=order.id)
                 
+            except SlotUnavailable as e:
+                checkout_form.add_error('delivery_time', str(e))
+            except CouponError as e:
+                messages.error(request, str(e))
+                return redirect('boutique:cart')
             except Exception as e:
                 messages.error(
                     request, 
@@ -787,6 +854,11 @@ class CheckoutView(LoginRequiredMixin, View):
             'cart_items': cart.items.all(),
             'form': checkout_form,  # Changé de 'checkout_form' à 'form' pour correspondre au template
             'payment_form': payment_form,
+            **checkout_totals(
+                cart,
+                request.POST.get('postal_code'),
+                pickup=request.POST.get('delivery_method') == 'pickup',
+            ),
         }
         return render(request, 'boutique/checkout.html', context)
 
@@ -801,7 +873,7 @@ class PaymentView(LoginRequiredMixin, View):
         # Vérifier que la commande n'est pas déjà payée
         if order.paid:
             messages.warning(request, _("Cette commande a déjà été payée."))
-            return redirect('boutique:order_detail', order_id=order.id)
+            return redirect('boutique:order_detail', pk=order.pk)
         
         # Initialiser le formulaire de paiement
         payment_form = PaymentForm()
@@ -816,6 +888,12 @@ class PaymentView(LoginRequiredMixin, View):
     
     def post(self, request, order_id, *args, **kwargs):
         order = get_object_or_404(Order, id=order_id, user=request.user)
+        
+        # Ne pas débiter une commande déjà payée (webhook) ou annulée entre-temps
+        if order.paid or 'payee' not in allowed_transitions(order):
+            messages.warning(request, _("Cette commande ne peut plus être payée."))
+            return redirect('boutique:order_detail', pk=order.pk)
+        
         payment_form = PaymentForm(request.POST)
         
         if payment_form.is_valid():
@@ -846,16 +924,26 @@ class PaymentView(LoginRequiredMixin, View):
                 # Payer la commande
                 charge = stripe.Charge.create(
                     customer=customer.id,
-                    amount=int(order.total),  # Montant en FBu (pas de centimes pour le BIF)
+                    amount=int(order.total_amount),  # Montant en FBu (pas de centimes pour le BIF)
                     currency='bif',
                     description=f'Paiement de la commande #{order.id}',
                     metadata={'order_id': order.id}
                 )
                 
-                # Mettre à jour la commande
-                order.paid = True
-                order.payment_id = charge.id
-                order.save()
+                # Mettre à jour la commande et mettre l'e-mail de confirmation en boîte d'envoi
+                try:
+                    with transaction.atomic():
+                        transition(order, 'payee', user=request.user, note=f'Stripe {charge.id}')
+                        queue_order_confirmation(order)
+                except TransitionError as e:
+                    # Le client est déjà débité : pas de nouvel essai, l'équipe régularise
+                    logger.error(f"Paiement {charge.id} reçu pour la commande {order.id} non validée : {e}")
+                    messages.warning(
+                        request,
+                        _("Votre paiement a bien été reçu, mais la commande a changé de statut entre-temps. "
+                          "Notre équipe va vous contacter.")
+                    )
+                    return redirect('boutique:order_detail', pk=order.pk)
                 
                 # Vider le panier
                 cart_id = request.session.get('cart_id')
@@ -905,9 +993,6 @@ class PaymentSuccessView(LoginRequiredMixin, View):
     def get(self, request, order_id, *args, **kwargs):
         order = get_object_or_404(Order, id=order_id, user=request.user, paid=True)
         
-        # Envoyer un email de confirmation (à implémenter)
-        # send_order_confirmation_email(order)
-        
         context = {
             'order': order,
         }
@@ -922,7 +1007,7 @@ class OrderHistoryView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return with_lines(Order.objects.filter(user=self.request.user)).order_by('-created_at')
 
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
@@ -932,7 +1017,46 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'order'
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return with_lines(Order.objects.filter(user=self.request.user))
+
+
+@login_required
+def order_invoice(request, pk):
+    """Facture PDF d'une commande payée du client"""
+    order = get_object_or_404(Order.objects.select_related('coupon'), pk=pk, user=request.user, paid=True)
+    return document_response(request, order, 'invoice')
+
+
+@login_required
+@require_POST
+def reorder(request, pk):
+    """Recopie les lignes d'une commande passée dans le panier, aux prix et stocks actuels"""
+    order = get_object_or_404(Order, pk=pk, user=request.user)
+    entries = list(order.items.values_list('product_id', 'quantity'))
+
+    with transaction.atomic():
+        lines, shortages = cart_service.add_available(get_session_cart(request), entries)
+
+    if lines:
+        messages.success(request, _("%(count)s produit(s) de la commande ont été ajoutés à votre panier.") % {
+            'count': len(lines),
+        })
+    for shortage in shortages:
+        product = shortage['product']
+        if product is None:
+            messages.warning(request, _("Un produit de cette commande n'est plus proposé au catalogue."))
+        elif shortage['added']:
+            messages.warning(request, _("%(product)s : seulement %(added)s sur %(requested)s ajouté(s), stock insuffisant.") % {
+                'product': product.name,
+                'added': shortage['added'],
+                'requested': shortage['requested'],
+            })
+        else:
+            messages.warning(request, _("%(product)s n'est plus disponible.") % {'product': product.name})
+
+    if not lines:
+        return redirect('boutique:order_detail', pk=order.pk)
+    return redirect('boutique:cart')
 
 
 @require_http_methods(["POST"])
@@ -1134,6 +1258,13 @@ class AddCategoryView(LoginRequiredMixin, UserPassesTestMixin, View):
         return redirect('boutique:home')
 
 
+@cache_control(private=True, max_age=3600)
+@vary_on_cookie
+def chatbot_widget(request):
+    """Fenêtre du chatbot, chargée à la demande par le lanceur (chatbot-loader.js)"""
+    return render(request, 'includes/chatbot_window.html')
+
+
 class LegalNoticeView(TemplateView):
     """Vue pour afficher les mentions légales"""
     template_name = 'boutique/legal_notice.html'
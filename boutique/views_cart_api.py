@@ -0,0 +1,211 @@
+"""
+API JSON du panier utilisée par main.js et la page panier.
+
+Chaque mutation est exécutée dans une transaction et renvoie, en une seule
+réponse, la ligne modifiée et les totaux du panier : le navigateur met la page
+à jour sans rechargement.
+"""
+import json
+
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
+
+from . import cart as cart_service
+from .cart import CartError, cart_totals, get_session_cart, serialize_line
+
+
+def _payload(request):
+    """Lit le corps JSON de la requête, ou à défaut les données du formulaire"""
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            raise CartError(_("Requête invalide."))
+        if not isinstance(payload, dict):
+            raise CartError(_("Requête invalide."))
+        return payload
+    return request.POST
+
+
+def _response(cart, line=None, message=None, **extra):
+    data = {'success': True, 'line': line, **cart_totals(cart), **extra}
+    if message:
+        data['message'] = message
+    return JsonResponse(data)
+
+
+def _error(error):
+    return JsonResponse(
+        {'success': False, 'message': error.message, 'errors': error.errors},
+        status=error.status,
+    )
+
+
+def _login_required_response():
+    return JsonResponse({
+        'success': False,
+        'message': _("Veuillez vous connecter pour ajouter des articles à votre panier."),
+    }, status=401)
+
+
+@require_GET
+def cart_detail(request):
+    """État actuel du panier"""
+    cart = get_session_cart(request, create=False)
+    lines = cart.items.all() if cart else []
+    return JsonResponse({
+        'success': True,
+        'lines': [serialize_line(item) for item in lines],
+        **cart_totals(cart),
+    })
+
+
+@require_POST
+def cart_add(request, product_id):
+    if not request.user.is_authenticated:
+        return _login_required_response()
+    try:
+        payload = _payload(request)
+        with transaction.atomic():
+            cart = get_session_cart(request)
+            item = cart_service.add_item(cart, product_id, payload.get('quantity', 1))
+            return _response(cart, serialize_line(item), _("Le produit a été ajouté à votre panier."))
+    except CartError as error:
+        return _error(error)
+
+
+def update_line(request, item_id, quantity):
+    """Fixe la quantité d'une ligne du panier de la session (0 la supprime)"""
+    cart = get_session_cart(request, create=False)
+    try:
+        if cart is None:
+            raise CartError(_("L'article demandé n'existe pas ou a déjà été supprimé."), status=404)
+        with transaction.atomic():
+            item = cart_service.set_item_quantity(cart, item_id, quantity)
+            if item is None:
+                return _response(cart, None, _("L'article a été retiré du panier."), item_id=item_id, quantity=0)
+            line = serialize_line(item)
+            return _response(
+                cart, line, _("La quantité a été mise à jour."),
+                quantity=line['quantity'], item_total=line['item_total'],
+            )
+    except CartError as error:
+        return _error(error)
+
+
+def remove_line(request, item_id):
+    """Supprime une ligne du panier de la session"""
+    cart = get_session_cart(request, create=False)
+    try:
+        if cart is None:
+            raise CartError(_("L'article demandé n'existe pas ou a déjà été supprimé."), status=404)
+        with transaction.atomic():
+            cart_service.remove_item(cart, item_id)
+            return _response(cart, None, _("L'article a été retiré du panier."), item_id=item_id, quantity=0)
+    except CartError as error:
+        return _error(error)
+
+
+@require_http_methods(['POST', 'DELETE'])
+def cart_line(request, item_id):
+    """POST : fixe la quantité d'une ligne (0 la supprime) ; DELETE : supprime la ligne"""
+    if request.method == 'DELETE':
+        return remove_line(request, item_id)
+    try:
+        quantity = _payload(request).get('quantity')
+    except CartError as error:
+        return _error(error)
+    return update_line(request, item_id, quantity)
+
+
+@require_POST
+def cart_clear(request):
+    cart = get_session_cart(request, create=False)
+    if cart is not None:
+        with transaction.atomic():
+            cart_service.clear(cart)
+    return _response(cart, None, _("Le panier a été vidé avec succès."))
+
+
+def _entries(request):
+    """Lit la liste [{"product_id": ..., "quantity": ...}] du corps JSON"""
+    items = _payload(request).get('items')
+    if not isinstance(items, list):
+        raise CartError(_("Requête invalide."))
+    try:
+        return [(entry['product_id'], entry.get('quantity', 0)) for entry in items]
+    except (KeyError, TypeError, AttributeError):
+        raise CartError(_("Requête invalide."))
+
+
+@require_POST
+def cart_set_quantities(request):
+    """
+    Fixe plusieurs quantités en un appel.
+
+    Corps attendu : {"items": [{"product_id": 12, "quantity": 3}, ...]}.
+    """
+    if not request.user.is_authenticated:
+        return _login_required_response()
+    try:
+        quantities = dict(_entries(request))
+        with transaction.atomic():
+            cart = get_session_cart(request)
+            lines = cart_service.set_quantities(cart, quantities)
+            return _response(cart, None, _("Le panier a été mis à jour."), lines=[serialize_line(item) for item in lines])
+    except CartError as error:
+        return _error(error)
+
+
+@require_POST
+def cart_add_many(request):
+    """
+    Ajoute plusieurs produits en un appel (commandes professionnelles).
+
+    Corps attendu : {"items": [{"product_id": 12, "quantity": 3}, ...]} ; les
+    quantités s'ajoutent à celles du panier.
+    """
+    if not request.user.is_authenticated:
+        return _login_required_response()
+    try:
+        entries = _entries(request)
+        with transaction.atomic():
+            cart = get_session_cart(request)
+            lines = cart_service.add_items(cart, entries)
+            return _response(cart, None, _("Les produits ont été ajoutés à votre panier."), lines=[serialize_line(item) for item in lines])
+    except CartError as error:
+        return _error(error)
+
+
+def set_coupon(request, code):
+    """Applique (ou retire si `code` est vide) le code promo du panier de la session"""
+    cart = get_session_cart(request, create=False)
+    try:
+        if cart is None:
+            raise CartError(_("Votre panier est vide."))
+        with transaction.atomic():
+            if code:
+                cart_service.apply_coupon(cart, code)
+                message = _("Le code promo a été appliqué.")
+            else:
+                cart_service.remove_coupon(cart)
+                message = _("Le code promo a été retiré.")
+            return _response(cart, None, message)
+    except CartError as error:
+        return _error(error)
+
+
+@require_http_methods(['POST', 'DELETE'])
+def cart_coupon(request):
+    """POST {"code": ...} : applique un code promo ; DELETE : le retire"""
+    if request.method == 'DELETE':
+        return set_coupon(request, '')
+    try:
+        code = _payload(request).get('code', '')
+    except CartError as error:
+        return _error(error)
+    if not code.strip():
+        return _error(CartError(_("Saisissez un code promo.")))
+    return set_coupon(request, code)
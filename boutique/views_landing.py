@@ -2,10 +2,14 @@ from django.views.generic import TemplateView
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Count
 from .models import Category, Product
+from .caching import ConditionalGetMixin, latest_change
 
-class LandingPageView(TemplateView):
+class LandingPageView(ConditionalGetMixin, TemplateView):
     template_name = 'boutique/landing.html'
     
+    def get_last_modified_parts(self):
+        return [latest_change(Category.objects.all()), latest_change(Product.objects.all())]
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.annotate(
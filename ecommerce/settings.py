@@ -63,9 +63,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # Sert les fichiers statiques hachés et compressés
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.locale.LocaleMiddleware',
+    'django.middleware.locale.LocaleMiddleware',  # Doit être après SessionMiddleware et avant CommonMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -137,20 +138,6 @@ LANGUAGES = LANGUAGES
 # Dossier où Django va chercher les fichiers de traduction
 LOCALE_PATHS = LOCALE_PATHS
 
-# Middleware pour la détection de la langue
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.locale.LocaleMiddleware',  # Doit être après SessionMiddleware et avant CommonMiddleware
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'allauth.account.middleware.AccountMiddleware',
-]
-
 TIME_ZONE = 'Europe/Paris'
 
 USE_I18N = True
@@ -164,6 +151,17 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Fichiers statiques de production : noms hachés (cache immutable), variantes
+# gzip/brotli et minification de nos JS/CSS lors de `collectstatic`
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'boutique.storage.MinifiedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -182,6 +180,14 @@ SITE_ID = 1
 
 # Email settings (console backend for development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# EMAIL_BACKEND = 'boutique.email_backends.DryRunEmailBackend'  # une ligne par e-mail, refuse les adresses *.invalid
+DEFAULT_FROM_EMAIL = 'Eric Digital Cementry <ericdigitalcementry@gmail.com>'
+
+# Boîte d'envoi des e-mails transactionnels (vidée par `manage.py send_queued_emails`)
+EMAIL_OUTBOX_BATCH_SIZE = 50  # E-mails envoyés par lot sur une même connexion SMTP
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5  # Tentatives avant d'abandonner un e-mail
+EMAIL_OUTBOX_RETRY_DELAY = 60  # Délai (secondes) avant la 2e tentative, doublé ensuite
+EMAIL_OUTBOX_LEASE = 300  # Délai (secondes) avant de reprendre un lot réservé par un worker arrêté
 
 # Allauth settings
 ACCOUNT_LOGOUT_ON_PASSWORD_CHANGE = True
@@ -210,11 +216,74 @@ STRIPE_PUBLIC_KEY = 'your-stripe-public-key'
 STRIPE_SECRET_KEY = 'your-stripe-secret-key'
 STRIPE_WEBHOOK_SECRET = 'your-stripe-webhook-secret'
 
-
-# Static files (CSS, JavaScript, Images)
-# https://docs.djangoproject.com/en/5.2/howto/static-files/
-
-STATIC_URL = 'static/'
+# Alertes de stock faible
+LOW_STOCK_VELOCITY_DAYS = 30  # Période (jours) utilisée pour calculer la vitesse de vente
+REORDER_COVER_DAYS = 30  # Couverture visée (jours) pour la quantité de réapprovisionnement suggérée
+
+# Réservation du stock pendant le paiement (en secondes)
+STOCK_RESERVATION_TTL = 15 * 60
+
+# Durée (secondes) pendant laquelle navigateurs et CDN peuvent réutiliser une page
+# du catalogue sans revalidation ; au-delà, revalidation par ETag / Last-Modified
+CATALOG_CACHE_MAX_AGE = 0
+
+# Nombre d'avis chargés par page sur la fiche produit
+REVIEWS_PAGE_SIZE = 5
+REVIEWS_MODERATION_PAGE_SIZE = 50  # Avis par page dans la file de modération
+
+# Suggestions de recherche : index des préfixes projeté en mémoire, partagé par les workers d'une machine
+# Reconstruction complète hors requêtes : `manage.py rebuild_search_index` via cron (ex. toutes les heures)
+# AUTOCOMPLETE_INDEX_PATH = '/var/cache/ecommerce/autocomplete.idx'  # Par défaut : dossier temporaire du système
+AUTOCOMPLETE_CHECK_INTERVAL = 2  # Délai (secondes) avant de vérifier si un autre worker a publié l'index
+AUTOCOMPLETE_COMPACT_AFTER = 200  # Modifications journalisées avant fusion dans un nouvel index
+AUTOCOMPLETE_LIMIT = 8  # Suggestions par type (produits, catégories)
+
+# Navigation à facettes du catalogue : bitmaps en mémoire, synchronisés par incréments
+FACETS_PRICE_BANDS = [10000, 25000, 50000, 100000]  # Bornes des tranches de prix (FBu)
+FACETS_CHECK_INTERVAL = 5  # Délai (secondes) entre deux relectures des produits modifiés
+FACETS_MAX_AGE = 3600  # Âge (secondes) au-delà duquel l'index est reconstruit depuis la base
+FACETS_MAX_SPECIFICATIONS = 8  # Spécifications proposées comme filtres
+FACETS_MAX_VALUES = 12  # Valeurs proposées par spécification
+
+# Produits fréquemment achetés ensemble (recalculés par `manage.py rebuild_recommendations`)
+RECOMMENDATIONS_DAYS = 365  # Commandes prises en compte
+RECOMMENDATIONS_TOP_K = 8  # Voisins enregistrés par produit
+RECOMMENDATIONS_MIN_SUPPORT = 2  # Commandes communes minimales pour recommander une paire
+RECOMMENDATIONS_MAX_BASKET = 30  # Commandes plus grandes ignorées pour les paires
+
+# Créneaux de livraison (début, fin) et capacité de chacun
+DELIVERY_SLOTS = (('08:00', '10:00'), ('10:00', '12:00'), ('13:00', '15:00'), ('15:00', '17:00'))
+DELIVERY_SLOT_TRUCKS = 2  # Camions disponibles par créneau
+DELIVERY_TRUCK_PAYLOAD_KG = 10000  # Charge utile d'un camion
+DELIVERY_MIN_LEAD_DAYS = 1  # Premier jour réservable (0 = le jour même)
+DELIVERY_BOOKING_DAYS = 14  # Nombre de jours ouverts à la réservation
+
+# Tournées de livraison
+DELIVERY_DEPOT = (-3.3822, 29.3644)  # Coordonnées du dépôt (latitude, longitude)
+DELIVERY_TRUCK_MAX_STOPS = 15  # Arrêts au plus par camion
+DISPATCH_CACHE_TIMEOUT = 24 * 60 * 60  # Durée de conservation d'un plan de tournées (secondes)
+
+# Frais de livraison (grilles : modèle ShippingRate)
+SHIPPING_VOLUMETRIC_KG_PER_M3 = 333  # Poids volumétrique : kg facturés par m³
+SHIPPING_RATES_CHECK_INTERVAL = 30  # Délai (secondes) avant de vérifier si les grilles ont changé
+SHIPPING_FALLBACK_FEE = 10000  # Forfait (FBu) appliqué faute de grille, par exemple avant la saisie des tarifs
+
+# Promotions et codes promo (modèles Promotion et Coupon)
+PROMOTIONS_CHECK_INTERVAL = 30  # Délai (secondes) avant de vérifier si les promotions ont changé
+NEW_PRODUCT_DAYS = 30  # Un produit est « nouveau » pendant ce nombre de jours
+
+# TVA (classes : modèle TaxClass ; les prix sont TTC)
+TAX_DEFAULT_RATE = 18  # Taux normal de TVA au Burundi, pour les produits sans classe
+TAX_RATES_CHECK_INTERVAL = 30  # Délai (secondes) avant de vérifier si les taux ont changé
+
+# Factures et bons de livraison PDF (stockés dans MEDIA_ROOT/documents/)
+DOCUMENTS_WORKERS = 2  # Processus de génération par processus serveur
+INVOICE_SELLER = (
+    'Eric Digital Cementry',
+    'Mirango 14e Av, Bujumbura, Burundi',
+    'Tél. : +257 61 69 00 53',
+    'ericdigitalcementry@gmail.com',
+)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
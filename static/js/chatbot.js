@@ -1,5 +1,6 @@
 // Configuration du chatbot
-document.addEventListener('DOMContentLoaded', function() {
+// Ce script est chargé à la demande (chatbot-loader.js), parfois après DOMContentLoaded
+function initChatbot() {
     // Initialisation des variables
     const chatToggle = document.querySelector('.chatbot-toggle');
     
@@ -85,4 +86,10 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }
     }, 5000);
-});
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initChatbot);
+} else {
+    initChatbot();
+}
@@ -259,7 +259,7 @@ function formatPrice(price) {
 
 // Fonction pour ajouter un produit au panier via AJAX
 function addToCart(productId, quantity = 1) {
-    const url = `/boutique/panier/ajouter/${productId}/`;
+    const url = `/boutique/panier/api/ajouter/${productId}/`;
     const csrftoken = getCookie('csrftoken');
     
     return fetch(url, {
@@ -279,7 +279,7 @@ function addToCart(productId, quantity = 1) {
             updateCartCount(data.cart_total_quantity);
             return { success: true, data };
         } else {
-            return { success: false, error: data.error || 'Une erreur est survenue' };
+            return { success: false, error: data.message || 'Une erreur est survenue' };
         }
     })
     .catch(error => {
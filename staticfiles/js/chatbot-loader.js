@@ -0,0 +1,4 @@
+(function(){const container=document.getElementById('chatbotContainer');const toggle=document.getElementById('chatbotToggle');if(!container||!toggle)return;let loading=null;function loadScript(src){return new Promise((resolve,reject)=>{const script=document.createElement('script');script.src=src;script.onload=resolve;script.onerror=reject;document.body.appendChild(script);});}
+function loadWidget(){if(loading)return loading;const link=document.createElement('link');link.rel='stylesheet';link.href=container.dataset.cssUrl;document.head.appendChild(link);loading=fetch(container.dataset.widgetUrl,{credentials:'same-origin'}).then(response=>{if(!response.ok)throw new Error(response.status);return response.text();}).then(html=>{container.insertAdjacentHTML('beforeend',html);return container.dataset.jsUrls.split(' ').filter(Boolean).reduce((chain,src)=>chain.then(()=>loadScript(src)),Promise.resolve());}).catch(error=>{console.error('Erreur lors du chargement du chatbot:',error);loading=null;});return loading;}
+function onFirstInteraction(){if(container.dataset.loaded==='true')return;container.dataset.openOnLoad='true';loadWidget();}
+toggle.addEventListener('click',onFirstInteraction);toggle.addEventListener('pointerenter',loadWidget,{once:true});window.addEventListener('load',function(){if('requestIdleCallback'in window){requestIdleCallback(loadWidget,{timeout:5000});}else{setTimeout(loadWidget,3000);}});})();
\ No newline at end of file
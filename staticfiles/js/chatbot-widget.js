@@ -0,0 +1,11 @@
+(function(){const chatbotToggle=document.getElementById('chatbotToggle');const chatbotWindow=document.getElementById('chatbotWindow');const chatbotClose=document.getElementById('chatbotClose');const chatbotInput=document.getElementById('chatbotInput');const chatbotSend=document.getElementById('chatbotSend');const chatbotMessages=document.getElementById('chatbotMessages');let isOpen=false;function addMessage(message,isUser=false){const messageDiv=document.createElement('div');messageDiv.className=`chatbot-message ${isUser ? 'user' : 'bot'}`;const time=new Date().toLocaleTimeString([],{hour:'2-digit',minute:'2-digit'});messageDiv.innerHTML=`
+            ${!isUser ? `<div class="message-avatar"><i class="fas fa-robot"></i></div>` : ''}
+            <div class="message-content">
+                <p>${message}</p>
+                <span class="message-time">${time}</span>
+            </div>
+        `;chatbotMessages.appendChild(messageDiv);chatbotMessages.scrollTop=chatbotMessages.scrollHeight;if(!isOpen&&!isUser){const notification=document.querySelector('.chatbot-notification');notification.style.display='flex';}}
+function handleBotResponse(message){setTimeout(()=>{let response="Je ne suis pas sûr de comprendre. Pouvez-vous reformuler votre question ?";const messageLower=message.toLowerCase();if(messageLower.includes('bonjour')||messageLower.includes('salut')||messageLower.includes('coucou')){response="Bonjour ! Comment puis-je vous aider aujourd'hui ?";}else if(messageLower.includes('prix')||messageLower.includes('coût')||messageLower.includes('tarif')){response="Nos prix varient selon les produits. Pourriez-vous me préciser quel produit vous intéresse ?";}else if(messageLower.includes('livraison')||messageLower.includes('expédition')){response="Nous proposons différentes options de livraison. La livraison standard est gratuite et prend 3-5 jours ouvrés.";}else if(messageLower.includes('retour')||messageLower.includes('remboursement')){response="Vous avez 30 jours pour retourner un article non utilisé et dans son emballage d'origine pour un remboursement complet.";}else if(messageLower.includes('contact')||messageLower.includes('contacter')){response="Vous pouvez nous contacter par email à ciment@gmail.com ou par téléphone au +257 61 69 00 53.";}else if(messageLower.includes('merci')||messageLower.includes('super')||messageLower.includes('parfait')){response="Je vous en prie ! N'hésitez pas si vous avez d'autres questions.";}else if(messageLower.includes('au revoir')||messageLower.includes('à bientôt')){response="Au revoir ! N'hésitez pas à revenir si vous avez d'autres questions. Bonne journée !";}
+addMessage(response);},800);}
+chatbotToggle.addEventListener('click',function(){isOpen=!isOpen;if(isOpen){chatbotWindow.classList.add('active');chatbotInput.focus();const notification=document.querySelector('.chatbot-notification');notification.style.display='none';}else{chatbotWindow.classList.remove('active');}});chatbotClose.addEventListener('click',function(){isOpen=false;chatbotWindow.classList.remove('active');});chatbotSend.addEventListener('click',function(){const message=chatbotInput.value.trim();if(message){addMessage(message,true);handleBotResponse(message);chatbotInput.value='';}});chatbotInput.addEventListener('keypress',function(e){if(e.key==='Enter'){const message=chatbotInput.value.trim();if(message){addMessage(message,true);handleBotResponse(message);chatbotInput.value='';}}});if(chatbotMessages.children.length===0){const root=document.documentElement;const userName=root.dataset.userAuthenticated==='true'?' '+root.dataset.username:'';addMessage(`Bonjour${userName}, comment puis-je vous aider aujourd'hui ?`);}
+const chatbotContainer=document.getElementById('chatbotContainer');if(chatbotContainer){chatbotContainer.dataset.loaded='true';if(chatbotContainer.dataset.openOnLoad==='true'){chatbotToggle.click();}}})();
\ No newline at end of file
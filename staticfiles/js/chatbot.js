@@ -0,0 +1,6 @@
+function initChatbot(){const chatToggle=document.querySelector('.chatbot-toggle');if(!chatToggle)return;function showWelcomeMessage(){if(typeof Tawk_API==='undefined')return;const isAuthenticated=document.body.getAttribute('data-user-authenticated')==='true';if(isAuthenticated){const userName=document.body.getAttribute('data-username')||'Client';Tawk_API.setChatMessage(`Bonjour ${userName}, comment puis-je vous aider aujourd'hui ?`);}else{Tawk_API.setChatMessage('Bonjour, comment puis-je vous aider aujourd\'hui ?');}}
+function toggleChat(){if(typeof Tawk_API==='undefined')return;if(Tawk_API.isChatMinimized()){Tawk_API.maximize();chatToggle.classList.add('active');showWelcomeMessage();}else{Tawk_API.minimize();chatToggle.classList.remove('active');}}
+chatToggle.addEventListener('click',toggleChat);if(typeof Tawk_API!=='undefined'){Tawk_API.onLoad=function(){Tawk_API.setAttributes({'name':document.body.getAttribute('data-user-name')||'Visiteur','email':document.body.getAttribute('data-user-email')||'','hash':document.body.getAttribute('data-user-id')||''});if(window.location.pathname.includes('admin')||window.location.pathname.includes('checkout')){Tawk_API.hideWidget();}
+Tawk_API.onChatMaximized=function(){chatToggle.style.display='none';showWelcomeMessage();};Tawk_API.onChatMinimized=function(){chatToggle.style.display='flex';};Tawk_API.onChatHidden=function(){chatToggle.style.display='flex';};};}
+setInterval(function(){if(typeof Tawk_API!=='undefined'&&Tawk_API.getStatus()==='chatting'){Tawk_API.getChatStatus(function(status){const notification=document.querySelector('.chatbot-notification');if(!notification)return;if(status==='unread'){notification.classList.remove('d-none');}else{notification.classList.add('d-none');}});}},5000);}
+if(document.readyState==='loading'){document.addEventListener('DOMContentLoaded',initChatbot);}else{initChatbot();}
\ No newline at end of file
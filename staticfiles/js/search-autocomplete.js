@@ -0,0 +1,5 @@
+document.addEventListener('DOMContentLoaded',function(){document.querySelectorAll('[data-autocomplete-url]').forEach(function(input){const menu=input.parentNode.querySelector('.search-suggestions');let timer=null;let controller=null;function hide(){menu.classList.remove('show');menu.innerHTML='';}
+function addGroup(title,items,icon){if(!items.length)return;const header=document.createElement('h6');header.className='dropdown-header';header.textContent=title;menu.appendChild(header);items.forEach(function(item){const link=document.createElement('a');link.className='dropdown-item text-truncate';link.href=item.url;const symbol=document.createElement('i');symbol.className='fas '+icon+' text-muted me-2';link.appendChild(symbol);link.appendChild(document.createTextNode(item.name));menu.appendChild(link);});}
+function fetchSuggestions(){const query=input.value.trim();if(query.length<2){hide();return;}
+if(controller)controller.abort();controller=new AbortController();fetch(input.dataset.autocompleteUrl+'?q='+encodeURIComponent(query),{signal:controller.signal}).then(function(response){return response.json();}).then(function(data){menu.innerHTML='';addGroup(input.dataset.labelCategories,data.categories,'fa-tags');addGroup(input.dataset.labelProducts,data.products,'fa-box');menu.classList.toggle('show',menu.children.length>0);}).catch(function(){});}
+input.addEventListener('input',function(){clearTimeout(timer);timer=setTimeout(fetchSuggestions,150);});input.addEventListener('keydown',function(event){if(event.key==='Escape')hide();});document.addEventListener('click',function(event){if(!input.parentNode.contains(event.target))hide();});});});
\ No newline at end of file